@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Замер: стоимость декодирования строки результата YDB
+
+Сравнивает прежние способы (getattr по колонкам в DictionaryManager,
+dict(row) в WordoorioDatabase, jsonify копий) с декодерами
+core/row_decoding.py. Строки — как у SDK: dict с доступом через атрибуты,
+поэтому YDB для замера не нужна.
+
+  python benchmarks/bench_row_decoding.py [--rows 5000] [--repeat 20]
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.row_decoding import rows_as_dicts, rows_as_tuples, rows_as_records, rows_as_json  # noqa: E402
+
+COLUMNS = ('id', 'lemma', 'type', 'status', 'rating', 'added_at', 'last_reviewed_at',
+           'last_rating_change', 'added_ts', 'last_reviewed_ts', 'last_rating_change_ts')
+
+
+class _Row(dict):
+    """Строка результата как в SDK"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _Column:
+    def __init__(self, name):
+        self.name = name
+
+
+class _ResultSet:
+    def __init__(self, rows):
+        self.columns = [_Column(name) for name in COLUMNS]
+        self.rows = rows
+
+
+def make_result_set(count: int) -> _ResultSet:
+    now = datetime.now().isoformat()
+    return _ResultSet([
+        _Row(id=i, lemma=f'word{i}', type='word', status='learning', rating=i % 10,
+             added_at=now, last_reviewed_at=now, last_rating_change=now,
+             added_ts=1_700_000_000_000_000 + i, last_reviewed_ts=None, last_rating_change_ts=None)
+        for i in range(count)
+    ])
+
+
+def getattr_dicts(result_set):
+    """DictionaryManager._fetch_all до изменения"""
+    columns = [col.name for col in result_set.columns]
+    return [{col: getattr(row, col) for col in columns} for row in result_set.rows]
+
+
+def copy_dicts(result_set):
+    """WordoorioDatabase._fetch_all до изменения"""
+    return [dict(row) for row in result_set.rows]
+
+
+def jsonify_copies(result_set):
+    """Ответ /api/history до изменения: копии строк через jsonify (sort_keys)"""
+    return json.dumps({'success': True, 'analyses': copy_dicts(result_set)}, sort_keys=True)
+
+
+def json_direct(result_set):
+    """Ответ /api/history после изменения"""
+    return '{"success":true,"analyses":' + rows_as_json(result_set) + '}'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    result_set = make_result_set(args.rows)
+    cases = [
+        ('getattr по колонкам (было: DictionaryManager)', getattr_dicts),
+        ('dict(row) (было: WordoorioDatabase)', copy_dicts),
+        ('rows_as_dicts', rows_as_dicts),
+        ('rows_as_tuples', rows_as_tuples),
+        ('rows_as_tuples, 3 колонки', lambda rs: rows_as_tuples(rs, ('id', 'lemma', 'status'))),
+        ('rows_as_records', rows_as_records),
+        ('JSON: jsonify копий (было)', jsonify_copies),
+        ('JSON: rows_as_json', json_direct),
+    ]
+
+    print(f"Строк: {args.rows}, колонок: {len(COLUMNS)}, повторов: {args.repeat}\n")
+    for title, decode in cases:
+        seconds = min(timeit.repeat(lambda: decode(result_set), number=1, repeat=args.repeat))
+        print(f"  {title:<48} {seconds / args.rows * 1e9:8.0f} нс/строка")
+
+
+if __name__ == "__main__":
+    main()
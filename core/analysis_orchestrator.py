@@ -22,11 +22,24 @@ from contracts.analysis_contracts import (
     create_error_result
 )
 from core.yandex_ai_client import YandexAIClient
+from core.shared_cache import get_shared_cache
 from utils.lemmatizer import lemmatize_with_pos, lemmatize_russian
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+LEMMA_CACHE_TTL = 30 * 24 * 3600  # секунд
+
+
+def _cached_lemmatize_with_pos(word: str) -> tuple:
+    """lemmatize_with_pos() через общий кэш процессов (core/shared_cache.py)"""
+    cached = get_shared_cache().get('lemma', word)
+    if cached is not None:
+        return cached[0], cached[1]
+    word_lemma, is_participle = lemmatize_with_pos(word)
+    get_shared_cache().set('lemma', word, [word_lemma, is_participle], LEMMA_CACHE_TTL)
+    return word_lemma, is_participle
+
 
 class AnalysisOrchestrator:
     """
@@ -220,7 +233,7 @@ class AnalysisOrchestrator:
 
             # Лемматизируем слово + получаем флаг причастия для согласования EN↔RU
             lemma_start = time.time()
-            word_lemma, is_participle = lemmatize_with_pos(word)
+            word_lemma, is_participle = _cached_lemmatize_with_pos(word)
             lemma_time = time.time() - lemma_start
 
             # Yandex Dictionary API поддерживает ТОЛЬКО отдельные слова, НЕ фразы
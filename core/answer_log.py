@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+AnswerLog - журнал ответов тренировки с отложенной записью в YDB
+
+Ответ на тест подтверждается сразу: событие дописывается в локальный
+спул (JSONL) и в очередь в памяти, новый рейтинг и статус считаются по
+состоянию слова из сессии тренировки. Фоновый поток раз в ANSWER_LOG_FLUSH_MS
+или по накоплении ANSWER_LOG_BATCH_SIZE событий применяет пачку одним
+запросом (db.apply_answer_events): рейтинг и статус слов, статистика,
+удаление тестов и запись событий в answer_events для аналитики.
+
+Итоговое состояние слова YDB пересчитывает сама по последовательности
+событий, поэтому предварительный расчёт в воркере не обязан совпадать
+с состоянием в других воркерах gunicorn.
+
+Восстановление после сбоя: файлы спула, не удалённые после успешной записи,
+при старте процесса отправляются повторно. Уже применённые события
+отбрасываются по event_id, повтор безопасен.
+
+Спул лежит на локальном диске, поэтому переживает только падение процесса,
+но не потерю экземпляра. В Serverless Container диск экземпляра временный:
+при остановке экземпляра файлы спула никто не подхватит, и ответы последних
+ANSWER_LOG_FLUSH_MS пропадут. Там ответы пишутся синхронно
+(ANSWER_WRITE_MODE=sync в .github/workflows/deploy.yml); режим log — для
+хостов с постоянным ANSWER_LOG_SPOOL_DIR.
+
+Очередь ограничена ANSWER_LOG_MAX_PENDING событиями: если YDB не успевает
+или недоступна и очередь заполнена, append() событие не принимает, и ответ
+записывается синхронно (TestManager.submit_answer).
+
+ANSWER_WRITE_MODE=sync возвращает синхронную запись (db.submit_test_answer).
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from database import WordoorioDatabase
+
+logger = logging.getLogger(__name__)
+
+ANSWER_WRITE_MODE = os.getenv('ANSWER_WRITE_MODE', 'log')  # log | sync
+ANSWER_LOG_SPOOL_DIR = os.getenv('ANSWER_LOG_SPOOL_DIR', '/tmp/wordoorio-answers')
+ANSWER_LOG_BATCH_SIZE = int(os.getenv('ANSWER_LOG_BATCH_SIZE', '50'))
+ANSWER_LOG_FLUSH_MS = int(os.getenv('ANSWER_LOG_FLUSH_MS', '2000'))
+ANSWER_LOG_FSYNC = os.getenv('ANSWER_LOG_FSYNC', '0') == '1'
+ANSWER_LOG_MAX_PENDING = int(os.getenv('ANSWER_LOG_MAX_PENDING', '5000'))
+
+MAX_EVENTS_PER_QUERY = 500  # ограничение размера параметра $events
+MAX_RATING = 10
+
+
+def next_word_state(status: str, rating: int, is_correct: bool) -> Tuple[str, int]:
+    """
+    Новый статус и рейтинг слова после ответа
+
+    Те же правила, что в db.submit_test_answer: new → learning; верно — rating + 1
+    (максимум 10), неверно — rating = 0 и learned → learning; learning с rating 10 → learned.
+    """
+    status = status or 'new'
+    rating = rating or 0
+
+    if status == 'new':
+        status = 'learning'
+
+    if is_correct:
+        rating = min(rating + 1, MAX_RATING)
+    else:
+        rating = 0
+        if status == 'learned':
+            status = 'learning'
+
+    if status == 'learning' and rating >= MAX_RATING:
+        status = 'learned'
+
+    return status, rating
+
+
+class _Segment:
+    """Файл спула под эксклюзивной блокировкой (чужие процессы его не трогают)"""
+
+    def __init__(self, path: str, file, events: int = 0):
+        self.path = path
+        self.file = file
+        self.events = events
+
+    def append(self, line: str):
+        self.file.write(line)
+        self.file.flush()
+        if ANSWER_LOG_FSYNC:
+            os.fsync(self.file.fileno())
+        self.events += 1
+
+    def remove(self):
+        """Удалить файл (события применены) и снять блокировку"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.file.close()
+
+
+class AnswerLog:
+    """Очередь ответов с пакетной записью в YDB"""
+
+    def __init__(self, db: WordoorioDatabase, spool_dir: str = ANSWER_LOG_SPOOL_DIR,
+                 batch_size: int = ANSWER_LOG_BATCH_SIZE, flush_ms: int = ANSWER_LOG_FLUSH_MS,
+                 max_pending: int = ANSWER_LOG_MAX_PENDING):
+        self.db = db
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # одна запись в YDB за раз
+        self._pending: deque = deque()  # события, ещё не записанные в YDB
+        self._sealed: List[_Segment] = []  # закрытые файлы спула с событиями из _pending
+        self._segment: Optional[_Segment] = None
+        self._seq = 0
+        # word_id → (status, rating) по ответам этого процесса, пока они не записаны
+        self._states: Dict[int, Tuple[str, int]] = {}
+        self._stopped = False
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._recover()
+        self._segment = self._open_segment()
+
+        self._thread = threading.Thread(target=self._loop, name='answer-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # Спул
+    # ------------------------------------------------------------------
+
+    def _open_segment(self) -> _Segment:
+        """Новый файл спула текущего процесса"""
+        self._seq += 1
+        path = os.path.join(self.spool_dir, f"answers-{os.getpid()}-{int(time.time())}-{self._seq}.jsonl")
+        file = open(path, 'a', encoding='utf-8')
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return _Segment(path, file)
+
+    def _recover(self):
+        """Подхватить события из файлов спула, оставшихся после падения процессов"""
+        recovered = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not (name.startswith('answers-') and name.endswith('.jsonl')):
+                continue
+
+            path = os.path.join(self.spool_dir, name)
+            try:
+                file = open(path, 'r+', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Файл живого воркера
+                file.close()
+                continue
+
+            events = []
+            for line in file:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Недописанная строка при падении
+                    continue
+
+            self._pending.extend(events)
+            self._sealed.append(_Segment(path, file, len(events)))
+            recovered += len(events)
+
+        if recovered:
+            logger.info(f"[AnswerLog] Восстановлено из спула {recovered} событий")
+
+    # ------------------------------------------------------------------
+    # Запись ответа
+    # ------------------------------------------------------------------
+
+    def word_state(self, word_id: int) -> Optional[Tuple[str, int]]:
+        """(status, rating) слова по ещё не записанным ответам этого процесса"""
+        with self._lock:
+            return self._states.get(word_id)
+
+    def append(self, test: Dict, answer: str, is_correct: bool) -> Optional[Dict]:
+        """
+        Записать ответ в журнал (без обращения к YDB)
+
+        Args:
+            test: Тест из TestManager.build_session_tests() (с состоянием слова)
+            answer: Выбранный вариант
+            is_correct: Правильность ответа
+
+        Returns:
+            Событие ответа или None, если очередь заполнена (ответ нужно
+            записать синхронно)
+        """
+        event = {
+            'event_id': uuid.uuid4().hex,
+            'user_id': test['user_id'],
+            'word_id': test['word_id'],
+            'test_id': test['test_id'],
+            'test_mode': test.get('test_mode') or 1,
+            'answer': answer,
+            'is_correct': is_correct,
+            'answered_at': datetime.now().isoformat(timespec='microseconds'),
+        }
+        line = json.dumps(event, ensure_ascii=False) + '\n'
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                logger.warning(f"[AnswerLog] Очередь заполнена ({len(self._pending)} событий), ответ пишется синхронно")
+                self._wakeup.notify()
+                return None
+            state = self._states.get(test['word_id']) or (test.get('status'), test.get('rating'))
+            self._states[test['word_id']] = next_word_state(state[0], state[1], is_correct)
+            self._segment.append(line)
+            self._pending.append(event)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+        return event
+
+    # ------------------------------------------------------------------
+    # Запись в YDB
+    # ------------------------------------------------------------------
+
+    def _loop(self):
+        """Фоновый поток: запись по таймеру или по размеру пачки"""
+        failed = False
+        while True:
+            with self._lock:
+                if self._stopped:
+                    return
+                # После ошибки YDB ждём полный интервал, даже если пачка набрана
+                if failed or len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                if self._stopped:
+                    return
+            failed = self.flush() < 0
+
+    def flush(self) -> int:
+        """
+        Записать все накопленные события в YDB (синхронно)
+
+        Returns:
+            Количество отправленных событий (-1, если YDB недоступна)
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                events = list(self._pending)
+                self._pending.clear()
+                segments = self._sealed
+                self._sealed = []
+                if self._segment.events:
+                    # Новые ответы пишутся в новый файл, текущий закрывается
+                    segments.append(self._segment)
+                    self._segment = self._open_segment()
+
+            started = time.time()
+            try:
+                for i in range(0, len(events), MAX_EVENTS_PER_QUERY):
+                    self.db.apply_answer_events(events[i:i + MAX_EVENTS_PER_QUERY])
+            except Exception as e:
+                logger.error(f"[AnswerLog] Ошибка записи {len(events)} событий, повтор позже: {e}")
+                with self._lock:
+                    # Повтор безопасен: применённые события отбрасываются по event_id
+                    self._pending.extendleft(reversed(events))
+                    self._sealed = segments + self._sealed
+                return -1
+
+            for segment in segments:
+                segment.remove()
+
+            with self._lock:
+                # Состояние слов больше не нужно, если новых ответов по ним нет
+                waiting = {e['word_id'] for e in self._pending}
+                for event in events:
+                    if event['word_id'] not in waiting:
+                        self._states.pop(event['word_id'], None)
+
+            logger.info(f"[AnswerLog] Записано {len(events)} событий за {(time.time() - started) * 1000:.0f} мс")
+            return len(events)
+
+    def close(self):
+        """Остановить поток и записать остаток (при завершении процесса)"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._wakeup.notify()
+        self.flush()
+
+
+_log: Optional[AnswerLog] = None
+_log_lock = threading.Lock()
+
+
+def get_answer_log(db: WordoorioDatabase) -> Optional[AnswerLog]:
+    """Общий экземпляр на процесс (None при ANSWER_WRITE_MODE=sync)"""
+    global _log
+    if ANSWER_WRITE_MODE != 'log':
+        return None
+    with _log_lock:
+        if _log is None:
+            _log = AnswerLog(db)
+        return _log
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+CacheInvalidation - сброс кэшей процесса по изменениям в YDB (changefeed)
+
+Кэши в памяти (DictionaryCache, Typeahead) сбрасывает запись в том же
+процессе; записи других воркеров gunicorn и инстансов контейнера раньше
+доходили до них только через TTL. На таблицах INVALIDATION_TABLES включён
+changefeed CHANGEFEED (FORMAT JSON, MODE KEYS_ONLY): в топик пишется ключ
+каждой изменённой строки. Первая колонка ключа всех этих таблиц — user_id,
+поэтому сообщение сбрасывает кэши одного пользователя.
+
+Кэши подписываются на таблицы через subscribe(): invalidate(user_id) на
+изменение, clear() — когда изменения могли быть пропущены (процесс заново
+занял consumer). Топики без подписчиков не читаются.
+
+Consumer топика делит партиции между своими читателями, поэтому каждому
+процессу нужен свой. Consumer'ы cache_0 … cache_{N-1} создаёт
+migrations/add_cache_changefeeds.py, процесс занимает свободный слот арендой
+в таблице cache_consumers (db.claim_cache_consumer) и продлевает её каждые
+LEASE_SECONDS / 3 секунд. Без слота (все заняты, ошибка YDB) кэши работают
+как раньше — по TTL.
+
+Накопившиеся в слоте сообщения применяются при старте: лишний сброс безопасен.
+
+CACHE_INVALIDATION=0 отключает чтение.
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import logging
+import threading
+import concurrent.futures
+from typing import Callable, Dict, List, Optional, Sequence
+
+from database import WordoorioDatabase
+from core.dictionary_cache import invalidate_dictionary, clear_dictionary_cache
+from core.typeahead import invalidate_typeahead, clear_typeahead
+
+logger = logging.getLogger(__name__)
+
+CACHE_INVALIDATION = os.getenv('CACHE_INVALIDATION', '1') == '1'
+CACHE_INVALIDATION_SLOTS = int(os.getenv('CACHE_INVALIDATION_SLOTS', '16'))  # не больше, чем создано миграцией
+
+CHANGEFEED = 'cache_invalidation'
+CONSUMER_PREFIX = 'cache_'
+INVALIDATION_TABLES = ('dictionary_words', 'dictionary_translations', 'tests')
+
+LEASE_SECONDS = 60
+READ_TIMEOUT = 5  # секунд ожидания пачки (проверка остановки)
+RETRY_SECONDS = 30  # пауза перед повторной попыткой занять слот
+
+# (таблицы, invalidate(user_id), clear())
+_subscribers: List[tuple] = []
+
+
+def subscribe(tables: Sequence[str], invalidate: Callable[[int], None], clear: Callable[[], None]):
+    """
+    Подписать кэш процесса на изменения таблиц
+
+    Args:
+        tables: Таблицы из INVALIDATION_TABLES
+        invalidate: Сброс данных пользователя
+        clear: Сброс всего кэша
+    """
+    _subscribers.append((tuple(tables), invalidate, clear))
+
+
+subscribe(('dictionary_words',), invalidate_dictionary, clear_dictionary_cache)
+subscribe(('dictionary_words', 'dictionary_translations'), invalidate_typeahead, clear_typeahead)
+
+
+def changed_users(messages) -> List[int]:
+    """user_id из сообщений changefeed ({"key": [user_id, ...], "update"|"erase": {}})"""
+    users = set()
+    for message in messages:
+        try:
+            key = json.loads(message.data).get('key') or []
+        except (ValueError, AttributeError):
+            continue
+        if key and key[0] is not None:
+            users.add(key[0])
+    return sorted(users)
+
+
+class CacheInvalidation:
+    """Чтение changefeed'ов на слоте consumer'а"""
+
+    def __init__(self, db: WordoorioDatabase, slots: int = CACHE_INVALIDATION_SLOTS):
+        self.db = db
+        self.slots = slots
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.slot: Optional[int] = None
+        self.tables = [t for t in INVALIDATION_TABLES if any(t in s[0] for s in _subscribers)]
+        self._metrics = {'messages': 0, 'invalidations': 0, 'claims': 0}
+        self._stopped = threading.Event()
+
+        self._thread = threading.Thread(target=self._loop, name='cache-invalidation', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        """Занять слот и читать топики, пока слот не потерян; затем — заново"""
+        while not self._stopped.is_set():
+            try:
+                self.slot = self._claim()
+                if self.slot is not None:
+                    self._run_slot(self.slot)
+            except Exception as e:
+                logger.error(f"[CacheInvalidation] Ошибка: {e}")
+            self.slot = None
+            self._stopped.wait(RETRY_SECONDS)
+
+    def _claim(self) -> Optional[int]:
+        """Свободный слот (None — все заняты)"""
+        busy = set(self.db.get_busy_cache_consumers(self.owner))
+        free = [slot for slot in range(self.slots) if slot not in busy]
+        random.shuffle(free)
+        for slot in free:
+            if self.db.claim_cache_consumer(slot, self.owner, LEASE_SECONDS):
+                self._metrics['claims'] += 1
+                logger.info(f"[CacheInvalidation] Слот {slot} занят процессом {self.owner}")
+                return slot
+        logger.warning(f"[CacheInvalidation] Свободных слотов нет ({self.slots}), кэши — по TTL")
+        return None
+
+    def _run_slot(self, slot: int):
+        """Читатели топиков + продление аренды"""
+        # Пока слот был не наш, изменения могли пройти мимо
+        for _, _, clear in _subscribers:
+            clear()
+
+        lost = threading.Event()
+        readers = [
+            threading.Thread(target=self._read, args=(table, f"{CONSUMER_PREFIX}{slot}", lost),
+                             name=f'cache-invalidation-{table}', daemon=True)
+            for table in self.tables
+        ]
+        for reader in readers:
+            reader.start()
+
+        renewed_at = time.time()
+        try:
+            while not lost.wait(LEASE_SECONDS / 3) and not self._stopped.is_set():
+                try:
+                    if not self.db.claim_cache_consumer(slot, self.owner, LEASE_SECONDS):
+                        logger.warning(f"[CacheInvalidation] Слот {slot} занят другим процессом")
+                        break
+                    renewed_at = time.time()
+                except Exception as e:
+                    logger.error(f"[CacheInvalidation] Ошибка продления аренды слота {slot}: {e}")
+                    if time.time() - renewed_at > LEASE_SECONDS:
+                        break
+        finally:
+            lost.set()
+            for reader in readers:
+                reader.join()
+            if self._stopped.is_set():
+                self.db.release_cache_consumer(slot, self.owner)
+
+    def _read(self, table: str, consumer: str, lost: threading.Event):
+        """Читать changefeed таблицы, пока слот наш"""
+        topic = f"{self.db.database}/{table}/{CHANGEFEED}"
+        try:
+            reader = self.db.driver.topic_client.reader(topic, consumer=consumer)
+            try:
+                while not lost.is_set():
+                    try:
+                        batch = reader.receive_batch(timeout=READ_TIMEOUT)
+                    except (TimeoutError, concurrent.futures.TimeoutError):
+                        continue
+                    self.apply(table, batch.messages)
+                    reader.commit(batch)
+            finally:
+                reader.close()
+        except Exception as e:
+            logger.error(f"[CacheInvalidation] Ошибка чтения {table}: {e}")
+        finally:
+            # Без одного из топиков слот бесполезен — читатели перезапускаются вместе
+            lost.set()
+
+    def apply(self, table: str, messages) -> int:
+        """Сбросить кэши пользователей из сообщений changefeed таблицы"""
+        users = changed_users(messages)
+        for tables, invalidate, _ in _subscribers:
+            if table in tables:
+                for user_id in users:
+                    invalidate(user_id)
+        self._metrics['messages'] += len(messages)
+        self._metrics['invalidations'] += len(users)
+        return len(users)
+
+    def stats(self) -> Dict:
+        """Метрики: slot, messages, invalidations, claims"""
+        return {'slot': self.slot, **self._metrics}
+
+    def stop(self):
+        self._stopped.set()
+
+
+_invalidation: Optional[CacheInvalidation] = None
+_invalidation_lock = threading.Lock()
+
+
+def get_cache_invalidation(db: WordoorioDatabase) -> Optional[CacheInvalidation]:
+    """Общий экземпляр на процесс (None при CACHE_INVALIDATION=0)"""
+    global _invalidation
+    if not CACHE_INVALIDATION:
+        return None
+    with _invalidation_lock:
+        if _invalidation is None:
+            _invalidation = CacheInvalidation(db)
+        return _invalidation
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+DictionaryCache - наборы слов пользователей в памяти процесса
+
+Для пользователя хранится его словарь: lemma → строка с полями, нужными
+проверке существования слова (DictionaryManager.add_word) и отбору слов
+тренировки (db.get_training_candidates): id, статус, рейтинг, время.
+Набор загружается одним запросом WORD_SET_QUERY при промахе.
+
+Инвалидация версионная: каждая запись, меняющая поля набора (новое слово,
+удаление, статус, рейтинг), увеличивает версию словаря пользователя. Загрузка,
+во время которой версия изменилась, результат не сохраняет — устаревший
+набор не попадает в кэш. clear() сбрасывает все наборы и отменяет все
+идущие загрузки.
+
+Память ограничена DICTIONARY_CACHE_BYTES (оценка размера строк), вытеснение
+по LRU. Метрики — stats() и периодический лог.
+
+Записи других воркеров и инстансов доходят через changefeed
+(core/cache_invalidation.py); add_word всё равно проверяет отсутствие слова
+в транзакции вставки, а TTL ограничивает устаревание, если чтение changefeed
+недоступно.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DICTIONARY_CACHE_BYTES = int(os.getenv('DICTIONARY_CACHE_BYTES', str(32 * 1024 * 1024)))
+DICTIONARY_CACHE_TTL = int(os.getenv('DICTIONARY_CACHE_TTL', '300'))  # секунд
+STATS_LOG_EVERY = 1000  # обращений между записями метрик в лог
+
+ROW_OVERHEAD = 600  # байт на строку: dict, ключи, числа, время
+
+# Поля строки словаря в наборе ($user_id — владелец)
+WORD_SET_QUERY = """
+DECLARE $user_id AS Uint64?;
+
+SELECT id, lemma, type, status, rating, added_at, last_reviewed_at, last_rating_change,
+       added_ts, last_reviewed_ts, last_rating_change_ts
+FROM dictionary_words
+WHERE user_id = $user_id
+"""
+
+
+def _estimate_size(words: Dict[str, Dict]) -> int:
+    """Примерный размер набора в байтах"""
+    return sum(ROW_OVERHEAD + 2 * sum(len(v) for v in row.values() if isinstance(v, str))
+               for row in words.values())
+
+
+class _WordSet:
+    """Набор слов одного пользователя"""
+
+    def __init__(self, rows: List[Dict]):
+        self.words = {row['lemma']: row for row in rows if row.get('lemma')}
+        self.size = _estimate_size(self.words)
+        self.loaded_at = time.time()
+
+
+class DictionaryCache:
+    """LRU наборов слов по пользователям с версионной инвалидацией"""
+
+    def __init__(self, max_bytes: int = DICTIONARY_CACHE_BYTES, ttl_seconds: int = DICTIONARY_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sets: "OrderedDict[int, _WordSet]" = OrderedDict()
+        self._bytes = 0
+        # Версии словарей; _epoch растёт при сбросе без user_id
+        self._versions: Dict[int, int] = {}
+        self._epoch = 0
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'discarded': 0}
+
+    def words(self, user_id: int, load: Callable[[], List[Dict]]) -> Dict[str, Dict]:
+        """
+        Словарь пользователя lemma → строка (строки общие — не изменять)
+
+        Args:
+            user_id: ID пользователя
+            load: Загрузка строк при промахе (WORD_SET_QUERY)
+        """
+        with self._lock:
+            word_set = self._sets.get(user_id)
+            if word_set and time.time() - word_set.loaded_at < self.ttl_seconds:
+                self._sets.move_to_end(user_id)
+                self._count('hits')
+                return word_set.words
+            self._count('misses')
+            version = (self._versions.get(user_id, 0), self._epoch)
+
+        started = time.time()
+        word_set = _WordSet(load())
+        logger.info(f"[DictionaryCache] Словарь user_id={user_id}: {len(word_set.words)} слов "
+                    f"за {(time.time() - started) * 1000:.0f} мс")
+
+        with self._lock:
+            if version != (self._versions.get(user_id, 0), self._epoch):
+                # Словарь изменился во время загрузки
+                self._metrics['discarded'] += 1
+                return word_set.words
+            self._store(user_id, word_set)
+        return word_set.words
+
+    def _store(self, user_id: int, word_set: _WordSet):
+        """Положить набор с вытеснением по LRU. Вызывать под self._lock"""
+        self._drop(user_id)
+        if word_set.size > self.max_bytes:
+            return
+        self._sets[user_id] = word_set
+        self._bytes += word_set.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._sets.popitem(last=False)
+            self._bytes -= evicted.size
+            self._metrics['evictions'] += 1
+
+    def _drop(self, user_id: int):
+        """Убрать набор пользователя. Вызывать под self._lock"""
+        word_set = self._sets.pop(user_id, None)
+        if word_set:
+            self._bytes -= word_set.size
+
+    def invalidate(self, user_id: int):
+        """Словарь пользователя изменился"""
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._drop(user_id)
+            self._metrics['invalidations'] += 1
+
+    def clear(self):
+        """Сбросить все наборы (пропущены изменения из других процессов)"""
+        with self._lock:
+            self._epoch += 1
+            self._sets.clear()
+            self._bytes = 0
+            self._metrics['invalidations'] += 1
+
+    def _count(self, metric: str):
+        """Увеличить счётчик обращений и раз в STATS_LOG_EVERY записать метрики. Вызывать под self._lock"""
+        self._metrics[metric] += 1
+        if (self._metrics['hits'] + self._metrics['misses']) % STATS_LOG_EVERY == 0:
+            logger.info(f"[DictionaryCache] {self._stats()}")
+
+    def _stats(self) -> Dict:
+        lookups = self._metrics['hits'] + self._metrics['misses']
+        return {
+            **self._metrics,
+            'hit_rate': round(self._metrics['hits'] / lookups, 3) if lookups else None,
+            'users': len(self._sets),
+            'bytes': self._bytes,
+        }
+
+    def stats(self) -> Dict:
+        """Метрики: hits, misses, hit_rate, evictions, invalidations, discarded, users, bytes"""
+        with self._lock:
+            return self._stats()
+
+
+_cache: Optional[DictionaryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_dictionary_cache() -> DictionaryCache:
+    """Общий экземпляр на процесс"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DictionaryCache()
+        return _cache
+
+
+def invalidate_dictionary(user_id: Optional[int]):
+    """Сбросить словарь пользователя, если кэш уже используется в процессе"""
+    if _cache is not None and user_id is not None:
+        _cache.invalidate(user_id)
+
+
+def clear_dictionary_cache():
+    """Сбросить все наборы, если кэш уже используется в процессе"""
+    if _cache is not None:
+        _cache.clear()
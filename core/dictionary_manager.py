@@ -15,8 +15,80 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 import logging
 
+from database import global_scope, counter_scope, counter_rows, COUNTER_ROWS_DECLARE, APPLY_COUNTER_DELTAS
+from database import search_rows, search_terms, SEARCH_ROWS_DECLARE, INDEX_SEARCH_ROWS, timestamp_us
+from database import merge_word_doc, dump_word_doc, load_word_doc, word_doc_translations
+from database import TX_STALE_READ, TX_ONLINE_READ
+from core.typeahead import invalidate_typeahead
+from core.dictionary_cache import get_dictionary_cache, invalidate_dictionary, WORD_SET_QUERY
+from core.row_decoding import rows_as_dicts
+
 logger = logging.getLogger(__name__)
 
+# Дельты счётчиков статуса из $old (текущие статусы) → $status (новый статус), scope — $scope
+_STATUS_DELTAS = """
+$deltas = (
+    SELECT $scope AS scope, 'status:'u || $status AS name, 1l AS delta FROM $old WHERE status != $status
+    UNION ALL
+    SELECT $scope AS scope, 'status:'u || status AS name, -1l AS delta FROM $old WHERE status != $status
+);
+"""
+
+# Параметры и запись истории слова в add_word: новые переводы ($translation_rows),
+# пример и документ слова ($doc) пишутся в одной транзакции
+_ADD_WORD_DECLARE = """
+DECLARE $user_id AS Uint64?;
+DECLARE $word_id AS Uint64?;
+DECLARE $translation_rows AS List<Struct<id: Uint64?, translation: Utf8?>>;
+DECLARE $example_id AS Uint64?;
+DECLARE $original_form AS Utf8?;
+DECLARE $context AS Utf8?;
+DECLARE $session_id AS Utf8?;
+DECLARE $added_at AS Utf8?;
+DECLARE $added_ts AS Timestamp?;
+DECLARE $doc AS Utf8?;
+"""
+
+_ADD_WORD_HISTORY = """
+UPSERT INTO dictionary_translations
+SELECT id, $user_id AS user_id, $word_id AS word_id, translation, $session_id AS source_session_id,
+       $added_at AS added_at, $added_ts AS added_ts
+FROM AS_TABLE($translation_rows);
+
+UPSERT INTO dictionary_examples (id, user_id, word_id, original_form, context, session_id, added_at, added_ts)
+VALUES ($example_id, $user_id, $word_id, $original_form, $context, $session_id, $added_at, $added_ts);
+"""
+
+
+# Проверка в транзакции вставки слова: lemma у владельца ещё нет. Набор слов
+# DictionaryCache мог устареть (слово добавил другой процесс) — тогда запрос
+# падает с _WORD_EXISTS и add_word повторяется по актуальному набору
+_WORD_EXISTS = 'WORD_EXISTS'
+
+# Проверка в транзакции удаления слова: слово ещё есть. Между поиском по lemma
+# и удалением его мог удалить другой запрос — тогда транзакция падает с
+# _WORD_MISSING и не трогает постинги, расписание и счётчики
+_WORD_MISSING = 'WORD_MISSING'
+
+
+def _translation_rows(rows: List[tuple]) -> ydb.TypedValue:
+    """Параметр $translation_rows из [(id, translation), ...]"""
+    struct_type = ydb.StructType()
+    struct_type.add_member('id', ydb.OptionalType(ydb.PrimitiveType.Uint64))
+    struct_type.add_member('translation', ydb.OptionalType(ydb.PrimitiveType.Utf8))
+    return ydb.TypedValue([{'id': i, 'translation': t} for i, t in rows], ydb.ListType(struct_type))
+
+
+def _owner(user_id: Optional[int], alias: str = '') -> str:
+    """
+    Условие на владельца строки — первую колонку PK таблиц словаря
+
+    Для пользователя это префикс ключа (user_id = $user_id), для anonymous — user_id IS NULL
+    """
+    column = f"{alias}.user_id" if alias else "user_id"
+    return f"{column} = $user_id" if user_id is not None else f"{column} IS NULL"
+
+
 def _typed_params(params: Dict[str, Any]) -> Dict[str, tuple]:
     """
     Конвертирует словарь параметров в формат с явными типами для YDB
@@ -43,6 +115,9 @@ def _typed_params(params: Dict[str, Any]) -> Dict[str, tuple]:
             # Счетчики: review_count, correct_streak, rating, position
             else:
                 typed[key] = (value, ydb.OptionalType(ydb.PrimitiveType.Uint32))
+        elif isinstance(value, datetime):
+            # Колонки *_ts: Timestamp (микросекунды UTC)
+            typed[key] = (timestamp_us(value), ydb.OptionalType(ydb.PrimitiveType.Timestamp))
         elif value is None:
             # Для None используем Optional<Uint64> (можно изменить на другой тип если нужно)
             typed[key] = (None, ydb.OptionalType(ydb.PrimitiveType.Uint64))
@@ -90,13 +165,15 @@ class DictionaryManager:
         # with session.transaction().execute() and missing parameters
         self.pool = ydb.QuerySessionPool(self.driver)
 
-    def _execute_query(self, query: str, parameters: Dict = None):
+    def _execute_query(self, query: str, parameters: Dict = None, tx_mode=None):
         """
         Execute YQL query with automatic retries using QuerySessionPool
 
         Args:
             query: YQL query string
             parameters: Query parameters as dict
+            tx_mode: Режим транзакции только для чтения (TX_STALE_READ, TX_ONLINE_READ);
+                     None — serializable
 
         Returns:
             Query result
@@ -105,6 +182,12 @@ class DictionaryManager:
         typed_parameters = _typed_params(parameters) if parameters else {}
         logger.info(f"[DEBUG _execute_query] Typed params: {typed_parameters}")
 
+        if tx_mode is not None:
+            return self.pool.retry_tx_sync(
+                lambda tx: list(tx.execute(query, parameters=typed_parameters, commit_tx=True)),
+                tx_mode=tx_mode
+            )
+
         # Use execute_with_retries instead of session.transaction().execute()
         # to avoid SDK 3.23.0 bug with missing parameters
         return self.pool.execute_with_retries(
@@ -112,29 +195,23 @@ class DictionaryManager:
             parameters=typed_parameters
         )
 
-    def _fetch_one(self, query: str, parameters: Dict = None) -> Optional[Dict]:
+    def _fetch_one(self, query: str, parameters: Dict = None, tx_mode=None) -> Optional[Dict]:
         """Execute query and return first row as dict"""
-        result = self._execute_query(query, parameters)
+        result = self._execute_query(query, parameters, tx_mode)
 
         if not result or not result[0].rows:
             return None
 
-        row = result[0].rows[0]
-        columns = [col.name for col in result[0].columns]
-        return {col: getattr(row, col) for col in columns}
+        return dict(result[0].rows[0])
 
-    def _fetch_all(self, query: str, parameters: Dict = None) -> List[Dict]:
+    def _fetch_all(self, query: str, parameters: Dict = None, tx_mode=None) -> List[Dict]:
         """Execute query and return all rows as list of dicts"""
-        result = self._execute_query(query, parameters)
+        result = self._execute_query(query, parameters, tx_mode)
 
-        if not result or not result[0].rows:
+        if not result:
             return []
 
-        columns = [col.name for col in result[0].columns]
-        return [
-            {col: getattr(row, col) for col in columns}
-            for row in result[0].rows
-        ]
+        return rows_as_dicts(result[0])
 
     def _get_next_id(self, table_name: str) -> int:
         """
@@ -201,237 +278,211 @@ class DictionaryManager:
         logger.info(f"[DEBUG add_word] Adding word: lemma='{lemma}', type='{word_type}', user_id={user_id}")
 
         # Проверяем: есть ли слово с такой lemma?
-        if user_id is not None:
-            check_query = """
-            DECLARE $lemma AS Utf8?;
-            DECLARE $user_id AS Uint64?;
+        existing = self._find_word(lemma, user_id)
 
-            SELECT id FROM dictionary_words
-            WHERE lemma = $lemma AND user_id = $user_id
-            """
-            params = {
-                '$lemma': lemma,
-                '$user_id': user_id
-            }
-            logger.info(f"[DEBUG] Params before query: {params}")
-            logger.info(f"[DEBUG] lemma type={type(lemma)}, value={repr(lemma)}, user_id={user_id}")
-            existing = self._fetch_one(check_query, params)
-        else:
-            check_query = """
-            DECLARE $lemma AS Utf8?;
-
-            SELECT id FROM dictionary_words
-            WHERE lemma = $lemma AND user_id IS NULL
-            """
-            existing = self._fetch_one(check_query, {'$lemma': lemma})
-
-        now = datetime.now().isoformat()
+        moment = datetime.now()
+        now = moment.isoformat()
+        meanings = list(dict.fromkeys([main_translation] + list(additional_meanings)))
 
         if existing:
-            # Слово уже есть - добавляем новый перевод и пример
+            # Слово уже есть - добавляем новые переводы и пример
             word_id = existing['id']
+            doc = load_word_doc(existing['doc'])
+            known = word_doc_translations(doc) if doc else None
+            if known is None:
+                # Документа нет или в него вошли не все переводы — читаем историю слова
+                translations, examples = self._word_history(word_id, user_id)
+                known = [t['text'] for t in translations]
+                if doc is None:
+                    doc = merge_word_doc(None, translations, examples)
+            meanings = [meaning for meaning in meanings if meaning not in known]
+        else:
+            # Новое слово
+            word_id = self._get_next_id('dictionary_words')
+            doc = None
+
+        # Переводы, пример и документ слова пишутся одним запросом (одна транзакция).
+        # Документ собирается из прочитанного выше: при одновременном добавлении к
+        # одному слову в документ попадёт последнее, история — всё
+        # (пересборка — migrations/add_word_docs.py --rebuild)
+        new_translations = [
+            {'text': meaning, 'source_session_id': session_id, 'added_at': now}
+            for meaning in meanings
+        ]
+        new_example = {'original_form': original_word, 'context': context, 'session_id': session_id, 'added_at': now}
+        doc = merge_word_doc(doc, new_translations, [new_example])
+
+        first_translation_id = self._get_next_id('dictionary_translations') if meanings else 0
+        params = {
+            '$user_id': user_id,
+            '$word_id': word_id,
+            '$translation_rows': _translation_rows([
+                (first_translation_id + i, meaning) for i, meaning in enumerate(meanings)
+            ]),
+            '$example_id': self._get_next_id('dictionary_examples'),
+            '$original_form': original_word,
+            '$context': context,
+            '$session_id': session_id,
+            '$added_at': now,
+            '$added_ts': moment,
+            '$doc': dump_word_doc(doc)
+        }
 
-            # Добавляем основной перевод (если еще нет)
-            check_translation_query = """
-            DECLARE $word_id AS Uint64?;
-            DECLARE $translation AS Utf8?;
-
-            SELECT COUNT(*) AS count FROM dictionary_translations
-            WHERE word_id = $word_id AND translation = $translation
-            """
-            translation_exists = self._fetch_one(check_translation_query, {
-                '$word_id': word_id,
-                '$translation': main_translation
-            })
-
-            if translation_exists['count'] == 0:
-                translation_id = self._get_next_id('dictionary_translations')
-                insert_translation_query = """
-                DECLARE $id AS Uint64?;
-                DECLARE $word_id AS Uint64?;
-                DECLARE $translation AS Utf8?;
-                DECLARE $session_id AS Utf8?;
-                DECLARE $added_at AS Utf8?;
-
-                UPSERT INTO dictionary_translations (id, word_id, translation, source_session_id, added_at)
-                VALUES ($id, $word_id, $translation, $session_id, $added_at)
-                """
-                self._execute_query(insert_translation_query, {
-                    '$id': translation_id,
-                    '$word_id': word_id,
-                    '$translation': main_translation,
-                    '$session_id': session_id,
-                    '$added_at': now
-                })
-
-            # Добавляем дополнительные переводы
-            for meaning in additional_meanings:
-                check_meaning_query = """
-                DECLARE $word_id AS Uint64?;
-                DECLARE $translation AS Utf8?;
-
-                SELECT COUNT(*) AS count FROM dictionary_translations
-                WHERE word_id = $word_id AND translation = $translation
-                """
-                meaning_exists = self._fetch_one(check_meaning_query, {
-                    '$word_id': word_id,
-                    '$translation': meaning
-                })
-
-                if meaning_exists['count'] == 0:
-                    meaning_id = self._get_next_id('dictionary_translations')
-                    insert_meaning_query = """
-                    DECLARE $id AS Uint64?;
-                    DECLARE $word_id AS Uint64?;
-                    DECLARE $translation AS Utf8?;
-                    DECLARE $session_id AS Utf8?;
-                    DECLARE $added_at AS Utf8?;
-
-                    UPSERT INTO dictionary_translations (id, word_id, translation, source_session_id, added_at)
-                    VALUES ($id, $word_id, $translation, $session_id, $added_at)
-                    """
-                    self._execute_query(insert_meaning_query, {
-                        '$id': meaning_id,
-                        '$word_id': word_id,
-                        '$translation': meaning,
-                        '$session_id': session_id,
-                        '$added_at': now
-                    })
-
-            # Добавляем новый пример использования
-            example_id = self._get_next_id('dictionary_examples')
-            insert_example_query = """
-            DECLARE $id AS Uint64?;
-            DECLARE $word_id AS Uint64?;
-            DECLARE $original_form AS Utf8?;
-            DECLARE $context AS Utf8?;
-            DECLARE $session_id AS Utf8?;
-            DECLARE $added_at AS Utf8?;
-
-            UPSERT INTO dictionary_examples (id, word_id, original_form, context, session_id, added_at)
-            VALUES ($id, $word_id, $original_form, $context, $session_id, $added_at)
+        if existing:
+            update_word_query = _ADD_WORD_DECLARE + _ADD_WORD_HISTORY + """
+            UPDATE dictionary_words
+            SET doc = $doc
+            WHERE """ + _owner(user_id) + """ AND id = $word_id;
             """
-            self._execute_query(insert_example_query, {
-                '$id': example_id,
-                '$word_id': word_id,
-                '$original_form': original_word,
-                '$context': context,
-                '$session_id': session_id,
-                '$added_at': now
-            })
+            self._execute_query(update_word_query, params)
 
+            invalidate_typeahead(user_id)
             return {
                 'success': True,
                 'is_new': False,
                 'word_id': word_id,
+                'lemma': lemma,
                 'message': f'Добавлен новый пример к слову "{lemma}"'
             }
 
-        else:
-            # Новое слово - создаем запись
-            word_id = self._get_next_id('dictionary_words')
-
-            insert_word_query = """
-            DECLARE $id AS Uint64?;
-            DECLARE $user_id AS Uint64?;
-            DECLARE $lemma AS Utf8?;
-            DECLARE $type AS Utf8?;
-            DECLARE $status AS Utf8?;
-            DECLARE $added_at AS Utf8?;
-            DECLARE $review_count AS Uint32?;
-            DECLARE $correct_streak AS Uint32?;
-            DECLARE $rating AS Uint32?;
-
-            UPSERT INTO dictionary_words (id, user_id, lemma, type, status, added_at, review_count, correct_streak, rating)
-            VALUES ($id, $user_id, $lemma, $type, $status, $added_at, $review_count, $correct_streak, $rating)
-            """
-
+        insert_word_query = _ADD_WORD_DECLARE + """
+        DECLARE $lemma AS Utf8?;
+        DECLARE $type AS Utf8?;
+        DECLARE $status AS Utf8?;
+        DECLARE $review_count AS Uint32?;
+        DECLARE $correct_streak AS Uint32?;
+        DECLARE $rating AS Uint32?;
+        """ + COUNTER_ROWS_DECLARE + SEARCH_ROWS_DECLARE + """
+
+        SELECT Ensure(COUNT(*), COUNT(*) = 0, '""" + _WORD_EXISTS + """') AS words
+        FROM dictionary_words VIEW idx_user_lemma
+        WHERE lemma = $lemma AND """ + _owner(user_id) + """;
+
+        $deltas = (SELECT * FROM AS_TABLE($counter_rows));
+        """ + APPLY_COUNTER_DELTAS + INDEX_SEARCH_ROWS + """
+        UPSERT INTO dictionary_words (id, user_id, lemma, type, status, added_at, added_ts, review_count, correct_streak, rating, doc)
+        VALUES ($word_id, $user_id, $lemma, $type, $status, $added_at, $added_ts, $review_count, $correct_streak, $rating, $doc);
+        """ + _ADD_WORD_HISTORY
+        # В очередь повторений (word_schedule) слово попадает после первого ответа:
+        # новые слова вводит 8-шаговый алгоритм TrainingService
+
+        scope = counter_scope(user_id)
+        try:
             self._execute_query(insert_word_query, {
-                '$id': word_id,
-                '$user_id': user_id,
+                **params,
+                '$counter_rows': counter_rows([
+                    (scope, f'type:{word_type}', 1),
+                    (scope, 'status:new', 1),
+                    (global_scope(word_id), 'dictionary_words', 1),
+                ]),
+                '$search_rows': search_rows([(scope, word_id, 0, lemma)]),
                 '$lemma': lemma,
                 '$type': word_type,
                 '$status': 'new',
-                '$added_at': now,
                 '$review_count': 0,
                 '$correct_streak': 0,
                 '$rating': 0
             })
+        except Exception as e:
+            if _WORD_EXISTS not in str(e):
+                raise
+            # Слово добавлено другим процессом после загрузки набора
+            logger.info(f"[DICTIONARY] Слово '{lemma}' уже есть (user_id={user_id}), повторяем добавление")
+            invalidate_dictionary(user_id)
+            return self.add_word(highlight_dict, session_id, user_id)
+
+        invalidate_dictionary(user_id)
+        invalidate_typeahead(user_id)
+        return {
+            'success': True,
+            'is_new': True,
+            'word_id': word_id,
+            'lemma': lemma,
+            'message': f'Слово "{lemma}" добавлено в словарь'
+        }
 
-            # Добавляем основной перевод
-            translation_id = self._get_next_id('dictionary_translations')
-            insert_translation_query = """
-            DECLARE $id AS Uint64?;
-            DECLARE $word_id AS Uint64?;
-            DECLARE $translation AS Utf8?;
-            DECLARE $session_id AS Utf8?;
-            DECLARE $added_at AS Utf8?;
+    def _find_word(self, lemma: str, user_id: Optional[int]) -> Optional[Dict]:
+        """
+        Слово владельца с такой lemma: {'id', 'doc'} или None
 
-            UPSERT INTO dictionary_translations (id, word_id, translation, source_session_id, added_at)
-            VALUES ($id, $word_id, $translation, $session_id, $added_at)
-            """
-            self._execute_query(insert_translation_query, {
-                '$id': translation_id,
-                '$word_id': word_id,
-                '$translation': main_translation,
-                '$session_id': session_id,
-                '$added_at': now
-            })
+        Для пользователя наличие слова берётся из DictionaryCache, doc найденного
+        слова читается по первичному ключу. Для anonymous — индекс idx_user_lemma.
+        """
+        if user_id is not None:
+            words = get_dictionary_cache().words(
+                user_id, lambda: self._fetch_all(WORD_SET_QUERY, {'$user_id': user_id}, tx_mode=TX_ONLINE_READ))
+            cached = words.get(lemma)
+            if cached is None:
+                return None
 
-            # Добавляем дополнительные переводы
-            for meaning in additional_meanings:
-                meaning_id = self._get_next_id('dictionary_translations')
-                insert_meaning_query = """
-                DECLARE $id AS Uint64?;
-                DECLARE $word_id AS Uint64?;
-                DECLARE $translation AS Utf8?;
-                DECLARE $session_id AS Utf8?;
-                DECLARE $added_at AS Utf8?;
-
-                UPSERT INTO dictionary_translations (id, word_id, translation, source_session_id, added_at)
-                VALUES ($id, $word_id, $translation, $session_id, $added_at)
-                """
-                self._execute_query(insert_meaning_query, {
-                    '$id': meaning_id,
-                    '$word_id': word_id,
-                    '$translation': meaning,
-                    '$session_id': session_id,
-                    '$added_at': now
-                })
-
-            # Добавляем первый пример использования
-            example_id = self._get_next_id('dictionary_examples')
-            insert_example_query = """
+            row = self._fetch_one("""
+            DECLARE $user_id AS Uint64?;
             DECLARE $id AS Uint64?;
-            DECLARE $word_id AS Uint64?;
-            DECLARE $original_form AS Utf8?;
-            DECLARE $context AS Utf8?;
-            DECLARE $session_id AS Utf8?;
-            DECLARE $added_at AS Utf8?;
+            DECLARE $lemma AS Utf8?;
 
-            UPSERT INTO dictionary_examples (id, word_id, original_form, context, session_id, added_at)
-            VALUES ($id, $word_id, $original_form, $context, $session_id, $added_at)
-            """
-            self._execute_query(insert_example_query, {
-                '$id': example_id,
-                '$word_id': word_id,
-                '$original_form': original_word,
-                '$context': context,
-                '$session_id': session_id,
-                '$added_at': now
-            })
+            SELECT id, doc FROM dictionary_words
+            WHERE user_id = $user_id AND id = $id AND lemma = $lemma
+            """, {'$user_id': user_id, '$id': cached['id'], '$lemma': lemma})
+            if row:
+                return row
+            # Слово удалено другим процессом — набор устарел
+            invalidate_dictionary(user_id)
 
-            return {
-                'success': True,
-                'is_new': True,
-                'word_id': word_id,
-                'message': f'Слово "{lemma}" добавлено в словарь'
-            }
+        check_query = """
+        DECLARE $lemma AS Utf8?;
+        DECLARE $user_id AS Uint64?;
+
+        SELECT id, doc FROM dictionary_words VIEW idx_user_lemma
+        WHERE lemma = $lemma AND """ + _owner(user_id) + """
+        """
+        return self._fetch_one(check_query, {'$lemma': lemma, '$user_id': user_id})
+
+    def _word_history(self, word_id: int, user_id: Optional[int]) -> tuple:
+        """
+        Все переводы и примеры слова из dictionary_translations / dictionary_examples
+
+        Нужны для слов без документа (записаны до его появления) и для переводов,
+        не вошедших в документ.
+
+        Returns:
+            ([{'text', 'source_session_id', 'added_at'}], [{'original_form', 'context', 'session_id', 'added_at'}])
+            в порядке добавления
+        """
+        translations_query = f"""
+        DECLARE $user_id AS Uint64?;
+        DECLARE $word_id AS Uint64?;
+
+        SELECT translation, source_session_id, added_at
+        FROM dictionary_translations
+        WHERE {_owner(user_id)} AND word_id = $word_id
+        ORDER BY id ASC
+        """
+        translation_rows = self._fetch_all(translations_query, {'$user_id': user_id, '$word_id': word_id})
+
+        examples_query = f"""
+        DECLARE $user_id AS Uint64?;
+        DECLARE $word_id AS Uint64?;
+
+        SELECT original_form, context, session_id, added_at
+        FROM dictionary_examples
+        WHERE {_owner(user_id)} AND word_id = $word_id
+        ORDER BY id ASC
+        """
+        example_rows = self._fetch_all(examples_query, {'$user_id': user_id, '$word_id': word_id})
+
+        translations = [
+            {'text': row['translation'], 'source_session_id': row['source_session_id'], 'added_at': row['added_at']}
+            for row in translation_rows
+        ]
+        return translations, example_rows
 
     def get_word(self, lemma: str, user_id: Optional[int] = None) -> Optional[Dict]:
         """
         Получить слово с деталями (переводы + примеры)
 
+        Переводы и примеры берутся из документа слова: examples — первый пример
+        и последние добавленные, всего примеров — examples_count.
+
         Args:
             lemma: Словарная форма слова
             user_id: ID пользователя (None для anonymous)
@@ -456,77 +507,56 @@ class DictionaryManager:
                         '$session_id': 'session_123',
                         '$added_at': '2024-12-09T10:00:00'
                     }
-                ]
+                ],
+                'examples_count': 1
             }
         """
-        # Получаем основную информацию о слове
+        # Слово с документом — одно чтение строки
         if user_id is not None:
             word_query = """
             DECLARE $lemma AS Utf8?;
             DECLARE $user_id AS Uint64?;
 
-            SELECT id, type, status, added_at, last_reviewed_at, review_count, correct_streak
-            FROM dictionary_words
+            SELECT id, type, status, added_at, last_reviewed_at, review_count, correct_streak, doc
+            FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id = $user_id
             """
             word_row = self._fetch_one(word_query, {
                 '$lemma': lemma,
                 '$user_id': user_id
-            })
+            }, tx_mode=TX_ONLINE_READ)
         else:
             word_query = """
             DECLARE $lemma AS Utf8?;
 
-            SELECT id, type, status, added_at, last_reviewed_at, review_count, correct_streak
-            FROM dictionary_words
+            SELECT id, type, status, added_at, last_reviewed_at, review_count, correct_streak, doc
+            FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id IS NULL
             """
-            word_row = self._fetch_one(word_query, {'$lemma': lemma})
+            word_row = self._fetch_one(word_query, {'$lemma': lemma}, tx_mode=TX_ONLINE_READ)
 
         if not word_row:
             return None
 
-        word_id = word_row['id']
-
-        # Получаем переводы
-        translations_query = """
-        DECLARE $word_id AS Uint64?;
-
-        SELECT translation, source_session_id, added_at
-        FROM dictionary_translations
-        WHERE word_id = $word_id
-        ORDER BY added_at ASC
-        """
-        translation_rows = self._fetch_all(translations_query, {'$word_id': word_id})
+        doc = self._word_doc(word_row, user_id)
 
         translations = [
             {
-                'text': row['translation'],
-                'source_session_id': row['source_session_id'],
-                '$added_at': row['added_at']
+                'text': t['text'],
+                'source_session_id': t['source_session_id'],
+                '$added_at': t['added_at']
             }
-            for row in translation_rows
+            for t in doc['translations']
         ]
 
-        # Получаем примеры
-        examples_query = """
-        DECLARE $word_id AS Uint64?;
-
-        SELECT original_form, context, session_id, added_at
-        FROM dictionary_examples
-        WHERE word_id = $word_id
-        ORDER BY added_at ASC
-        """
-        example_rows = self._fetch_all(examples_query, {'$word_id': word_id})
-
         examples = [
             {
-                'original_form': row['original_form'],
-                'context': row['context'],
-                'session_id': row['session_id'],
-                'added_at': row['added_at']
+                'original_form': e['original_form'],
+                'context': e['context'],
+                'session_id': e['session_id'],
+                'added_at': e['added_at']
             }
-            for row in example_rows
+            for e in doc['examples']
         ]
 
         return {
@@ -538,7 +568,8 @@ class DictionaryManager:
             'review_count': word_row['review_count'],
             'correct_streak': word_row['correct_streak'],
             'translations': translations,
-            'examples': examples
+            'examples': examples,
+            'examples_count': doc['examples_count']
         }
 
     def get_all_words(self, user_id: Optional[int] = None, filters: Optional[Dict] = None) -> List[Dict]:
@@ -562,68 +593,48 @@ class DictionaryManager:
                 }
             ]
         """
-        # Получаем все слова
+        # Все слова с документами — одно чтение диапазона ключа
         if user_id is not None:
             words_query = """
             DECLARE $user_id AS Uint64?;
 
-            SELECT id, lemma, type, status, rating, added_at
+            SELECT id, lemma, type, status, rating, added_at, doc
             FROM dictionary_words
             WHERE user_id = $user_id
-            ORDER BY added_at DESC
+            ORDER BY added_ts DESC
             """
-            word_rows = self._fetch_all(words_query, {'$user_id': user_id})
+            word_rows = self._fetch_all(words_query, {'$user_id': user_id}, tx_mode=TX_ONLINE_READ)
         else:
             words_query = """
-            SELECT id, lemma, type, status, rating, added_at
+            SELECT id, lemma, type, status, rating, added_at, doc
             FROM dictionary_words
             WHERE user_id IS NULL
-            ORDER BY added_at DESC
+            ORDER BY added_ts DESC
             """
-            word_rows = self._fetch_all(words_query)
+            word_rows = self._fetch_all(words_query, tx_mode=TX_ONLINE_READ)
 
         words = []
         for row in word_rows:
-            word_id = row['id']
-            lemma = row['lemma']
-            word_type = row['type']
-            status = row['status']
-            rating = row.get('rating', 0)
-            added_at = row['added_at']
-
-            # Получаем переводы
-            translations_query = """
-            DECLARE $word_id AS Uint64?;
-
-            SELECT translation FROM dictionary_translations
-            WHERE word_id = $word_id
-            ORDER BY added_at ASC
-            """
-            translation_rows = self._fetch_all(translations_query, {'$word_id': word_id})
-            translations = [t['translation'] for t in translation_rows]
-
-            # Получаем количество примеров
-            examples_count_query = """
-            DECLARE $word_id AS Uint64?;
-
-            SELECT COUNT(*) AS count FROM dictionary_examples
-            WHERE word_id = $word_id
-            """
-            examples_count_row = self._fetch_one(examples_count_query, {'$word_id': word_id})
-            examples_count = examples_count_row['count'] if examples_count_row else 0
-
+            doc = self._word_doc(row, user_id)
             words.append({
-                'lemma': lemma,
-                'type': word_type,
-                'translations': translations,
-                'examples_count': examples_count,
-                'status': status,
-                'rating': rating,
-                'added_at': added_at
+                'lemma': row['lemma'],
+                'type': row['type'],
+                'translations': [t['text'] for t in doc['translations']],
+                'examples_count': doc['examples_count'],
+                'status': row['status'],
+                'rating': row.get('rating', 0),
+                'added_at': row['added_at']
             })
 
         return words
 
+    def _word_doc(self, word_row: Dict, user_id: Optional[int]) -> Dict:
+        """Документ слова из строки dictionary_words (для слов без документа — из истории)"""
+        doc = load_word_doc(word_row.get('doc'))
+        if doc is None:
+            doc = merge_word_doc(None, *self._word_history(word_row['id'], user_id))
+        return doc
+
     def delete_word(self, lemma: str, user_id: Optional[int] = None) -> Dict:
         """
         Удалить слово из словаря
@@ -642,7 +653,7 @@ class DictionaryManager:
             DECLARE $lemma AS Utf8?;
             DECLARE $user_id AS Uint64?;
 
-            SELECT id FROM dictionary_words
+            SELECT id, type, status FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id = $user_id
             """
             word_row = self._fetch_one(check_query, {
@@ -653,7 +664,7 @@ class DictionaryManager:
             check_query = """
             DECLARE $lemma AS Utf8?;
 
-            SELECT id FROM dictionary_words
+            SELECT id, type, status FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id IS NULL
             """
             word_row = self._fetch_one(check_query, {'$lemma': lemma})
@@ -673,56 +684,116 @@ class DictionaryManager:
             # ВАЖНО: Удаляем highlights ПЕРВЫМИ, чтобы они не ссылались на несуществующий word_id
             delete_highlights_query = """
                 DECLARE $word_id AS Uint64?;
-
-            DELETE FROM highlights
+                DECLARE $global_scope AS Utf8?;
+
+            $deltas = (
+                SELECT $global_scope AS scope, 'highlights'u AS name, -CAST(COUNT(*) AS Int64) AS delta
+                FROM highlights VIEW idx_word_id
+                WHERE word_id = $word_id
+            );
+            """ + APPLY_COUNTER_DELTAS + """
+            DELETE FROM highlights ON
+            SELECT id FROM highlights VIEW idx_word_id
             WHERE word_id = $word_id
             """
-            self._execute_query(delete_highlights_query, {'$word_id': word_id})
+            self._execute_query(delete_highlights_query, {
+                '$word_id': word_id,
+                '$global_scope': global_scope(word_id)
+            })
             logger.info(f"[DELETE] Удалены highlights для word_id={word_id}")
         except Exception as e:
             logger.error(f"[DELETE] Ошибка удаления highlights: {e}")
 
         try:
             # 2. Delete translations
-            delete_translations_query = """
+            delete_translations_query = f"""
+                DECLARE $user_id AS Uint64?;
                 DECLARE $word_id AS Uint64?;
 
             DELETE FROM dictionary_translations
-            WHERE word_id = $word_id
+            WHERE {_owner(user_id)} AND word_id = $word_id
             """
-            self._execute_query(delete_translations_query, {'$word_id': word_id})
+            self._execute_query(delete_translations_query, {'$user_id': user_id, '$word_id': word_id})
             logger.info(f"[DELETE] Удалены translations для word_id={word_id}")
         except Exception as e:
             logger.error(f"[DELETE] Ошибка удаления translations: {e}")
 
         try:
             # 3. Delete examples
-            delete_examples_query = """
+            delete_examples_query = f"""
+                DECLARE $user_id AS Uint64?;
                 DECLARE $word_id AS Uint64?;
 
             DELETE FROM dictionary_examples
-            WHERE word_id = $word_id
+            WHERE {_owner(user_id)} AND word_id = $word_id
             """
-            self._execute_query(delete_examples_query, {'$word_id': word_id})
+            self._execute_query(delete_examples_query, {'$user_id': user_id, '$word_id': word_id})
             logger.info(f"[DELETE] Удалены examples для word_id={word_id}")
         except Exception as e:
             logger.error(f"[DELETE] Ошибка удаления examples: {e}")
 
-        try:
-            # 4. Delete word (последним)
-            delete_word_query = """
-                DECLARE $word_id AS Uint64?;
+        # 4. Delete word (последним) вместе с постингами, расписанием и готовыми
+        # тестами. Тип и статус для счётчиков читаются в той же транзакции
+        schedule_delete = """
+            DELETE FROM word_schedule
+            WHERE user_id = $user_id AND word_id = $word_id;
 
+            DELETE FROM test_pool
+            WHERE user_id = $user_id AND word_id = $word_id;
+            """ if user_id is not None else ""
+        delete_word_query = """
+            DECLARE $user_id AS Uint64?;
+            DECLARE $word_id AS Uint64?;
+            DECLARE $scope AS Utf8?;
+            DECLARE $global_scope AS Utf8?;
+            DECLARE $terms AS List<Utf8>;
+
+            $word = (
+                SELECT type, status FROM dictionary_words
+                WHERE """ + _owner(user_id) + """ AND id = $word_id
+            );
+
+            SELECT Ensure(COUNT(*), COUNT(*) > 0, '""" + _WORD_MISSING + """') AS words
+            FROM $word;
+
+            $deltas = (
+                SELECT $scope AS scope, 'type:'u || type AS name, -1l AS delta FROM $word
+                UNION ALL
+                SELECT $scope AS scope, 'status:'u || COALESCE(status, 'new'u) AS name, -1l AS delta FROM $word
+                UNION ALL
+                SELECT $global_scope AS scope, 'dictionary_words'u AS name, -1l AS delta FROM $word
+            );
+            """ + APPLY_COUNTER_DELTAS + """
+            DELETE FROM search_index ON
+            SELECT scope, term, word_id, analysis_id FROM search_index
+            WHERE scope = $scope AND term IN $terms AND word_id = $word_id;
+            """ + schedule_delete + """
             DELETE FROM dictionary_words
-            WHERE id = $word_id
+            WHERE """ + _owner(user_id) + """ AND id = $word_id
             """
-            self._execute_query(delete_word_query, {'$word_id': word_id})
+        try:
+            self._execute_query(delete_word_query, {
+                '$user_id': user_id,
+                '$word_id': word_id,
+                '$scope': counter_scope(user_id),
+                '$global_scope': global_scope(word_id),
+                '$terms': ydb.TypedValue(search_terms(lemma), ydb.ListType(ydb.PrimitiveType.Utf8))
+            })
             logger.info(f"[DELETE] Удалено слово word_id={word_id}")
         except Exception as e:
-            logger.error(f"[DELETE] Ошибка удаления слова: {e}")
-            raise
+            if _WORD_MISSING not in str(e):
+                logger.error(f"[DELETE] Ошибка удаления слова: {e}")
+                raise
+            # Слово удалено другим запросом после поиска по lemma
+            logger.warning(f"[DELETE] Слово '{lemma}' (id={word_id}) уже удалено для user_id={user_id}")
+            return {
+                'success': False,
+                'message': f'Слово "{lemma}" не найдено в словаре'
+            }
 
         logger.info(f"[DELETE] Успешно удалено слово '{lemma}' и все связанные данные")
+        invalidate_dictionary(user_id)
+        invalidate_typeahead(user_id)
         return {
             'success': True,
             'message': f'Слово "{lemma}" удалено из словаря'
@@ -747,61 +818,22 @@ class DictionaryManager:
                 }
             }
         """
-        # Общее количество слов
-        if user_id is not None:
-            words_query = """
-            DECLARE $user_id AS Uint64?;
-
-            SELECT COUNT(*) AS count FROM dictionary_words
-            WHERE user_id = $user_id AND type = 'word'
-            """
-            words_result = self._fetch_one(words_query, {'$user_id': user_id})
-        else:
-            words_query = """
-            SELECT COUNT(*) AS count FROM dictionary_words
-            WHERE user_id IS NULL AND type = 'word'
-            """
-            words_result = self._fetch_one(words_query)
-
-        total_words = words_result['count'] if words_result else 0
-
-        # Общее количество фраз
-        if user_id is not None:
-            phrases_query = """
-            DECLARE $user_id AS Uint64?;
-
-            SELECT COUNT(*) AS count FROM dictionary_words
-            WHERE user_id = $user_id AND type = 'expression'
-            """
-            phrases_result = self._fetch_one(phrases_query, {'$user_id': user_id})
-        else:
-            phrases_query = """
-            SELECT COUNT(*) AS count FROM dictionary_words
-            WHERE user_id IS NULL AND type = 'expression'
-            """
-            phrases_result = self._fetch_one(phrases_query)
-
-        total_phrases = phrases_result['count'] if phrases_result else 0
-
-        # Разбивка по статусам
-        if user_id is not None:
-            status_query = """
-            DECLARE $user_id AS Uint64?;
-
-            SELECT status, COUNT(*) AS count FROM dictionary_words
-            WHERE user_id = $user_id
-            GROUP BY status
-            """
-            status_rows = self._fetch_all(status_query, {'$user_id': user_id})
-        else:
-            status_query = """
-            SELECT status, COUNT(*) AS count FROM dictionary_words
-            WHERE user_id IS NULL
-            GROUP BY status
-            """
-            status_rows = self._fetch_all(status_query)
-
-        status_breakdown = {row['status']: row['count'] for row in status_rows}
+        # Все счётчики словаря — одно чтение по префиксу ключа counters (stale read)
+        rows = self._fetch_all("""
+        DECLARE $scope AS Utf8?;
+
+        SELECT name, value FROM counters
+        WHERE scope = $scope
+        """, {'$scope': counter_scope(user_id)}, tx_mode=TX_STALE_READ)
+        counters = {row['name']: row['value'] or 0 for row in rows}
+
+        total_words = counters.get('type:word', 0)
+        total_phrases = counters.get('type:expression', 0)
+        status_breakdown = {
+            name[len('status:'):]: value
+            for name, value in counters.items()
+            if name.startswith('status:') and value
+        }
 
         return {
             'total_words': total_words,
@@ -834,7 +866,13 @@ class DictionaryManager:
             DECLARE $lemma AS Utf8?;
             DECLARE $status AS Utf8?;
             DECLARE $user_id AS Uint64?;
+            DECLARE $scope AS Utf8?;
 
+            $old = (
+                SELECT COALESCE(status, 'new'u) AS status FROM dictionary_words VIEW idx_user_lemma
+                WHERE lemma = $lemma AND user_id = $user_id
+            );
+            """ + _STATUS_DELTAS + APPLY_COUNTER_DELTAS + """
             UPDATE dictionary_words
             SET status = $status
             WHERE lemma = $lemma AND user_id = $user_id
@@ -842,20 +880,28 @@ class DictionaryManager:
             self._execute_query(update_query, {
                 '$status': status,
                 '$lemma': lemma,
-                '$user_id': user_id
+                '$user_id': user_id,
+                '$scope': counter_scope(user_id)
             })
         else:
             update_query = """
             DECLARE $lemma AS Utf8?;
             DECLARE $status AS Utf8?;
+            DECLARE $scope AS Utf8?;
 
+            $old = (
+                SELECT COALESCE(status, 'new'u) AS status FROM dictionary_words VIEW idx_user_lemma
+                WHERE lemma = $lemma AND user_id IS NULL
+            );
+            """ + _STATUS_DELTAS + APPLY_COUNTER_DELTAS + """
             UPDATE dictionary_words
             SET status = $status
             WHERE lemma = $lemma AND user_id IS NULL
             """
             self._execute_query(update_query, {
                 '$status': status,
-                '$lemma': lemma
+                '$lemma': lemma,
+                '$scope': counter_scope(None)
             })
 
         # Check if update was successful by checking if word exists
@@ -864,7 +910,7 @@ class DictionaryManager:
             DECLARE $lemma AS Utf8?;
             DECLARE $user_id AS Uint64?;
 
-            SELECT COUNT(*) AS count FROM dictionary_words
+            SELECT COUNT(*) AS count FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id = $user_id
             """
             result = self._fetch_one(check_query, {
@@ -875,11 +921,12 @@ class DictionaryManager:
             check_query = """
             DECLARE $lemma AS Utf8?;
 
-            SELECT COUNT(*) AS count FROM dictionary_words
+            SELECT COUNT(*) AS count FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id IS NULL
             """
             result = self._fetch_one(check_query, {'$lemma': lemma})
 
+        invalidate_dictionary(user_id)
         if result and result['count'] > 0:
             return {
                 'success': True,
@@ -915,7 +962,7 @@ class DictionaryManager:
             DECLARE $user_id AS Uint64?;
 
             SELECT correct_streak, review_count, status
-            FROM dictionary_words
+            FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id = $user_id
             """
             word_row = self._fetch_one(word_query, {
@@ -927,7 +974,7 @@ class DictionaryManager:
             DECLARE $lemma AS Utf8?;
 
             SELECT correct_streak, review_count, status
-            FROM dictionary_words
+            FROM dictionary_words VIEW idx_user_lemma
             WHERE lemma = $lemma AND user_id IS NULL
             """
             word_row = self._fetch_one(word_query, {'$lemma': lemma})
@@ -955,30 +1002,43 @@ class DictionaryManager:
         elif review_count == 0 and current_status == 'new':
             new_status = 'learning'  # Первая тренировка
 
-        now = datetime.now().isoformat()
+        moment = datetime.now()
+        now = moment.isoformat()
+
+        # Переход статуса → счётчики словаря (в той же транзакции, что и запись)
+        deltas = []
+        if new_status != current_status:
+            scope = counter_scope(user_id)
+            deltas = [(scope, f'status:{new_status}', 1), (scope, f"status:{current_status or 'new'}", -1)]
 
         # Обновляем запись
         if user_id is not None:
             update_query = """
             DECLARE $correct_streak AS Uint32?;
             DECLARE $last_reviewed_at AS Utf8?;
+            DECLARE $last_reviewed_ts AS Timestamp?;
             DECLARE $lemma AS Utf8?;
             DECLARE $review_count AS Uint32?;
             DECLARE $status AS Utf8?;
             DECLARE $user_id AS Uint64?;
-
+            """ + COUNTER_ROWS_DECLARE + """
+            $deltas = (SELECT * FROM AS_TABLE($counter_rows));
+            """ + APPLY_COUNTER_DELTAS + """
             UPDATE dictionary_words
             SET
                 correct_streak = $correct_streak,
                 review_count = $review_count,
                 last_reviewed_at = $last_reviewed_at,
+                last_reviewed_ts = $last_reviewed_ts,
                 status = $status
             WHERE lemma = $lemma AND user_id = $user_id
             """
             self._execute_query(update_query, {
+                '$counter_rows': counter_rows(deltas),
                 '$correct_streak': new_streak,
                 '$review_count': review_count + 1,
                 '$last_reviewed_at': now,
+                '$last_reviewed_ts': moment,
                 '$status': new_status,
                 '$lemma': lemma,
                 '$user_id': user_id
@@ -987,26 +1047,33 @@ class DictionaryManager:
             update_query = """
             DECLARE $correct_streak AS Uint32?;
             DECLARE $last_reviewed_at AS Utf8?;
+            DECLARE $last_reviewed_ts AS Timestamp?;
             DECLARE $lemma AS Utf8?;
             DECLARE $review_count AS Uint32?;
             DECLARE $status AS Utf8?;
-
+            """ + COUNTER_ROWS_DECLARE + """
+            $deltas = (SELECT * FROM AS_TABLE($counter_rows));
+            """ + APPLY_COUNTER_DELTAS + """
             UPDATE dictionary_words
             SET
                 correct_streak = $correct_streak,
                 review_count = $review_count,
                 last_reviewed_at = $last_reviewed_at,
+                last_reviewed_ts = $last_reviewed_ts,
                 status = $status
             WHERE lemma = $lemma AND user_id IS NULL
             """
             self._execute_query(update_query, {
+                '$counter_rows': counter_rows(deltas),
                 '$correct_streak': new_streak,
                 '$review_count': review_count + 1,
                 '$last_reviewed_at': now,
+                '$last_reviewed_ts': moment,
                 '$status': new_status,
                 '$lemma': lemma
             })
 
+        invalidate_dictionary(user_id)
         return {
             'success': True,
             'new_status': new_status,
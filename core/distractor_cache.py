@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+DistractorCache - общий (не зависящий от пользователя) кэш вариантов ответов
+
+Ключ — нормализованная тройка (lemma, translation, test_mode): варианты для
+"threshold → порог" одинаково подходят всем пользователям. Для ключа хранится
+до DISTRACTOR_MAX_SETS наборов; при каждом использовании берётся набор,
+который дольше всех не показывался, поэтому тесты не повторяются дословно.
+
+Два уровня:
+  - таблица distractor_sets в YDB (TTL по created_at удаляет старые наборы);
+  - LRU в памяти процесса с TTL, чтобы не ходить в YDB на каждый тест.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Set, Tuple, Optional
+
+from database import WordoorioDatabase
+
+logger = logging.getLogger(__name__)
+
+DISTRACTOR_MAX_SETS = int(os.getenv('DISTRACTOR_MAX_SETS', '3'))
+DISTRACTOR_CACHE_SIZE = int(os.getenv('DISTRACTOR_CACHE_SIZE', '5000'))
+DISTRACTOR_CACHE_TTL = int(os.getenv('DISTRACTOR_CACHE_TTL', '3600'))
+
+MICROSECONDS = 1_000_000
+
+
+def normalize(text: str) -> str:
+    """Нормализация части ключа: регистр, ё/е, лишние пробелы"""
+    return ' '.join((text or '').lower().replace('ё', 'е').split())
+
+
+def _to_epoch_seconds(value) -> float:
+    """Timestamp из YDB (datetime или микросекунды) → секунды epoch"""
+    if value is None:
+        return 0.0
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value / MICROSECONDS
+
+
+class DistractorCache:
+    """Наборы неправильных вариантов с ротацией"""
+
+    def __init__(self, db: WordoorioDatabase, max_entries: int = DISTRACTOR_CACHE_SIZE,
+                 ttl_seconds: int = DISTRACTOR_CACHE_TTL):
+        self.db = db
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (lemma, translation, test_mode) → {'loaded_at': float, 'sets': [{'set_id', 'options', 'last_used_at'}]}
+        self._entries: "OrderedDict[Tuple[str, str, int], Dict]" = OrderedDict()
+
+    @staticmethod
+    def _key(word_data: Dict, test_mode: int) -> Tuple[str, str, int]:
+        return normalize(word_data['word']), normalize(word_data['correct_translation']), test_mode
+
+    def _get_entry(self, key, now: float) -> Optional[Dict]:
+        """Запись из LRU (None если нет или истёк TTL). Вызывать под self._lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry['loaded_at'] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put_entry(self, key, sets: List[Dict], now: float):
+        """Положить запись в LRU с вытеснением самых старых. Вызывать под self._lock"""
+        self._entries[key] = {'loaded_at': now, 'sets': sets}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, keys: List[Tuple[str, str, int]], test_mode: int, now: float):
+        """Догрузить ключи из YDB одним запросом (ключи без наборов тоже кэшируются)"""
+        try:
+            rows = self.db.get_distractor_sets(
+                [{'lemma': lemma, 'translation': translation} for lemma, translation, _ in keys],
+                test_mode
+            )
+        except Exception as e:
+            logger.error(f"[DistractorCache] Ошибка чтения distractor_sets: {e}")
+            return
+
+        loaded = {key: [] for key in keys}
+        for row in rows:
+            key = (row['lemma'], row['translation'], test_mode)
+            if key in loaded:
+                loaded[key].append({
+                    'set_id': row['set_id'],
+                    'options': [row['wrong_option_1'], row['wrong_option_2'], row['wrong_option_3']],
+                    'last_used_at': _to_epoch_seconds(row.get('last_used_at')),
+                })
+
+        with self._lock:
+            for key, sets in loaded.items():
+                self._put_entry(key, sets, now)
+
+    def take(self, words_data: List[Dict], test_mode: int) -> Tuple[Dict[int, List[str]], Set[int]]:
+        """
+        Выдать варианты из кэша (по одному набору на слово, с ротацией)
+
+        Args:
+            words_data: [{'word', 'correct_translation', 'word_id'}, ...]
+            test_mode: 1 = EN→RU, 2 = RU→EN
+
+        Returns:
+            ({word_id: [wrong_1, wrong_2, wrong_3]}, word_id с неполным числом наборов)
+        """
+        now = time.time()
+        keys = {w['word_id']: self._key(w, test_mode) for w in words_data}
+
+        with self._lock:
+            missing = [key for key in set(keys.values()) if self._get_entry(key, now) is None]
+        if missing:
+            self._load(missing, test_mode, now)
+
+        options = {}
+        growable = set()
+        touched = []
+        with self._lock:
+            for word_id, key in keys.items():
+                entry = self._entries.get(key)
+                sets = entry['sets'] if entry else []
+                if len(sets) < DISTRACTOR_MAX_SETS:
+                    growable.add(word_id)
+                if not sets:
+                    continue
+
+                # Ротация: набор, который дольше всех не использовался
+                chosen = min(sets, key=lambda s: s['last_used_at'])
+                chosen['last_used_at'] = now
+                options[word_id] = list(chosen['options'])
+                touched.append({
+                    'lemma': key[0],
+                    'translation': key[1],
+                    'test_mode': test_mode,
+                    'set_id': chosen['set_id'],
+                    'last_used_at': int(now * MICROSECONDS),
+                })
+
+        try:
+            self.db.touch_distractor_sets(touched)
+        except Exception as e:
+            logger.warning(f"[DistractorCache] Не удалось обновить last_used_at: {e}")
+
+        logger.info(f"[DistractorCache] mode={test_mode}: из кэша {len(options)} из {len(keys)} слов")
+        return options, growable
+
+    def store(self, words_data: List[Dict], options: Dict[int, List[str]], test_mode: int):
+        """
+        Сохранить новые наборы вариантов (при заполненном ключе заменяется самый давний)
+
+        Args:
+            words_data: [{'word', 'correct_translation', 'word_id'}, ...]
+            options: {word_id: [wrong_1, wrong_2, wrong_3]} — от AI, после валидации
+            test_mode: 1 = EN→RU, 2 = RU→EN
+        """
+        now = time.time()
+        rows = []
+
+        # Текущие наборы нужны, чтобы не перезаписать чужой set_id
+        keys = {self._key(w, test_mode) for w in words_data if options.get(w['word_id'])}
+        with self._lock:
+            missing = [key for key in keys if self._get_entry(key, now) is None]
+        if missing:
+            self._load(missing, test_mode, now)
+
+        with self._lock:
+            for w in words_data:
+                wrong_options = options.get(w['word_id'])
+                if not wrong_options:
+                    continue
+
+                key = self._key(w, test_mode)
+                entry = self._entries.get(key)
+                sets = entry['sets'] if entry else []
+
+                if any(s['options'] == wrong_options for s in sets):
+                    continue
+
+                new_set = {'options': list(wrong_options), 'last_used_at': now}
+                if len(sets) < DISTRACTOR_MAX_SETS:
+                    new_set['set_id'] = max((s['set_id'] for s in sets), default=0) + 1
+                    sets.append(new_set)
+                else:
+                    oldest = min(range(len(sets)), key=lambda i: sets[i]['last_used_at'])
+                    new_set['set_id'] = sets[oldest]['set_id']
+                    sets[oldest] = new_set
+
+                if entry is None:
+                    self._put_entry(key, sets, now)
+
+                rows.append({
+                    'lemma': key[0],
+                    'translation': key[1],
+                    'test_mode': test_mode,
+                    'set_id': new_set['set_id'],
+                    'wrong_option_1': wrong_options[0],
+                    'wrong_option_2': wrong_options[1],
+                    'wrong_option_3': wrong_options[2],
+                    'created_at': int(now * MICROSECONDS),
+                    'last_used_at': int(now * MICROSECONDS),
+                })
+
+        try:
+            self.db.upsert_distractor_sets(rows)
+        except Exception as e:
+            logger.error(f"[DistractorCache] Ошибка записи distractor_sets: {e}")
+
+
+_cache: Optional[DistractorCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_distractor_cache(db: WordoorioDatabase) -> DistractorCache:
+    """Общий экземпляр на процесс (LRU живёт между запросами)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DistractorCache(db)
+        return _cache
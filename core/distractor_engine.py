@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+DistractorEngine - локальный подбор неправильных вариантов без AI
+
+Кандидаты — словарь пользователя и общий словарь (ключи distractor_sets).
+Для каждого правильного ответа выбираются 3 кандидата:
+  - той же части речи (pymorphy2 для русского, spaCy для английского);
+  - с тем же числом слов и из той же полосы длины;
+  - наиболее похожие по символьным n-граммам (косинус векторов NumPy),
+    но не почти совпадающие с правильным ответом и не его формы.
+
+Признаки общего словаря (части речи и n-граммы тысяч строк — секунды)
+считаются в фоновом потоке раз на версию словаря; пока их нет, варианты
+подбираются только из словаря пользователя, запросы их не ждут. При
+построении индекса пользователя размечаются только его слова, ответы
+тренировки размечаются одним батчем. Используется на старте тренировки;
+AI-варианты (агенты #3/#4) подтягиваются в фоне TestPregenerator'ом.
+"""
+
+import os
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from database import WordoorioDatabase
+from core.distractor_cache import normalize
+
+logger = logging.getLogger(__name__)
+
+NGRAM_DIM = 512  # размер хешированного пространства n-грамм
+NGRAM_SIZES = (2, 3)
+MAX_SIMILARITY = 0.85  # выше — почти тот же ответ (порог/пороги)
+GLOBAL_VOCAB_LIMIT = int(os.getenv('DISTRACTOR_GLOBAL_VOCAB', '5000'))
+INDEX_TTL = 300  # секунд жизни индекса словаря пользователя
+GLOBAL_VOCAB_TTL = INDEX_TTL * 12  # секунд до перечитывания общего словаря
+MAX_USER_INDEXES = 256
+
+# Бонусы к сходству при ранжировании кандидатов
+POS_BONUS = 0.3
+LENGTH_BAND_BONUS = 0.2
+WORD_COUNT_BONUS = 0.2
+
+
+def length_band(text: str) -> int:
+    """Полоса длины: 0 — до 4 символов, 1 — 5-7, 2 — 8-11, 3 — 12+"""
+    n = len(text)
+    if n <= 4:
+        return 0
+    if n <= 7:
+        return 1
+    if n <= 11:
+        return 2
+    return 3
+
+
+def same_stem(a: str, b: str) -> bool:
+    """Формы одного слова (порог/пороги, hinge/hinges) — не годятся в неправильные варианты"""
+    shortest = min(len(a), len(b))
+    if shortest < 4:
+        return a == b
+    prefix = 0
+    for ca, cb in zip(a, b):
+        if ca != cb:
+            break
+        prefix += 1
+    return prefix >= shortest - 1
+
+
+def ngram_vectors(texts: List[str]) -> np.ndarray:
+    """
+    Символьные n-граммы (2 и 3, с границами слова) → L2-нормированные векторы
+
+    Returns:
+        Матрица (len(texts), NGRAM_DIM)
+    """
+    vectors = np.zeros((len(texts), NGRAM_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        padded = f" {text} "
+        for n in NGRAM_SIZES:
+            for j in range(len(padded) - n + 1):
+                vectors[i, zlib.crc32(padded[j:j + n].encode('utf-8')) % NGRAM_DIM] += 1.0
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _pos_tags(texts: List[str], lang: str) -> List[str]:
+    """Части речи для кандидатов (ленивый импорт: spaCy/pymorphy2 тяжёлые)"""
+    from utils.lemmatizer import english_pos_tags, russian_pos_tags
+    return english_pos_tags(texts) if lang == 'en' else russian_pos_tags(texts)
+
+
+class _Candidates:
+    """Кандидаты одного языка и их признаки (считаются один раз на набор)"""
+
+    def __init__(self, texts: List[str], owners: List[Optional[int]], lang: str):
+        self.texts = texts
+        self.owners = owners  # word_id из словаря пользователя (None для общего словаря)
+        self.normalized = [normalize(t) for t in texts]
+        self.vectors = ngram_vectors(self.normalized)
+        self.pos = np.array(_pos_tags(texts, lang) if texts else [], dtype=object)
+        self.bands = np.fromiter((length_band(t) for t in self.normalized), dtype=np.int8, count=len(texts))
+        self.word_counts = np.fromiter((len(t.split()) for t in self.normalized), dtype=np.int16, count=len(texts))
+
+    def score(self, target: str, target_vector: np.ndarray, target_pos: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(сходство n-грамм, итоговая оценка с бонусами) для каждого кандидата"""
+        similarity = self.vectors @ target_vector
+        score = (similarity
+                 + POS_BONUS * (self.pos == target_pos)
+                 + LENGTH_BAND_BONUS * (self.bands == length_band(target))
+                 + WORD_COUNT_BONUS * (self.word_counts == len(target.split())))
+        return similarity, score
+
+
+class _VocabularyIndex:
+    """Кандидаты для подбора: словарь пользователя и общий словарь (его признаки — общие для всех индексов)"""
+
+    def __init__(self, parts: List[_Candidates], lang: str):
+        self.parts = parts
+        self.lang = lang
+        self.texts = [t for part in parts for t in part.texts]
+        self.owners = [o for part in parts for o in part.owners]
+        self.normalized = [t for part in parts for t in part.normalized]
+
+    def pick(self, answer: str, answer_pos: str, word_id: int, count: int = 3) -> List[str]:
+        """Подобрать count неправильных вариантов для правильного ответа (answer_pos — его часть речи)"""
+        if not self.texts:
+            return []
+
+        target = normalize(answer)
+        target_vector = ngram_vectors([target])[0]
+
+        scored = [part.score(target, target_vector, answer_pos) for part in self.parts]
+        similarity = np.concatenate([s[0] for s in scored])
+        score = np.concatenate([s[1] for s in scored])
+
+        chosen = []
+        seen = {target}
+        for i in np.argsort(-score):
+            if self.owners[i] == word_id or similarity[i] > MAX_SIMILARITY:
+                continue
+            if any(same_stem(self.normalized[i], other) for other in seen):
+                continue
+            seen.add(self.normalized[i])
+            chosen.append(self.texts[i])
+            if len(chosen) == count:
+                break
+        return chosen
+
+
+class DistractorEngine:
+    """Локальный генератор вариантов (fallback и быстрый старт без AI)"""
+
+    def __init__(self, db: WordoorioDatabase):
+        self.db = db
+        self._lock = threading.Lock()
+        # Общий словарь: {'loaded_at': float, 'candidates': {test_mode: _Candidates}}.
+        # Признаки строит фоновый поток (_refresh_global), запросы берут готовую версию
+        self._global = None
+        self._global_refreshing = False
+        # (user_id, test_mode) → (built_at, _Candidates словаря пользователя)
+        self._indexes: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def _global_candidates(self, test_mode: int, now: float) -> Optional[_Candidates]:
+        """
+        Признаки общего словаря для режима теста (без ожидания)
+
+        Если версии нет или она старше GLOBAL_VOCAB_TTL, запускается фоновое
+        перестроение; до его конца отдаётся прежняя версия или None
+        """
+        with self._lock:
+            stale = not self._global or now - self._global['loaded_at'] >= GLOBAL_VOCAB_TTL
+            if stale and not self._global_refreshing:
+                self._global_refreshing = True
+                threading.Thread(target=self._refresh_global, name='distractor-global', daemon=True).start()
+            return self._global['candidates'].get(test_mode) if self._global else None
+
+    def _refresh_global(self):
+        """Перечитать общий словарь и посчитать признаки для обоих режимов (фоновый поток)"""
+        started = time.time()
+        loaded_at = started
+        try:
+            rows = self.db.get_global_vocabulary(GLOBAL_VOCAB_LIMIT)
+            candidates = {}
+            for test_mode, field, lang in ((1, 'translation', 'ru'), (2, 'lemma', 'en')):
+                texts = [row[field] for row in rows if row.get(field)]
+                candidates[test_mode] = _Candidates(texts, [None] * len(texts), lang)
+            logger.info(f"[DistractorEngine] Общий словарь: {len(rows)} строк "
+                        f"за {(time.time() - started) * 1000:.0f} мс")
+        except Exception as e:
+            logger.warning(f"[DistractorEngine] Общий словарь недоступен: {e}")
+            # Прежняя версия остаётся, повтор — через INDEX_TTL, а не через час
+            candidates = self._global['candidates'] if self._global else {}
+            loaded_at = started - GLOBAL_VOCAB_TTL + INDEX_TTL
+
+        with self._lock:
+            self._global = {'loaded_at': loaded_at, 'candidates': candidates}
+            self._global_refreshing = False
+
+    def _user_candidates(self, user_id: int, test_mode: int, now: float) -> _Candidates:
+        """Размеченный словарь пользователя: EN→RU — русские переводы, RU→EN — английские слова"""
+        key = (user_id, test_mode)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached and now - cached[0] < INDEX_TTL:
+                self._indexes.move_to_end(key)
+                return cached[1]
+
+        field = 'translation' if test_mode == 1 else 'lemma'
+        texts, owners = [], []
+        for row in self.db.get_user_vocabulary(user_id):
+            texts.append(row[field])
+            owners.append(row['word_id'])
+
+        candidates = _Candidates(texts, owners, 'ru' if test_mode == 1 else 'en')
+        with self._lock:
+            self._indexes[key] = (now, candidates)
+            while len(self._indexes) > MAX_USER_INDEXES:
+                self._indexes.popitem(last=False)
+        return candidates
+
+    def _index(self, user_id: int, test_mode: int) -> _VocabularyIndex:
+        """Индекс кандидатов: словарь пользователя и, если признаки уже готовы, общий словарь"""
+        now = time.time()
+        parts = [self._user_candidates(user_id, test_mode, now)]
+        global_candidates = self._global_candidates(test_mode, now)
+        if global_candidates is not None:
+            parts.append(global_candidates)
+        return _VocabularyIndex(parts, 'ru' if test_mode == 1 else 'en')
+
+    def generate(self, user_id: int, words_data: List[Dict], test_mode: int) -> Dict[int, List[str]]:
+        """
+        Подобрать варианты для слов без обращения к AI
+
+        Args:
+            user_id: ID пользователя (его словарь — основной источник кандидатов)
+            words_data: [{'word', 'correct_translation', 'word_id'}, ...]
+            test_mode: 1 = EN→RU, 2 = RU→EN
+
+        Returns:
+            {word_id: [wrong_1, wrong_2, wrong_3]} — только слова, для которых нашлось 3 варианта
+        """
+        started = time.time()
+        index = self._index(user_id, test_mode)
+
+        # Части речи всех ответов — одним батчем (nlp.pipe), а не по вызову на слово
+        answers = [w['correct_translation'] if test_mode == 1 else w['word'] for w in words_data]
+        answer_pos = _pos_tags(answers, index.lang) if answers and index.texts else [''] * len(answers)
+
+        options = {}
+        for w, answer, pos in zip(words_data, answers, answer_pos):
+            picked = index.pick(answer, pos, w['word_id'])
+            if len(picked) == 3:
+                options[w['word_id']] = picked
+
+        logger.info(f"[DistractorEngine] mode={test_mode}: {len(options)} из {len(words_data)} слов "
+                    f"за {(time.time() - started) * 1000:.0f} мс")
+        return options
+
+
+_engine: Optional[DistractorEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_distractor_engine(db: WordoorioDatabase) -> DistractorEngine:
+    """Общий экземпляр на процесс (индексы словарей живут между запросами)"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DistractorEngine(db)
+        return _engine
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Maintenance - фоновое обслуживание таблиц YDB
+
+Устаревшие строки удаляет сама YDB по TTL: tests — по created_ts (брошенные
+тренировки), analyses — по expire_at (анонимные и пустые анализы). TTL не
+проходит через транзакции приложения, поэтому раз в MAINTENANCE_INTERVAL
+секунд фоновый поток:
+  - удаляет хайлайты удалённых анализов и их постинги поиска
+    (db.compact_orphan_highlights, постранично по ID, курсор — в памяти);
+  - пересчитывает глобальный счётчик analyses (db.recount_analyses).
+
+На одном сервере работу выполняет один воркер gunicorn (flock на
+MAINTENANCE_LOCK_FILE), остальные пропускают проход. Проходы с разных
+серверов безопасны — обе операции идемпотентны.
+
+MAINTENANCE_INTERVAL=0 отключает поток.
+"""
+
+import os
+import time
+import fcntl
+import logging
+import threading
+from typing import Optional
+
+from database import WordoorioDatabase
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', '3600'))  # секунд, 0 — отключено
+MAINTENANCE_LOCK_FILE = os.getenv('MAINTENANCE_LOCK_FILE', '/tmp/wordoorio-maintenance.lock')
+COMPACTION_PAGE_SIZE = 1000  # хайлайтов за запрос
+COMPACTION_MAX_PAGES = 50  # страниц за проход (остальное — в следующем)
+
+
+class Maintenance:
+    """Фоновый поток обслуживания"""
+
+    def __init__(self, db: WordoorioDatabase, interval: int = MAINTENANCE_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self._cursor = 0  # последний просмотренный ID хайлайта
+        self._stopped = threading.Event()
+
+        self._thread = threading.Thread(target=self._loop, name='maintenance', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        """Проход сразу после старта, затем раз в interval секунд"""
+        while not self._stopped.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"[Maintenance] Ошибка прохода: {e}")
+            self._stopped.wait(self.interval)
+
+    def run_once(self) -> bool:
+        """
+        Один проход обслуживания
+
+        Returns:
+            False, если проход выполняет другой воркер этого сервера
+        """
+        with open(MAINTENANCE_LOCK_FILE, 'a') as lock:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+
+            started = time.time()
+            removed = self.compact_orphan_highlights()
+            analyses = self.db.recount_analyses()
+            logger.info(f"[Maintenance] Удалено {removed} хайлайтов без анализа, анализов: {analyses}, "
+                        f"за {(time.time() - started) * 1000:.0f} мс")
+            return True
+
+    def compact_orphan_highlights(self, max_pages: int = COMPACTION_MAX_PAGES) -> int:
+        """Пройти до max_pages страниц highlights от курсора (в конце таблицы — с начала)"""
+        removed = 0
+        for _ in range(max_pages):
+            page = self.db.compact_orphan_highlights(self._cursor, COMPACTION_PAGE_SIZE)
+            removed += page['removed']
+            if page['last_id'] is None:
+                self._cursor = 0
+                break
+            self._cursor = page['last_id']
+        return removed
+
+    def stop(self):
+        self._stopped.set()
+
+
+_maintenance: Optional[Maintenance] = None
+_maintenance_lock = threading.Lock()
+
+
+def get_maintenance(db: WordoorioDatabase) -> Optional[Maintenance]:
+    """Общий экземпляр на процесс (None при MAINTENANCE_INTERVAL=0)"""
+    global _maintenance
+    if MAINTENANCE_INTERVAL <= 0:
+        return None
+    with _maintenance_lock:
+        if _maintenance is None:
+            _maintenance = Maintenance(db)
+        return _maintenance
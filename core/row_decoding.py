@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Декодирование результатов запросов YDB
+
+Строка результата SDK — dict с доступом через атрибуты. Имена колонок
+берутся из result_set.columns один раз на результат, дальше строка читается
+operator.itemgetter'ом (C), без обращения к колонкам по одной через атрибуты.
+
+  rows_as_dicts    — копии-dict (можно менять и хранить в кэшах);
+  rows_as_tuples   — кортежи в порядке columns (быстрее копии, когда нужна
+                     часть колонок), для горячих списков;
+  rows_as_records  — namedtuple (класс создаётся один раз на набор колонок);
+  rows_as_json     — JSON-массив прямо из строк SDK, без промежуточных копий.
+
+Декодер передаётся в db._fetch_all(..., decode=...). Замеры —
+benchmarks/bench_row_decoding.py.
+"""
+
+import json
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+def column_names(result_set) -> Tuple[str, ...]:
+    """Имена колонок результата"""
+    return tuple(column.name for column in result_set.columns)
+
+
+def _getter(names: Sequence[str]) -> Callable[[Dict], tuple]:
+    """itemgetter, всегда возвращающий кортеж (и для одной колонки)"""
+    if len(names) == 1:
+        name = names[0]
+        return lambda row: (row[name],)
+    return itemgetter(*names)
+
+
+@lru_cache(maxsize=256)
+def _record_type(names: Tuple[str, ...]):
+    """namedtuple для набора колонок (rename — для имён вроде column0)"""
+    return namedtuple('Row', names, rename=True)
+
+
+def rows_as_dicts(result_set) -> List[Dict]:
+    """Строки как отдельные dict"""
+    # dict(row) копирует dict SDK целиком на C — быстрее, чем сборка по колонкам
+    return [dict(row) for row in result_set.rows]
+
+
+def rows_as_tuples(result_set, columns: Optional[Sequence[str]] = None) -> List[tuple]:
+    """
+    Строки как кортежи
+
+    Args:
+        result_set: Результат запроса
+        columns: Порядок колонок в кортеже (по умолчанию — как в результате)
+    """
+    getter = _getter(columns or column_names(result_set))
+    return [getter(row) for row in result_set.rows]
+
+
+def rows_as_records(result_set, columns: Optional[Sequence[str]] = None) -> List[tuple]:
+    """Строки как namedtuple с полями по именам колонок"""
+    names = tuple(columns or column_names(result_set))
+    make = _record_type(names)._make
+    getter = _getter(names)
+    return [make(getter(row)) for row in result_set.rows]
+
+
+def rows_as_json(result_set, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    JSON-массив объектов из строк результата
+
+    Args:
+        result_set: Результат запроса
+        default: Сериализация нестандартных значений (для ответа API —
+                 app.json.default, чтобы даты совпадали с jsonify)
+    """
+    return json.dumps(result_set.rows, ensure_ascii=False, separators=(',', ':'), default=default)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+SearchIndex - поиск по словарю и анализам пользователя (/api/search)
+
+Постинги лежат в таблице search_index и пишутся в тех же транзакциях, что
+и данные: DictionaryManager.add_word() — запись словаря (analysis_id = 0),
+db.add_highlight_to_analysis() — хайлайт слова в анализе. Поэтому поиск не
+сканирует analyses/highlights, а читает ограниченные диапазоны по ключу:
+  - 'w:<лемма>' — точное совпадение и префикс (диапазон по ключу);
+  - 't:<триграмма>' — подстрока: первые постинги самой редкой триграммы
+    запроса, совпадение подстроки проверяется по нормализованному тексту
+    постинга. Каждое чтение — не больше MAX_CANDIDATES строк.
+
+Ранжирование: точное совпадение → префикс → подстрока, внутри — короче
+и по алфавиту (слова), свежее (анализы).
+
+Поиск ограничен словарём и анализами текущего пользователя (scope
+counter_scope(user_id)). Без входа ищется только общий анонимный словарь
+(scope 'anonymous') — прежний /api/search искал по хайлайтам всех
+пользователей, теперь чужие анализы в выдачу не попадают.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+from database import WordoorioDatabase, counter_scope, search_key, search_trigrams
+
+logger = logging.getLogger(__name__)
+
+MAX_CANDIDATES = 200  # строк на один диапазон search_index
+
+# Ранги совпадений (меньше — выше в выдаче)
+MATCH_RANKS = {'exact': 0, 'prefix': 1, 'infix': 2}
+
+
+def match_kind(text: str, key: str) -> Optional[str]:
+    """Тип совпадения нормализованного текста постинга с запросом"""
+    if text == key:
+        return 'exact'
+    if text.startswith(key):
+        return 'prefix'
+    if key in text:
+        return 'infix'
+    return None
+
+
+class SearchIndex:
+    """Ранжированный поиск по инвертированному индексу search_index"""
+
+    def __init__(self, db: WordoorioDatabase):
+        self.db = db
+
+    def search(self, user_id: Optional[int], query: str, limit: int = 20) -> Dict:
+        """
+        Найти слова словаря и анализы, где они выделены
+
+        Args:
+            user_id: ID пользователя (None — анонимный словарь)
+            query: Поисковый запрос
+            limit: Максимум слов и анализов в выдаче
+
+        Returns:
+            {
+                'words': [{'word_id', 'lemma', 'match'}, ...],
+                'results': [{'analysis_id', 'date', 'highlight_word', 'text_preview',
+                             'context', 'word_id', 'match'}, ...]
+            }
+        """
+        started = time.time()
+        key = search_key(query)
+        if not key:
+            return {'words': [], 'results': []}
+
+        postings = self.db.search_postings(counter_scope(user_id), key, search_trigrams(key), MAX_CANDIDATES)
+
+        # Лучшее совпадение на (word_id, analysis_id)
+        best = {}
+        for posting in postings:
+            kind = match_kind(posting['text'] or '', key)
+            if kind is None:
+                continue
+            ident = (posting['word_id'], posting['analysis_id'] or 0)
+            if ident not in best or MATCH_RANKS[kind] < MATCH_RANKS[best[ident]['match']]:
+                best[ident] = {'word_id': posting['word_id'], 'lemma': posting['text'], 'match': kind}
+
+        words = sorted(
+            (hit for (_, analysis_id), hit in best.items() if not analysis_id),
+            key=lambda hit: (MATCH_RANKS[hit['match']], len(hit['lemma']), hit['lemma'])
+        )[:limit]
+
+        # Анализ показывается один раз — по лучшему из его слов
+        hits = {}
+        for (_, analysis_id), hit in best.items():
+            if analysis_id and (analysis_id not in hits
+                                or MATCH_RANKS[hit['match']] < MATCH_RANKS[hits[analysis_id]['match']]):
+                hits[analysis_id] = hit
+        analyses = self.db.get_analyses_by_ids(list(hits))
+
+        results = []
+        for analysis_id, hit in hits.items():
+            analysis = analyses.get(analysis_id)
+            if not analysis:
+                continue
+            text = analysis.get('original_text') or ''
+            results.append({
+                'analysis_id': analysis_id,
+                'date': analysis.get('analysis_date'),
+                'highlight_word': hit['lemma'],
+                'text_preview': text[:200],
+                'context': text[:500],
+                'word_id': hit['word_id'],
+                'match': hit['match'],
+            })
+        results.sort(key=lambda r: (r['date'] is not None, r['date']), reverse=True)
+        results.sort(key=lambda r: MATCH_RANKS[r['match']])
+        results = results[:limit]
+
+        logger.info(f"[SearchIndex] '{key}': {len(words)} слов, {len(results)} анализов "
+                    f"за {(time.time() - started) * 1000:.0f} мс")
+        return {'words': words, 'results': results}
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_search_index(db: WordoorioDatabase) -> SearchIndex:
+    """Общий экземпляр на процесс"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex(db)
+        return _index
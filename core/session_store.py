@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+TrainingSessionStore - активные тренировки Telegram-бота (webhook)
+
+При старте тренировки тесты материализуются один раз (варианты уже
+перемешаны, состояние слов приложено) и кладутся в хранилище под коротким
+токеном. Токен передаётся в callback_data кнопок, поэтому показ теста и
+переход к следующему не читают тесты из YDB.
+
+Уровни:
+  - LRU в памяти процесса (основной путь);
+  - таблица training_sessions в YDB — общая для воркеров gunicorn, читается
+    только при промахе LRU (TRAINING_SESSION_BACKEND=memory отключает).
+
+Сессия в LRU — копия воркера, её изменения другим воркерам не видны.
+claim_answer() отсекает повторное нажатие в этом воркере без обращения к YDB;
+дубль callback'а на другом воркере отбрасывает сама запись ответа — она
+засчитывает ответ, только пока тест не удалён (db.submit_test_answer,
+db.apply_answer_events).
+"""
+
+import os
+import json
+import time
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+from database import WordoorioDatabase
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKEND = os.getenv('TRAINING_SESSION_BACKEND', 'ydb')  # ydb | memory
+SESSION_CACHE_SIZE = int(os.getenv('TRAINING_SESSION_CACHE_SIZE', '1000'))
+SESSION_TTL = 6 * 3600  # секунд
+
+TOKEN_BYTES = 6  # 8 символов base64url — помещается в 64 байта callback_data
+
+
+class TrainingSessionStore:
+    """Материализованные тесты активных тренировок"""
+
+    def __init__(self, db: WordoorioDatabase, max_sessions: int = SESSION_CACHE_SIZE,
+                 backend: str = SESSION_BACKEND):
+        self.db = db
+        self.max_sessions = max_sessions
+        self.shared = backend == 'ydb'
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def _put(self, token: str, session: Dict):
+        """Положить сессию в LRU. Вызывать под self._lock"""
+        self._sessions[token] = session
+        self._sessions.move_to_end(token)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def create(self, user_id: int, tests: List[Dict]) -> str:
+        """
+        Сохранить тесты новой тренировки
+
+        Args:
+            user_id: ID пользователя
+            tests: Результат TestManager.build_session_tests()
+
+        Returns:
+            Короткий токен сессии для callback_data
+        """
+        token = secrets.token_urlsafe(TOKEN_BYTES)
+        session = {'user_id': user_id, 'tests': tests, 'created_at': time.time()}
+
+        with self._lock:
+            self._put(token, session)
+
+        if self.shared:
+            try:
+                self.db.save_training_session(token, user_id, json.dumps(session, ensure_ascii=False))
+            except Exception as e:
+                logger.error(f"[SessionStore] Не удалось сохранить сессию в YDB: {e}")
+
+        logger.info(f"[SessionStore] Сессия {token}: user_id={user_id}, тестов {len(tests)}")
+        return token
+
+    def get(self, token: str) -> Optional[Dict]:
+        """
+        Получить сессию по токену (YDB читается только при промахе LRU)
+
+        Returns:
+            {'user_id', 'tests', 'created_at'} или None, если сессия не найдена или устарела
+        """
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None:
+                if now - session['created_at'] > SESSION_TTL:
+                    del self._sessions[token]
+                    return None
+                self._sessions.move_to_end(token)
+                return session
+
+        if not self.shared:
+            return None
+
+        try:
+            row = self.db.get_training_session(token)
+        except Exception as e:
+            logger.error(f"[SessionStore] Ошибка чтения сессии {token}: {e}")
+            return None
+        if not row or not row.get('payload'):
+            return None
+
+        payload = row['payload']
+        session = json.loads(payload) if isinstance(payload, str) else payload
+        if now - session.get('created_at', 0) > SESSION_TTL:
+            return None
+
+        with self._lock:
+            # Другой поток мог загрузить сессию раньше — берём уже закэшированную
+            session = self._sessions.setdefault(token, session)
+            self._put(token, session)
+        return session
+
+    def claim_answer(self, token: str, test: Dict) -> bool:
+        """
+        Отметить тест сессии отвеченным в этом воркере (до применения ответа)
+
+        Returns:
+            False, если ответ на тест уже принят этим воркером
+        """
+        with self._lock:
+            if test.get('answered'):
+                logger.info(f"[SessionStore] Ответ на тест {test['test_id']} сессии {token} уже принят")
+                return False
+            test['answered'] = True
+        return True
+
+    def release_answer(self, token: str, test: Dict):
+        """Снять отметку ответа (ответ не удалось применить — его можно отправить снова)"""
+        with self._lock:
+            test['answered'] = False
+
+    def delete(self, token: str):
+        """Удалить сессию (тренировка завершена)"""
+        with self._lock:
+            self._sessions.pop(token, None)
+
+        if self.shared:
+            try:
+                self.db.delete_training_session(token)
+            except Exception as e:
+                logger.warning(f"[SessionStore] Не удалось удалить сессию {token}: {e}")
+
+
+_store: Optional[TrainingSessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store(db: WordoorioDatabase) -> TrainingSessionStore:
+    """Общий экземпляр на процесс"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TrainingSessionStore(db)
+        return _store
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+SharedCache - общий для процессов контейнера кэш на локальном диске
+
+Кэши в памяти у каждого воркера gunicorn свои: один и тот же ответ API
+запрашивается и хранится дважды. SharedCache — файл SQLite в режиме WAL
+(SHARED_CACHE_PATH, по умолчанию в /tmp), читать и писать его могут все
+процессы контейнера одновременно; чтение идёт через mmap.
+
+Записи — JSON-значения по (namespace, key) с TTL. Ключ хранится как SHA-1,
+поэтому ключом может быть и длинный текст (вход агента). Размер ограничен
+SHARED_CACHE_BYTES: раз в EVICT_EVERY записей удаляются истёкшие записи и,
+если объём больше лимита, — давно не читанные (время чтения обновляется не
+чаще раза в TOUCH_SECONDS). Значения больше SHARED_CACHE_MAX_ITEM не хранятся.
+
+Кэш не должен ломать запросы: ошибка SQLite (занят, повреждён, нет места)
+логируется и считается промахом.
+
+SHARED_CACHE=0 отключает кэш.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE = os.getenv('SHARED_CACHE', '1') == '1'
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', '/tmp/wordoorio-cache.sqlite3')
+SHARED_CACHE_BYTES = int(os.getenv('SHARED_CACHE_BYTES', str(128 * 1024 * 1024)))
+SHARED_CACHE_MAX_ITEM = int(os.getenv('SHARED_CACHE_MAX_ITEM', str(2 * 1024 * 1024)))
+
+EVICT_EVERY = 200  # записей между проверками объёма
+EVICT_TARGET = 0.9  # доля лимита после вытеснения
+TOUCH_SECONDS = 60  # точность времени последнего чтения
+BUSY_TIMEOUT = 1.0  # секунд ожидания блокировки записи
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries (expires_at);
+"""
+
+
+def _key_hash(key: str) -> str:
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class SharedCache:
+    """Кэш (namespace, key) → JSON-значение с TTL в файле SQLite"""
+
+    def __init__(self, path: str = SHARED_CACHE_PATH, max_bytes: int = SHARED_CACHE_BYTES,
+                 max_item: int = SHARED_CACHE_MAX_ITEM):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_item = max_item
+        # Соединение SQLite — своё у каждого потока
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._metrics = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'errors': 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение потока (создаётся при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={self.max_bytes}")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Значение или None (нет, истекло, ошибка)
+
+        Args:
+            namespace: Вид данных ('dictionary', 'agent', ...)
+            key: Ключ внутри namespace
+        """
+        now = time.time()
+        key_hash = _key_hash(key)
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key_hash)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self._count('misses')
+                return None
+            if now - row[2] > TOUCH_SECONDS:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                             (now, namespace, key_hash))
+            value = json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            self._error('get', e)
+            return None
+        self._count('hits')
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: int):
+        """
+        Сохранить значение (JSON-сериализуемое) на ttl_seconds секунд
+
+        Args:
+            namespace: Вид данных
+            key: Ключ внутри namespace
+            value: Значение
+            ttl_seconds: Время жизни записи
+        """
+        now = time.time()
+        try:
+            data = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            self._error('set', e)
+            return
+        size = len(data.encode('utf-8'))
+        if size > self.max_item:
+            return
+
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, _key_hash(key), data, size, now + ttl_seconds, now)
+            )
+        except sqlite3.Error as e:
+            self._error('set', e)
+            return
+
+        with self._lock:
+            self._metrics['sets'] += 1
+            self._writes += 1
+            evict = self._writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def delete(self, namespace: str, key: str):
+        """Удалить запись"""
+        try:
+            self._connection().execute("DELETE FROM entries WHERE namespace = ? AND key = ?",
+                                       (namespace, _key_hash(key)))
+        except sqlite3.Error as e:
+            self._error('delete', e)
+
+    def evict(self) -> int:
+        """
+        Удалить истёкшие записи и, если объём больше лимита, давно не читанные
+
+        Returns:
+            Количество удалённых записей
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            # Одна транзакция записи: вытеснение из двух процессов не удаляет лишнего
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    rows = self._lru_victims(conn, total - int(self.max_bytes * EVICT_TARGET))
+                    conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", rows)
+                    removed += len(rows)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._error('evict', e)
+            return 0
+
+        if removed:
+            with self._lock:
+                self._metrics['evictions'] += removed
+            logger.info(f"[SharedCache] Вытеснено {removed} записей")
+        return removed
+
+    @staticmethod
+    def _lru_victims(conn: sqlite3.Connection, excess: int) -> list:
+        """Ключи самых давно читанных записей общим объёмом не меньше excess"""
+        victims, freed = [], 0
+        cursor = conn.execute("SELECT namespace, key, size FROM entries ORDER BY accessed_at")
+        for namespace, key, size in cursor:
+            if freed >= excess:
+                break
+            victims.append((namespace, key))
+            freed += size
+        cursor.close()
+        return victims
+
+    def _count(self, metric: str):
+        with self._lock:
+            self._metrics[metric] += 1
+
+    def _error(self, operation: str, error: Exception):
+        with self._lock:
+            self._metrics['errors'] += 1
+        logger.warning(f"[SharedCache] Ошибка {operation}: {error}")
+
+    def stats(self) -> Dict:
+        """Метрики процесса: hits, misses, hit_rate, sets, evictions, errors"""
+        with self._lock:
+            lookups = self._metrics['hits'] + self._metrics['misses']
+            return {
+                **self._metrics,
+                'hit_rate': round(self._metrics['hits'] / lookups, 3) if lookups else None,
+            }
+
+
+class _DisabledCache:
+    """Заглушка при SHARED_CACHE=0: всегда промах"""
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: int):
+        pass
+
+    def delete(self, namespace: str, key: str):
+        pass
+
+    def stats(self) -> Dict:
+        return {}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Общий экземпляр на процесс (при SHARED_CACHE=0 — всегда промах)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SharedCache() if SHARED_CACHE else _DisabledCache()
+        return _cache
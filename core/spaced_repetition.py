@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+SpacedRepetitionScheduler - очередь повторений по алгоритму SM-2
+
+Для каждой пары (user_id, word_id) хранится due_at в таблице word_schedule.
+Новые слова в очередь не попадают, пока по ним не было ответа: их вводит
+8-шаговый алгоритм TrainingService, а расписание появляется при первом
+пересчёте после ответа.
+После тренировки интервалы всех слов пользователя пересчитываются одним
+векторным проходом NumPy, а отбор слов на следующую сессию — это чтение
+первых N строк индекса (user_id, due_at), сколько бы слов ни было в словаре.
+"""
+
+import time
+import logging
+from datetime import datetime
+from typing import List, Dict
+
+import numpy as np
+
+from database import WordoorioDatabase
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+MICROSECONDS = 1_000_000
+
+# Параметры SM-2
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+QUALITY_CORRECT = 5
+QUALITY_WRONG = 2
+
+
+def _to_epoch_seconds(value) -> float:
+    """Timestamp из YDB (datetime или микросекунды) → секунды epoch"""
+    if value is None:
+        return np.nan
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value / MICROSECONDS
+
+
+def sm2_schedule(reviewed: np.ndarray, correct: np.ndarray, repetitions: np.ndarray,
+                 interval_days: np.ndarray, ease: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Один шаг SM-2 для массива слов
+
+    Слова с reviewed=False возвращаются без изменений.
+
+    Args:
+        reviewed: Был ли ответ по слову после прошлого пересчёта
+        correct: Результат последнего ответа
+        repetitions: Число успешных повторений подряд
+        interval_days: Текущий интервал в днях
+        ease: Коэффициент лёгкости (EF)
+
+    Returns:
+        {'repetitions', 'interval_days', 'ease'} — новые значения
+    """
+    quality = np.where(correct, QUALITY_CORRECT, QUALITY_WRONG)
+    penalty = 5 - quality
+    new_ease = np.maximum(MIN_EASE, ease + 0.1 - penalty * (0.08 + penalty * 0.02))
+
+    success = quality >= 3
+    new_repetitions = np.where(success, repetitions + 1, 0)
+    new_interval = np.where(
+        ~success | (new_repetitions == 1), 1.0,
+        np.where(new_repetitions == 2, 6.0, np.round(interval_days * new_ease))
+    )
+
+    return {
+        'repetitions': np.where(reviewed, new_repetitions, repetitions),
+        'interval_days': np.where(reviewed, new_interval, interval_days),
+        'ease': np.where(reviewed, new_ease, ease),
+    }
+
+
+class SpacedRepetitionScheduler:
+    """Пересчёт и чтение очереди повторений"""
+
+    def __init__(self, db: WordoorioDatabase):
+        self.db = db
+
+    def reschedule_user(self, user_id: int) -> int:
+        """
+        Пересчитать due_at всех слов пользователя (вызывается после тренировки)
+
+        Пересчитываются слова, по которым были ответы после прошлого пересчёта
+        (total_tests > reviews_seen). Слова без ответов расписания не получают.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Количество обновлённых строк расписания
+        """
+        rows = self.db.get_schedule_inputs(user_id)
+        if not rows:
+            return 0
+
+        now = time.time()
+        n = len(rows)
+
+        total_tests = np.fromiter((r.get('total_tests') or 0 for r in rows), dtype=np.int64, count=n)
+        reviews_seen = np.fromiter((r.get('reviews_seen') or 0 for r in rows), dtype=np.int64, count=n)
+        correct = np.fromiter((bool(r.get('last_result')) for r in rows), dtype=bool, count=n)
+        repetitions = np.fromiter((r.get('repetitions') or 0 for r in rows), dtype=np.int64, count=n)
+        interval_days = np.fromiter((r.get('interval_days') or 0.0 for r in rows), dtype=np.float64, count=n)
+        ease = np.fromiter((r.get('ease') or DEFAULT_EASE for r in rows), dtype=np.float64, count=n)
+        due_at = np.fromiter((_to_epoch_seconds(r.get('due_at')) for r in rows), dtype=np.float64, count=n)
+
+        reviewed = total_tests > reviews_seen
+        result = sm2_schedule(reviewed, correct, repetitions, interval_days, ease)
+
+        new_due = np.where(reviewed, now + result['interval_days'] * SECONDS_PER_DAY, due_at)
+        changed = np.flatnonzero(reviewed)
+
+        updates = [
+            {
+                'user_id': user_id,
+                'word_id': rows[i]['word_id'],
+                'due_at': int(new_due[i] * MICROSECONDS),
+                'interval_days': float(result['interval_days'][i]),
+                'ease': float(result['ease'][i]),
+                'repetitions': int(result['repetitions'][i]),
+                'reviews_seen': int(total_tests[i]),
+            }
+            for i in changed
+        ]
+
+        self.db.upsert_schedule(updates)
+        logger.info(f"[Scheduler] user_id={user_id}: пересчитано {len(updates)} из {n} слов")
+        return len(updates)
+
+    def get_due_words(self, user_id: int, count: int) -> List[Dict]:
+        """
+        Первые N слов, срок повторения которых наступил (ранний due_at первым)
+
+        Args:
+            user_id: ID пользователя
+            count: Сколько слов нужно
+
+        Returns:
+            Список слов (формат как у TrainingService)
+        """
+        words = self.db.get_due_words(user_id, count)
+        for word in words:
+            word['rating'] = word.get('rating') or 0
+        return words
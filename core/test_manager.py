@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 """
 TestManager - менеджер для создания и управления тестами
-Работает с YandexAIClient для генерации вариантов ответов (YDB версия)
+Берёт готовые варианты ответов из test_pool (см. TestPregenerator) и общего
+кэша; для остальных слов варианты подбираются локально (DistractorEngine),
+а YandexAIClient улучшает их в фоне (YDB версия)
 """
 
+import zlib
 import random
+import asyncio
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 from database import WordoorioDatabase
 from core.yandex_ai_client import YandexAIClient
+from core.distractor_cache import get_distractor_cache
+from core.distractor_engine import get_distractor_engine
+from core.answer_log import get_answer_log, next_word_state
 
 logger = logging.getLogger(__name__)
 
@@ -17,208 +24,309 @@ logger = logging.getLogger(__name__)
 class TestManager:
     """Менеджер для создания и управления тестами"""
 
-    def __init__(self, db: WordoorioDatabase, ai_client: YandexAIClient):
+    def __init__(self, db: WordoorioDatabase, ai_client: YandexAIClient, pregenerator=None):
+        """
+        Args:
+            db: База данных
+            ai_client: Клиент Yandex AI (генерация вариантов на лету)
+            pregenerator: TestPregenerator для пополнения test_pool (опционально)
+        """
         self.db = db
         self.ai_client = ai_client
+        self.pregenerator = pregenerator
+        self.distractors = get_distractor_cache(db)
 
-    async def create_tests_batch(self, user_id: int, words: List[Dict]) -> List[int]:
+    def prepare_words_data(self, words: List[Dict]) -> List[Dict]:
         """
-        Создать пакет тестов для списка слов
+        Подготовить данные слов для тестов (основные переводы из БД одним запросом)
 
         Args:
-            user_id: ID пользователя
-            words: Список словарей со словами (из TrainingService)
+            words: Список словарей со словами (нужны 'id' и 'lemma')
 
         Returns:
-            Список ID созданных тестов
-
-        Процесс:
-            1. Получить переводы для слов из БД
-            2. Вызвать YandexAIClient.generate_test_options()
-            3. Сохранить тесты в таблицу tests
-            4. Вернуть список test_ids
+            [{'word': 'sophisticated', 'correct_translation': 'утончённый', 'word_id': 1}, ...]
         """
-        if not words:
-            return []
+        # Все переводы одним запросом
+        hydrated = self.db.hydrate_words([word['id'] for word in words], ['translations'])
 
-        # 1. Подготовка данных для AI
         words_data = []
         for word in words:
-            translation = self.db.get_translation_for_word(word['id'])
-            if translation:
+            translations = hydrated[word['id']]['translations']
+            if translations:
                 words_data.append({
                     'word': word['lemma'],
-                    'correct_translation': translation,
+                    'correct_translation': translations[0],
                     'word_id': word['id']  # Сохраняем для использования позже
                 })
+        return words_data
 
-        if not words_data:
-            logger.warning("[TestManager] Нет слов с переводами для создания тестов")
-            return []
+    async def generate_options(self, words_data: List[Dict], test_mode: int) -> Dict[int, List[str]]:
+        """
+        Сгенерировать неправильные варианты через AI (Agent #3 или #4)
+
+        Args:
+            words_data: Результат prepare_words_data()
+            test_mode: 1 = EN→RU (Agent #3), 2 = RU→EN (Agent #4)
+
+        Returns:
+            {word_id: [wrong_1, wrong_2, wrong_3]} — только прошедшие валидацию
+
+        Raises:
+            Exception: если AI не ответил или вернул пустой список
+        """
+        label = "" if test_mode == 1 else " (reverse)"
 
-        # 2. Запрос к AI (async)
         try:
             # Готовим данные для API (без word_id)
             ai_input = [{'word': w['word'], 'correct_translation': w['correct_translation']}
                        for w in words_data]
 
-            logger.info(f"[TestManager] Запрос к AI для {len(ai_input)} слов")
-            logger.info(f"[TestManager] AI input: {ai_input}")
-            response = await self.ai_client.generate_test_options(ai_input)
+            logger.info(f"[TestManager] Запрос к AI{label} для {len(ai_input)} слов")
+            if test_mode == 1:
+                response = await self.ai_client.generate_test_options(ai_input)
+            else:
+                response = await self.ai_client.generate_reverse_test_options(ai_input)
 
             if 'tests' not in response:
-                raise Exception("Неверный формат ответа от AI")
+                raise Exception(f"Неверный формат ответа от AI{label}")
 
-            logger.info(f"[TestManager] AI вернул {len(response['tests'])} тестов")
+            logger.info(f"[TestManager] AI{label} вернул {len(response['tests'])} тестов")
 
             # Если AI вернул пустой массив - это ошибка
             if not response['tests']:
-                logger.error(f"[TestManager] AI вернул пустой массив тестов")
-                raise Exception("AI вернул пустой массив тестов")
+                logger.error(f"[TestManager] AI{label} вернул пустой массив тестов")
+                raise Exception(f"AI вернул пустой массив тестов{label}")
 
         except Exception as e:
-            logger.error(f"[TestManager] Ошибка генерации тестов через AI: {e}")
-            logger.error(f"[TestManager] Детали ошибки: {type(e).__name__}: {str(e)}")
+            logger.error(f"[TestManager] Ошибка генерации вариантов через AI{label}: {e}")
             import traceback
             logger.error(f"[TestManager] Traceback:\n{traceback.format_exc()}")
-            # НЕ используем fallback - без AI тесты создавать нельзя
+            # НЕ используем fallback - без AI варианты создавать нельзя
             raise
 
-        # 3. Сохранение тестов
-        test_ids = []
+        by_word = {w['word']: w for w in words_data}
+
+        options = {}
         for test_data in response['tests']:
             # Находим оригинальные данные для этого слова (НЕ из ответа AI!)
-            original_word_data = next((w for w in words_data if w['word'] == test_data['word']), None)
+            original_word_data = by_word.get(test_data['word'])
             if not original_word_data:
-                logger.warning(f"[TestManager] Не найдены данные для слова {test_data['word']}")
+                logger.warning(f"[TestManager] Не найдены данные для слова {test_data['word']}{label}")
                 continue
 
-            word_id = original_word_data['word_id']
-            correct_translation = original_word_data['correct_translation']  # Наш перевод, не от AI!
-
             # Валидация: проверяем количество и уникальность вариантов
             wrong_options = test_data.get('wrong_options', [])
 
             if len(wrong_options) < 3:
-                logger.warning(f"[TestManager] Недостаточно вариантов для '{test_data['word']}': {wrong_options}")
+                logger.warning(f"[TestManager] Недостаточно вариантов для '{test_data['word']}'{label}: {wrong_options}")
                 continue
 
-            all_options = [correct_translation] + wrong_options[:3]
-            unique_options = set(all_options)
+            # Правильный ответ: EN→RU — наш перевод (не от AI!), RU→EN — английское слово
+            if test_mode == 1:
+                correct_answer = original_word_data['correct_translation']
+            else:
+                correct_answer = original_word_data['word']
 
-            if len(unique_options) < 4:
-                logger.warning(f"[TestManager] Дубликаты в вариантах для '{test_data['word']}': {wrong_options}")
+            if len({correct_answer, *wrong_options[:3]}) < 4:
+                logger.warning(f"[TestManager] Дубликаты в вариантах для '{test_data['word']}'{label}: {wrong_options}")
                 continue  # Пропускаем тест с дубликатами
 
-            test_id = self.db.insert_test(
-                user_id=user_id,
-                word_id=word_id,
-                word=test_data['word'],
-                correct_translation=correct_translation,
-                wrong_option_1=wrong_options[0],
-                wrong_option_2=wrong_options[1],
-                wrong_option_3=wrong_options[2],
-                test_mode=1  # EN→RU режим
-            )
-            test_ids.append(test_id)
-            logger.info(f"[TestManager] Создан тест {test_id} для слова '{test_data['word']}' (mode=1)")
-
-        return test_ids
-
-    async def create_reverse_tests_batch(self, user_id: int, words: List[Dict]) -> List[int]:
+            options[original_word_data['word_id']] = wrong_options[:3]
+
+        return options
+
+    async def get_options(self, words_data: List[Dict], test_mode: int, refresh: bool = False,
+                          user_id: int = None, offline: bool = False) -> Dict[int, List[str]]:
         """
-        Создать пакет обратных тестов (RU→EN) для списка слов
+        Варианты из общего кэша (DistractorCache), AI — только для слов без кэша
 
         Args:
-            user_id: ID пользователя
-            words: Список словарей со словами
+            words_data: Результат prepare_words_data()
+            test_mode: 1 = EN→RU, 2 = RU→EN
+            refresh: Также генерировать новые наборы для слов, у которых их меньше
+                     DISTRACTOR_MAX_SETS (фоновая генерация, не для старта тренировки)
+            user_id: ID пользователя — нужен для локального подбора (DistractorEngine)
+            offline: Сначала локальный подбор, AI — только для слов, где он не справился
 
         Returns:
-            Список ID созданных тестов
+            {word_id: [wrong_1, wrong_2, wrong_3]}
         """
-        if not words:
-            return []
-
-        # 1. Подготовка данных для AI
-        words_data = []
-        for word in words:
-            translation = self.db.get_translation_for_word(word['id'])
-            if translation:
-                words_data.append({
-                    'word': word['lemma'],
-                    'correct_translation': translation,
-                    'word_id': word['id']
-                })
+        options, growable = self.distractors.take(words_data, test_mode)
+        to_generate = [
+            w for w in words_data
+            if w['word_id'] not in options or (refresh and w['word_id'] in growable)
+        ]
+        if not to_generate:
+            return options
+
+        # Быстрый путь: варианты из словаря за миллисекунды (в кэш не сохраняются)
+        if offline and user_id is not None:
+            local = self._local_options(user_id, to_generate, test_mode)
+            options.update(local)
+            to_generate = [w for w in to_generate if w['word_id'] not in local]
+            if not to_generate:
+                return options
 
+        try:
+            generated = await self.generate_options(to_generate, test_mode)
+        except Exception:
+            # AI недоступен — подбираем локально, чтобы тренировка всё равно началась
+            if user_id is not None and not offline:
+                options.update(self._local_options(
+                    user_id, [w for w in to_generate if w['word_id'] not in options], test_mode
+                ))
+            if not options:
+                raise
+            logger.warning(f"[TestManager] mode={test_mode}: AI недоступен, используем кэш и локальные варианты")
+            return options
+
+        self.distractors.store(to_generate, generated, test_mode)
+        options.update(generated)
+        return options
+
+    def _local_options(self, user_id: int, words_data: List[Dict], test_mode: int) -> Dict[int, List[str]]:
+        """Локальный подбор вариантов (DistractorEngine), ошибки не пробрасываются"""
         if not words_data:
-            logger.warning("[TestManager] Нет слов с переводами для создания обратных тестов")
-            return []
+            return {}
+        try:
+            return get_distractor_engine(self.db).generate(user_id, words_data, test_mode)
+        except Exception as e:
+            logger.error(f"[TestManager] Ошибка локального подбора вариантов: {e}")
+            return {}
 
-        # 2. Запрос к AI Agent #4 (обратный режим)
+    def _take_pooled_options(self, user_id: int, words_data: List[Dict], test_mode: int) -> Dict[int, List[str]]:
+        """
+        Взять готовые варианты из test_pool (без обращения к AI)
+
+        Варианты, сгенерированные для другого основного перевода, не используются.
+        """
         try:
-            ai_input = [{'word': w['word'], 'correct_translation': w['correct_translation']}
-                       for w in words_data]
+            rows = self.db.get_test_pool(user_id, [w['word_id'] for w in words_data], test_mode)
+        except Exception as e:
+            logger.error(f"[TestManager] Ошибка чтения test_pool: {e}")
+            return {}
 
-            logger.info(f"[TestManager] Запрос к AI (reverse) для {len(ai_input)} слов")
-            response = await self.ai_client.generate_reverse_test_options(ai_input)
+        translations = {w['word_id']: w['correct_translation'] for w in words_data}
+        return {
+            row['word_id']: [row['wrong_option_1'], row['wrong_option_2'], row['wrong_option_3']]
+            for row in rows
+            if row.get('correct_translation') == translations.get(row['word_id'])
+        }
 
-            if 'tests' not in response:
-                raise Exception("Неверный формат ответа от AI (reverse)")
+    async def _build_tests(self, user_id: int, words_data: List[Dict], test_mode: int) -> List[Dict]:
+        """
+        Подобрать варианты для тестов одного режима: test_pool → общий кэш → локальный подбор → AI
 
-            logger.info(f"[TestManager] AI (reverse) вернул {len(response['tests'])} тестов")
+        Args:
+            words_data: Результат prepare_words_data()
 
-            if not response['tests']:
-                logger.error(f"[TestManager] AI (reverse) вернул пустой массив тестов")
-                raise Exception("AI вернул пустой массив тестов (reverse)")
+        Returns:
+            Строки для db.insert_tests_bulk() (ещё не сохранены)
+        """
+        label = "" if test_mode == 1 else " обратных"
 
-        except Exception as e:
-            logger.error(f"[TestManager] Ошибка генерации обратных тестов через AI: {e}")
-            import traceback
-            logger.error(f"[TestManager] Traceback:\n{traceback.format_exc()}")
-            raise
+        if not words_data:
+            logger.warning(f"[TestManager] Нет слов с переводами для создания{label} тестов")
+            return []
 
-        # 3. Сохранение тестов
-        test_ids = []
-        for test_data in response['tests']:
-            # Находим оригинальные данные для этого слова (НЕ из ответа AI!)
-            original_word_data = next((w for w in words_data if w['word'] == test_data['word']), None)
-            if not original_word_data:
-                logger.warning(f"[TestManager] Не найдены данные для слова {test_data['word']} (reverse)")
+        # 2. Готовые варианты из пула
+        options = self._take_pooled_options(user_id, words_data, test_mode)
+        missing = [w for w in words_data if w['word_id'] not in options]
+        logger.info(f"[TestManager] mode={test_mode}: из пула {len(options)}, на лету {len(missing)}")
+
+        # 3. Для слов без пула — общий кэш, затем локальный подбор; AI — только если не хватило
+        if missing:
+            try:
+                options.update(await self.get_options(missing, test_mode, user_id=user_id, offline=True))
+            except Exception:
+                if not options:
+                    raise
+                logger.warning(f"[TestManager] mode={test_mode}: AI недоступен, используем только тесты из пула")
+
+        rows = []
+        for w in words_data:
+            wrong_options = options.get(w['word_id'])
+            if not wrong_options:
                 continue
+            rows.append({
+                'user_id': user_id,
+                'word_id': w['word_id'],
+                'word': w['word'],
+                'correct_translation': w['correct_translation'],
+                'wrong_option_1': wrong_options[0],
+                'wrong_option_2': wrong_options[1],
+                'wrong_option_3': wrong_options[2],
+                'test_mode': test_mode,
+            })
+        return rows
+
+    def _save_tests(self, user_id: int, rows: List[Dict], words_data: List[Dict]) -> List[Dict]:
+        """
+        Сохранить тесты одним запросом и поставить слова на фоновую перегенерацию
 
-            word_id = original_word_data['word_id']
-            correct_translation = original_word_data['correct_translation']  # Наш перевод, не от AI!
+        Args:
+            rows: Результат _build_tests()
+            words_data: Все слова тренировки (в пул идут и те, для которых теста не получилось)
 
-            wrong_options = test_data.get('wrong_options', [])
+        Returns:
+            Сохранённые тесты в порядке rows (строки tests с id и created_at)
+        """
+        if not rows:
+            return []
 
-            if len(wrong_options) < 3:
-                logger.warning(f"[TestManager] Недостаточно вариантов для '{test_data['word']}' (reverse): {wrong_options}")
-                continue
+        # 4. Сохранение тестов (один диапазон ID и один UPSERT на все тесты)
+        tests = self.db.insert_tests_bulk(rows)
+        logger.info(f"[TestManager] Создано {len(tests)} тестов для user_id={user_id}")
 
-            # Для обратного режима: правильный ответ — английское слово (word)
-            all_options = [test_data['word']] + wrong_options[:3]
-            unique_options = set(all_options)
+        # 5. Пополняем пул свежими вариантами для следующих тренировок
+        if self.pregenerator:
+            self.pregenerator.enqueue(user_id, [w['word_id'] for w in words_data])
 
-            if len(unique_options) < 4:
-                logger.warning(f"[TestManager] Дубликаты в вариантах для '{test_data['word']}' (reverse): {wrong_options}")
-                continue
+        return tests
+
+    async def _create_tests(self, user_id: int, words_data: List[Dict], test_mode: int) -> List[Dict]:
+        """Создать и сохранить тесты одного режима"""
+        rows = await self._build_tests(user_id, words_data, test_mode)
+        return self._save_tests(user_id, rows, words_data)
 
-            test_id = self.db.insert_test(
-                user_id=user_id,
-                word_id=word_id,
-                word=test_data['word'],
-                correct_translation=correct_translation,
-                wrong_option_1=wrong_options[0],
-                wrong_option_2=wrong_options[1],
-                wrong_option_3=wrong_options[2],
-                test_mode=2  # RU→EN режим
-            )
-            test_ids.append(test_id)
-            logger.info(f"[TestManager] Создан обратный тест {test_id} для слова '{test_data['word']}' (mode=2)")
-
-        return test_ids
-
-    async def create_dual_mode_tests(self, user_id: int, words: List[Dict]) -> List[int]:
+    async def create_tests_batch(self, user_id: int, words: List[Dict]) -> List[Dict]:
+        """
+        Создать пакет тестов (EN→RU) для списка слов
+
+        Args:
+            user_id: ID пользователя
+            words: Список словарей со словами (из TrainingService)
+
+        Returns:
+            Созданные тесты (строки tests, как у db.get_test())
+
+        Процесс:
+            1. Получить переводы для слов из БД
+            2. Взять готовые варианты из test_pool
+            3. Для остальных вызвать YandexAIClient.generate_test_options()
+            4. Сохранить тесты в таблицу tests
+            5. Вернуть сохранённые тесты
+        """
+        if not words:
+            return []
+        return await self._create_tests(user_id, self.prepare_words_data(words), test_mode=1)
+
+    async def create_reverse_tests_batch(self, user_id: int, words: List[Dict]) -> List[Dict]:
+        """
+        Создать пакет обратных тестов (RU→EN) для списка слов
+
+        Args:
+            user_id: ID пользователя
+            words: Список словарей со словами
+
+        Returns:
+            Созданные тесты (строки tests, как у db.get_test())
+        """
+        if not words:
+            return []
+        return await self._create_tests(user_id, self.prepare_words_data(words), test_mode=2)
+
+    async def create_dual_mode_tests(self, user_id: int, words: List[Dict]) -> List[Dict]:
         """
         Создать тесты обоих режимов: 10 EN→RU + 10 RU→EN
 
@@ -227,39 +335,47 @@ class TestManager:
             words: Список из 20 слов (делится пополам)
 
         Returns:
-            Список всех ID созданных тестов (сначала mode=1, потом mode=2)
+            Все созданные тесты (сначала mode=1, потом mode=2)
         """
         if len(words) < 2:
             logger.warning("[TestManager] Недостаточно слов для dual mode")
             return []
 
+        # Переводы для всех слов — одним запросом
+        words_data = self.prepare_words_data(words)
+        translated_ids = {w['word_id'] for w in words_data}
+
         # Делим слова пополам
         mid = len(words) // 2
-        words_mode1 = words[:mid]  # Первая половина для EN→RU
-        words_mode2 = words[mid:]  # Вторая половина для RU→EN
-
-        logger.info(f"[TestManager] Создание dual mode тестов: {len(words_mode1)} EN→RU + {len(words_mode2)} RU→EN")
-
-        all_test_ids = []
-
-        # Создаем тесты mode=1 (EN→RU)
-        try:
-            test_ids_1 = await self.create_tests_batch(user_id, words_mode1)
-            all_test_ids.extend(test_ids_1)
-            logger.info(f"[TestManager] Создано {len(test_ids_1)} тестов mode=1")
-        except Exception as e:
-            logger.error(f"[TestManager] Ошибка создания тестов mode=1: {e}")
-
-        # Создаем тесты mode=2 (RU→EN)
-        try:
-            test_ids_2 = await self.create_reverse_tests_batch(user_id, words_mode2)
-            all_test_ids.extend(test_ids_2)
-            logger.info(f"[TestManager] Создано {len(test_ids_2)} тестов mode=2")
-        except Exception as e:
-            logger.error(f"[TestManager] Ошибка создания тестов mode=2: {e}")
+        ids_mode1 = {word['id'] for word in words[:mid]}  # Первая половина для EN→RU
+        data_mode1 = [w for w in words_data if w['word_id'] in ids_mode1]
+        data_mode2 = [w for w in words_data if w['word_id'] not in ids_mode1]  # Вторая для RU→EN
+
+        if len(translated_ids) < len(words):
+            logger.warning(f"[TestManager] Без перевода {len(words) - len(translated_ids)} слов")
+
+        logger.info(f"[TestManager] Создание dual mode тестов: {len(data_mode1)} EN→RU + {len(data_mode2)} RU→EN")
+
+        # Оба режима параллельно: задержка = максимум из двух вызовов агентов, а не сумма
+        results = await asyncio.gather(
+            self._build_tests(user_id, data_mode1, test_mode=1),
+            self._build_tests(user_id, data_mode2, test_mode=2),
+            return_exceptions=True
+        )
+
+        rows = []
+        for test_mode, result in zip((1, 2), results):
+            # Ошибка одного режима не отменяет тесты другого
+            if isinstance(result, BaseException):
+                logger.error(f"[TestManager] Ошибка создания тестов mode={test_mode}: {result}")
+                continue
+            rows.extend(result)
+            logger.info(f"[TestManager] Подготовлено {len(result)} тестов mode={test_mode}")
 
-        logger.info(f"[TestManager] Всего создано {len(all_test_ids)} тестов dual mode")
-        return all_test_ids
+        # Тесты обоих режимов — одним запросом
+        tests = self._save_tests(user_id, rows, words_data)
+        logger.info(f"[TestManager] Всего создано {len(tests)} тестов dual mode")
+        return tests
 
     def get_test_with_shuffled_options(self, test_id: int) -> Dict:
         """
@@ -284,7 +400,19 @@ class TestManager:
         test = self.db.get_test(test_id)
         if not test:
             return None
+        return self.shuffle_test(test)
+
+    def shuffle_test(self, test: Dict) -> Dict:
+        """
+        Тест с перемешанными вариантами ответов из строки tests
+
+        Args:
+            test: Строка tests (db.get_test() или результат create_*_tests)
 
+        Returns:
+            Формат get_test_with_shuffled_options()
+        """
+        test_id = test['id']
         test_mode = test.get('test_mode') or 1
 
         if test_mode == 1:
@@ -308,8 +436,9 @@ class TestManager:
                 {'text': test['wrong_option_3'], 'is_correct': False}
             ]
 
-        # Перемешиваем детерминированно
-        seed = hash(f"{test_id}_{test.get('created_at', '')}_{test['word']}")
+        # Перемешиваем детерминированно: crc32 не зависит от процесса
+        # (hash() солится per-process, и порядок вариантов разъезжался между воркерами)
+        seed = zlib.crc32(f"{test_id}_{test.get('created_at', '')}_{test['word']}".encode('utf-8'))
         rng = random.Random(seed)
         rng.shuffle(options)
 
@@ -320,20 +449,60 @@ class TestManager:
         return {
             'test_id': test['id'],
             'word_id': test['word_id'],
+            'user_id': test['user_id'],
             'test_mode': test_mode,
             'question': question,
             'correct_answer': correct_answer,
             'word': test['word'],  # оставляем для совместимости
+            'correct_translation': test['correct_translation'],
             'options': options
         }
 
-    def submit_answer(self, test_id: int, selected_option_text: str) -> Dict:
+    def build_session_tests(self, created_tests: List[Dict], words: List[Dict]) -> List[Dict]:
+        """
+        Материализовать тесты тренировки для TrainingSessionStore
+
+        Тесты перемешиваются из только что сохранённых строк (без чтения из YDB),
+        к ним прикладывается состояние слова (status, rating).
+
+        Args:
+            created_tests: Результат create_dual_mode_tests() / create_tests_batch()
+            words: Слова тренировки (из TrainingService, с полями status и rating)
+
+        Returns:
+            Список тестов в формате get_test_with_shuffled_options() + status, rating,
+            translations, example
+        """
+        states = {word['id']: word for word in words}
+        # Переводы и пример из текста (для сообщения об ошибке) — по одному запросу на все слова
+        hydrated = self.db.hydrate_words(list(states), ['translations', 'example'])
+        answer_log = get_answer_log(self.db)
+
+        tests = []
+        for created in created_tests:
+            test = self.shuffle_test(created)
+            word = states.get(test['word_id'], {})
+            test['status'] = word.get('status') or 'new'
+            test['rating'] = word.get('rating') or 0
+            # Ответы этого процесса, ещё не записанные в YDB, новее состояния из выборки
+            pending = answer_log.word_state(test['word_id']) if answer_log else None
+            if pending:
+                test['status'], test['rating'] = pending
+            word_data = hydrated.get(test['word_id']) or {}
+            test['translations'] = word_data.get('translations') or [test['correct_translation']]
+            test['example'] = word_data.get('example')
+            tests.append(test)
+        return tests
+
+    def submit_answer(self, test_id: int, selected_option_text: str, session_test: Dict = None) -> Dict:
         """
         Проверить ответ пользователя
 
         Args:
             test_id: ID теста
             selected_option_text: Выбранный вариант ответа (текст)
+            session_test: Тест из build_session_tests() — в нём обновляется
+                          состояние слова (status, rating)
 
         Returns:
             {
@@ -344,80 +513,77 @@ class TestManager:
                 'new_status': 'learning'
             }
 
-        Процесс:
-            1. Получить тест из БД
+        Процесс (одна транзакция YDB, см. db.submit_test_answer):
+            1. Получить тест и состояние слова
             2. Проверить правильность ответа (с учётом test_mode)
             3. Обновить рейтинг и статус слова
             4. Обновить статистику
             5. Удалить тест
-            6. Вернуть результат
+            6. Вернуть результат и все переводы слова
+
+        Для теста из сессии ответ проверяется локально и уходит в AnswerLog,
+        а пункты 3-5 выполняются позже пачкой (без обращения к YDB здесь).
         """
-        # Получаем тест
-        test = self.db.get_test(test_id)
-        if not test:
+        answer_log = get_answer_log(self.db)
+        if answer_log and session_test is not None and 'translations' in session_test:
+            result = self._log_answer(answer_log, session_test, selected_option_text)
+            if result is not None:
+                return result
+            # Очередь журнала заполнена — ответ записывается синхронно
+
+        result = self.db.submit_test_answer(test_id, selected_option_text)
+        if not result:
             raise Exception(f"Тест {test_id} не найден")
 
-        test_mode = test.get('test_mode') or 1
+        test_mode = result.get('test_mode') or 1
 
-        # Проверяем правильность ответа в зависимости от режима
         if test_mode == 1:
             # EN→RU: правильный ответ — русский перевод
-            correct_answer = test['correct_translation']
+            correct_answer = result['correct_translation']
         else:
             # RU→EN: правильный ответ — английское слово
-            correct_answer = test['word']
-
-        is_correct = (selected_option_text == correct_answer)
-
-        # Получаем текущее состояние слова
-        word = self.db.get_word_by_id(test['word_id'])
-        if not word:
-            raise Exception(f"Слово {test['word_id']} не найдено")
+            correct_answer = result['word']
 
-        current_status = word.get('status', 'new')
-        current_rating = word.get('rating') or 0
+        # Состояние слова в сессии (на случай повторного показа)
+        if session_test is not None:
+            session_test['status'] = result['new_status']
+            session_test['rating'] = result['new_rating']
 
-        # Обновляем статус (new → learning)
-        if current_status == 'new':
-            self.db.update_word_status(test['word_id'], 'learning')
-            current_status = 'learning'
-
-        # Обновляем рейтинг (максимум 10)
-        if is_correct:
-            new_rating = min(current_rating + 1, 10)
-        else:
-            new_rating = 0
-            # Если слово было learned, возвращаем в learning
-            if current_status == 'learned':
-                self.db.update_word_status(test['word_id'], 'learning')
-                current_status = 'learning'
-
-        # Обновляем рейтинг в БД
-        self.db.update_word_rating(test['word_id'], new_rating)
+        # Дополнительные значения (все переводы кроме основного)
+        additional_meanings = [t for t in result['translations'] if t != result['correct_translation']]
 
-        # Переходим в learned если рейтинг >= 10
-        if current_status == 'learning' and new_rating >= 10:
-            self.db.update_word_status(test['word_id'], 'learned')
-            current_status = 'learned'
+        return {
+            'is_correct': result['is_correct'],
+            'correct_answer': correct_answer,
+            'correct_translation': result['correct_translation'],  # для совместимости
+            'additional_meanings': additional_meanings,
+            'new_rating': result['new_rating'],
+            'new_status': result['new_status'],
+            'word': result['word'],
+            'test_mode': test_mode
+        }
 
-        # Обновляем статистику
-        self.db.update_word_statistics(test['user_id'], test['word_id'], is_correct)
+    def _log_answer(self, answer_log, session_test: Dict, selected_option_text: str) -> Optional[Dict]:
+        """Проверить ответ по тесту из сессии и записать событие в AnswerLog (None — журнал заполнен)"""
+        test_mode = session_test.get('test_mode') or 1
+        is_correct = selected_option_text == session_test['correct_answer']
 
-        # Удаляем тест
-        self.db.delete_test(test_id)
+        if answer_log.append(session_test, selected_option_text, is_correct) is None:
+            return None
+        new_status, new_rating = next_word_state(session_test.get('status'), session_test.get('rating'), is_correct)
+        session_test['status'] = new_status
+        session_test['rating'] = new_rating
 
-        # Дополнительные значения (все переводы кроме основного)
-        all_translations = self.db.get_all_translations_for_word(test['word_id'])
-        additional_meanings = [t for t in all_translations if t != test['correct_translation']]
+        additional_meanings = [t for t in session_test['translations'] if t != session_test['correct_translation']]
 
         return {
             'is_correct': is_correct,
-            'correct_answer': correct_answer,
-            'correct_translation': test['correct_translation'],  # для совместимости
+            'correct_answer': session_test['correct_answer'],
+            'correct_translation': session_test['correct_translation'],  # для совместимости
             'additional_meanings': additional_meanings,
             'new_rating': new_rating,
-            'new_status': current_status,
-            'word': test['word'],
+            'new_status': new_status,
+            'word': session_test['word'],
             'test_mode': test_mode
         }
 
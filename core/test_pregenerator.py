@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+TestPregenerator - фоновая подготовка вариантов ответов для тестов
+
+Варианты для обоих режимов генерируются, когда слово добавляется в словарь,
+и после каждого использования в тренировке. Источник — общий DistractorCache,
+агенты #3 и #4 вызываются, пока у слова не накопится достаточно наборов.
+Результат хранится в таблице test_pool, поэтому старт тренировки не ждёт AI.
+
+Генерация идёт в пуле потоков внутри процесса: каждая задача запускает
+свой event loop, запросы пользователя при этом не блокируются.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from database import WordoorioDatabase
+
+logger = logging.getLogger(__name__)
+
+PREGEN_WORKERS = int(os.getenv('TEST_PREGEN_WORKERS', '2'))
+PREGEN_BATCH_SIZE = 10  # слов в одном запросе к агенту
+
+
+class TestPregenerator:
+    """Фоновое заполнение test_pool"""
+
+    def __init__(self, db: WordoorioDatabase, max_workers: int = PREGEN_WORKERS):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='test-pregen')
+        self._lock = threading.Lock()
+        self._pending = set()  # (user_id, word_id), уже стоящие в очереди
+
+    def enqueue(self, user_id: int, word_ids: List[int]):
+        """
+        Поставить слова в очередь на генерацию (не блокирует)
+
+        Слова, которые уже ждут генерации, повторно не добавляются.
+        """
+        with self._lock:
+            fresh = [wid for wid in word_ids if (user_id, wid) not in self._pending]
+            self._pending.update((user_id, wid) for wid in fresh)
+
+        for i in range(0, len(fresh), PREGEN_BATCH_SIZE):
+            self._executor.submit(self._run, user_id, fresh[i:i + PREGEN_BATCH_SIZE])
+
+        if fresh:
+            logger.info(f"[TestPregenerator] user_id={user_id}: в очередь {len(fresh)} слов")
+
+    def _run(self, user_id: int, word_ids: List[int]):
+        """Точка входа потока"""
+        try:
+            asyncio.run(self.generate(user_id, word_ids))
+        except Exception as e:
+            logger.error(f"[TestPregenerator] Ошибка генерации для user_id={user_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.difference_update((user_id, wid) for wid in word_ids)
+
+    async def generate(self, user_id: int, word_ids: List[int]) -> int:
+        """
+        Сгенерировать варианты обоих режимов и сохранить в test_pool
+
+        Args:
+            user_id: ID пользователя
+            word_ids: ID слов
+
+        Returns:
+            Количество сохранённых строк пула
+        """
+        from core.test_manager import TestManager
+        from core.yandex_ai_client import YandexAIClient
+
+        test_manager = TestManager(self.db, YandexAIClient())
+
+        words = self.db.get_user_words_by_ids(user_id, word_ids)
+        words_data = test_manager.prepare_words_data(words)
+        if not words_data:
+            return 0
+
+        # Оба режима параллельно, ошибка одного не мешает другому.
+        # refresh=True: пока у слова мало наборов в общем кэше, добавляем новые
+        results = await asyncio.gather(
+            test_manager.get_options(words_data, 1, refresh=True),
+            test_manager.get_options(words_data, 2, refresh=True),
+            return_exceptions=True
+        )
+
+        rows = []
+        for test_mode, options in zip((1, 2), results):
+            if isinstance(options, BaseException):
+                logger.warning(f"[TestPregenerator] mode={test_mode}: AI не ответил: {options}")
+                continue
+
+            for w in words_data:
+                wrong_options = options.get(w['word_id'])
+                if not wrong_options:
+                    continue
+                rows.append({
+                    'user_id': user_id,
+                    'word_id': w['word_id'],
+                    'test_mode': test_mode,
+                    'word': w['word'],
+                    'correct_translation': w['correct_translation'],
+                    'wrong_option_1': wrong_options[0],
+                    'wrong_option_2': wrong_options[1],
+                    'wrong_option_3': wrong_options[2],
+                })
+
+        self.db.upsert_test_pool(rows)
+        logger.info(f"[TestPregenerator] user_id={user_id}: в пул записано {len(rows)} тестов")
+        return len(rows)
+
+
+_pregenerator: Optional[TestPregenerator] = None
+_pregenerator_lock = threading.Lock()
+
+
+def get_pregenerator(db: WordoorioDatabase) -> TestPregenerator:
+    """Общий экземпляр на процесс (один пул потоков на воркер gunicorn)"""
+    global _pregenerator
+    with _pregenerator_lock:
+        if _pregenerator is None:
+            _pregenerator = TestPregenerator(db)
+        return _pregenerator
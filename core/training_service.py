@@ -2,20 +2,107 @@
 """
 TrainingService - сервис для отбора слов для тренировки
 Реализует 8-шаговый алгоритм отбора слов (YDB версия)
+
+Все слова пользователя загружаются одним запросом, после чего шаги
+алгоритма выполняются в памяти по заранее отсортированным спискам.
+
+Если у пользователя уже есть расписание повторений (word_schedule),
+сначала берутся слова с наступившим due_at (SpacedRepetitionScheduler) —
+ограниченное чтение первых N строк индекса, но не больше TRAINING_DUE_SHARE
+сессии; остаток (в том числе новые слова, у которых расписания ещё нет)
+добирается алгоритмом.
 """
 
+import os
+import math
+import time
+import random
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from database import WordoorioDatabase
+from core.spaced_repetition import SpacedRepetitionScheduler
+from core.answer_log import get_answer_log, ANSWER_LOG_FLUSH_MS
+from core.session_store import get_session_store
 
 logger = logging.getLogger(__name__)
 
+# Сколько ждать записи ответов сессии, накопленных другими воркерами
+FINISH_WAIT_SECONDS = 2 * ANSWER_LOG_FLUSH_MS / 1000 + 1
+FINISH_POLL_SECONDS = 0.25
+
+# Доля сессии, которую могут занять слова из очереди повторений
+TRAINING_DUE_SHARE = float(os.getenv('TRAINING_DUE_SHARE', '0.7'))
+
+
+# Шаг алгоритма → очередь кандидатов, из которой он берёт слово
+STEP_QUEUES = {
+    1: 'new_newest',       # Новое слово, добавленное последним
+    2: 'learning_stale',   # Learning по давности повтора
+    3: 'new_oldest',       # Новое слово, добавленное давнее всего
+    4: 'learning_top',     # Learning с максимальной оценкой (рандомно)
+    5: 'learning_reset',   # Слово, обнулившее оценку последним
+    6: 'learning_top',     # Дубликат шага 4
+    7: 'new_oldest',       # Дубликат шага 3
+    8: 'learned_random',   # Рандомное выученное слово
+}
+
+
+def _time_key(value) -> tuple:
+    """Ключ сортировки по Timestamp-колонке (строки без времени — первыми)"""
+    return (value is not None, value)
+
+
+class _StepQueues:
+    """Отсортированные очереди кандидатов для шагов 8-шагового алгоритма"""
+
+    def __init__(self, words: List[Dict], rng: random.Random):
+        new_words = [w for w in words if w.get('status') == 'new']
+        learning = [w for w in words if w.get('status') == 'learning']
+        learned = [w for w in words if w.get('status') == 'learned']
+
+        # Шаги 1, 3, 7: по дате добавления
+        new_oldest = sorted(new_words, key=lambda w: _time_key(w.get('added_ts')))
+
+        # Шаги 4, 6: рейтинг DESC, среди одинаковых — случайный порядок
+        tiebreak = {w['id']: rng.random() for w in learning}
+        learning_top = sorted(learning, key=lambda w: (-(w.get('rating') or 0), tiebreak[w['id']]))
+
+        # Шаг 5: обнулённые, последнее обнуление первым
+        learning_reset = sorted(
+            (w for w in learning if not (w.get('rating') or 0) and w.get('last_rating_change_ts')),
+            key=lambda w: w['last_rating_change_ts'],
+            reverse=True
+        )
+
+        learned_random = list(learned)
+        rng.shuffle(learned_random)
+
+        self._queues = {
+            'new_newest': new_oldest[::-1],
+            'learning_stale': sorted(learning, key=lambda w: _time_key(w.get('last_reviewed_ts') or w.get('added_ts'))),
+            'new_oldest': new_oldest,
+            'learning_top': learning_top,
+            'learning_reset': learning_reset,
+            'learned_random': learned_random,
+        }
+        self._cursors = {name: 0 for name in self._queues}
+
+    def take(self, name: str, selected_ids: set) -> Optional[Dict]:
+        """Следующее ещё не выбранное слово из очереди (или None)"""
+        queue = self._queues[name]
+        cursor = self._cursors[name]
+        while cursor < len(queue) and queue[cursor]['id'] in selected_ids:
+            cursor += 1
+        self._cursors[name] = cursor + 1
+        return queue[cursor] if cursor < len(queue) else None
+
 
 class TrainingService:
     """Сервис для отбора слов для тренировки"""
 
     def __init__(self, db: WordoorioDatabase):
         self.db = db
+        self.scheduler = SpacedRepetitionScheduler(db)
 
     def select_words_for_training(self, user_id: int, count: int = 10) -> List[Dict]:
         """
@@ -37,68 +124,112 @@ class TrainingService:
             6. Слово learning с максимальной оценкой (дубликат шага 4)
             7. Новое слово, добавленное давнее всего (дубликат шага 3)
             8. Рандомное слово из выученных
+
+        Сначала берутся слова, срок повторения которых наступил (по due_at),
+        но не больше TRAINING_DUE_SHARE от count — остаток до count добирается
+        алгоритмом, иначе накопленные повторения вытесняли бы новые слова.
         """
+        due_limit = min(count, math.ceil(count * TRAINING_DUE_SHARE))
+        due_words = self.scheduler.get_due_words(user_id, due_limit) if due_limit > 0 else []
+        if due_words:
+            logger.info(f"[TrainingService] user_id={user_id}: {len(due_words)} слов из очереди повторений")
+        if len(due_words) >= count:
+            return due_words
+
         # Получаем текущую позицию в алгоритме
         state = self.db.get_user_training_state(user_id)
         current_position = state.get('last_selection_position', 1) or 1
         logger.info(f"[TrainingService] user_id={user_id}, текущая позиция: {current_position}, нужно слов: {count}")
 
-        selected_words = []
-        position = current_position
-        iterations = 0
-        max_iterations = 50  # Защита от бесконечного цикла
-
-        # Продолжаем отбирать, пока не наберем нужное количество
-        completed_full_cycle = False
-        while len(selected_words) < count and iterations < max_iterations:
-            iterations += 1
-            # Получаем слова по текущему шагу через YDB
-            step_words = self.db.get_words_by_training_step(user_id, position)
-            logger.info(f"[TrainingService] Шаг {position}: найдено {len(step_words)} слов")
-
-            # Добавляем слова, избегая дубликатов
-            for word in step_words:
-                if len(selected_words) >= count:
-                    break
-                # Проверяем, что слово еще не добавлено
-                if not any(w['id'] == word['id'] for w in selected_words):
-                    # Нормализуем rating (может быть None)
-                    word['rating'] = word.get('rating') or 0
-                    selected_words.append(word)
-                    logger.info(f"[TrainingService] Добавлено слово: {word.get('lemma', '?')} (status={word.get('status', '?')})")
-
-            # Переходим к следующему шагу (циклически)
-            position = (position % 8) + 1
+        # Один запрос: все кандидаты пользователя
+        candidates = self.db.get_training_candidates(user_id)
+        for word in candidates:
+            # Нормализуем rating (может быть None)
+            word['rating'] = word.get('rating') or 0
 
-            # Проверяем, завершили ли полный цикл
-            if position == current_position:
-                completed_full_cycle = True
-                logger.info(f"[TrainingService] Завершен полный цикл из 8 шагов. Отобрано {len(selected_words)} слов.")
-                break
+        rng = random.Random()
+        queues = _StepQueues(candidates, rng)
 
-        # Если после полного цикла недостаточно слов, добираем случайными словами
-        if len(selected_words) < count and completed_full_cycle:
-            logger.info(f"[TrainingService] Добираем оставшиеся слова случайным образом...")
+        selected_words = list(due_words)
+        selected_ids = {w['id'] for w in due_words}
+        position = current_position
 
-            # Получаем ID уже выбранных слов
-            selected_ids = [w['id'] for w in selected_words]
+        # Один проход по 8 шагам начиная с сохранённой позиции
+        for _ in range(len(STEP_QUEUES)):
+            if len(selected_words) >= count:
+                break
+            word = queues.take(STEP_QUEUES[position], selected_ids)
+            if word:
+                selected_words.append(word)
+                selected_ids.add(word['id'])
+                logger.info(f"[TrainingService] Шаг {position}: {word.get('lemma', '?')} (status={word.get('status', '?')})")
 
-            # Получаем случайные слова, которые еще не выбраны
-            remaining_count = count - len(selected_words)
-            random_words = self.db.get_random_words_excluding(user_id, selected_ids, remaining_count)
+            # Переходим к следующему шагу (циклически)
+            position = (position % 8) + 1
 
+        # После полного прохода добираем случайными словами
+        if len(selected_words) < count:
+            remaining = [w for w in candidates if w['id'] not in selected_ids]
+            random_words = rng.sample(remaining, min(count - len(selected_words), len(remaining)))
             for word in random_words:
-                word['rating'] = word.get('rating') or 0
                 selected_words.append(word)
                 logger.info(f"[TrainingService] Добавлено случайное слово: {word.get('lemma', '?')} (status={word.get('status', '?')})")
 
-        logger.info(f"[TrainingService] Итого отобрано {len(selected_words)} слов за {iterations} итераций")
+        logger.info(f"[TrainingService] Итого отобрано {len(selected_words)} из {len(candidates)} слов")
 
         # Сохраняем новую позицию
         self.db.update_training_position(user_id, position)
 
         return selected_words
 
+    def finish_session(self, user_id: int, token: Optional[str] = None) -> int:
+        """
+        Завершение тренировки: пересчёт очереди повторений пользователя
+
+        Расписание считается по статистике, поэтому сначала записываются
+        накопленные ответы этого процесса. На остальные тесты сессии могли
+        ответить через другие воркеры (их AnswerLog пишет пачку раз в
+        ANSWER_LOG_FLUSH_MS): если известен токен сессии, пересчёт ждёт, пока
+        эти тесты не исчезнут из YDB (отвеченный тест удаляется при записи
+        ответа), но не дольше FINISH_WAIT_SECONDS. Ответы, записанные позже,
+        учтёт следующий пересчёт (total_tests > reviews_seen).
+
+        Args:
+            user_id: ID пользователя
+            token: Токен сессии тренировки (TrainingSessionStore)
+
+        Returns:
+            Количество обновлённых слов в расписании
+        """
+        answer_log = get_answer_log(self.db)
+        if answer_log:
+            answer_log.flush()
+            if token:
+                self._wait_for_answers(user_id, token)
+        return self.scheduler.reschedule_user(user_id)
+
+    def _wait_for_answers(self, user_id: int, token: str):
+        """Дождаться записи в YDB ответов сессии, принятых другими воркерами"""
+        training_session = get_session_store(self.db).get(token)
+        if not training_session:
+            return
+        # Ответы этого воркера уже записаны flush()
+        test_ids = [t['test_id'] for t in training_session['tests'] if not t.get('answered')]
+        deadline = time.time() + FINISH_WAIT_SECONDS
+        while test_ids:
+            try:
+                waiting = self.db.count_existing_tests(user_id, test_ids)
+            except Exception as e:
+                logger.error(f"[TrainingService] Ошибка проверки записанных ответов: {e}")
+                return
+            if not waiting:
+                return
+            if time.time() >= deadline:
+                logger.warning(f"[TrainingService] user_id={user_id}: {waiting} тестов сессии {token} "
+                               f"ещё без записанного ответа, пересчёт без них")
+                return
+            time.sleep(FINISH_POLL_SECONDS)
+
     def get_translation_for_word(self, word_id: int) -> str:
         """
         Получить перевод для слова
@@ -109,4 +240,5 @@ class TrainingService:
         Returns:
             Перевод слова (первый из списка)
         """
-        return self.db.get_translation_for_word(word_id)
+        translations = self.db.hydrate_words([word_id], ['translations'])[word_id]['translations']
+        return translations[0] if translations else ""
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Typeahead - подсказки по словарю пользователя при вводе
+
+Для каждого пользователя в памяти процесса держится отсортированный массив
+ключей: нормализованные леммы и переводы, начиная с каждого их слова
+("run away" ищется и по "away"). Префикс ищется bisect'ом, поэтому
+подсказка не обращается к YDB и занимает микросекунды. Страница словаря
+при вводе запроса показывает именно эти совпадения (постранично).
+
+Индекс строится лениво одним запросом (db.get_typeahead_rows), сбрасывается
+при изменении словаря (invalidate_typeahead, из других процессов — через
+changefeed, core/cache_invalidation.py) и вытесняется по LRU. TTL ограничивает
+устаревание, если чтение changefeed недоступно.
+"""
+
+import os
+import time
+import bisect
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+from database import WordoorioDatabase, search_key
+
+logger = logging.getLogger(__name__)
+
+TYPEAHEAD_CACHE_SIZE = int(os.getenv('TYPEAHEAD_CACHE_SIZE', '500'))
+TYPEAHEAD_TTL = int(os.getenv('TYPEAHEAD_TTL', '300'))  # секунд
+
+
+def word_starts(key: str) -> List[str]:
+    """Окончания ключа, начинающиеся с каждого его слова"""
+    starts = [key]
+    position = key.find(' ')
+    while position != -1:
+        starts.append(key[position + 1:])
+        position = key.find(' ', position + 1)
+    return starts
+
+
+class _UserTypeahead:
+    """Отсортированные ключи словаря одного пользователя"""
+
+    def __init__(self, rows: List[tuple]):
+        # (ключ, лемма, перевод, word_id); у ключа-леммы перевод пустой.
+        # Строк по слову столько, сколько переводов, поэтому — через set
+        entries = set()
+        for word_id, lemma, translation in rows:
+            if not lemma:
+                continue
+            entries.update((key, lemma, '', word_id) for key in word_starts(search_key(lemma)))
+            if translation:
+                entries.update((key, lemma, translation, word_id)
+                               for key in word_starts(search_key(translation)))
+        entries = sorted(entries)
+
+        self.keys = [e[0] for e in entries]
+        self.entries = entries
+        self.built_at = time.time()
+
+    def lookup(self, prefix: str, limit: int, offset: int = 0) -> List[Dict]:
+        """Слова, у которых слово леммы или перевода начинается с prefix (по алфавиту ключа)"""
+        matches = []
+        seen = set()
+        start = bisect.bisect_left(self.keys, prefix)
+        for key, lemma, translation, word_id in itertools.islice(self.entries, start, None):
+            if not key.startswith(prefix):
+                break
+            if word_id in seen:
+                continue
+            seen.add(word_id)
+            if len(seen) <= offset:
+                continue
+            matches.append({
+                'word_id': word_id,
+                'lemma': lemma,
+                'translation': translation or None,
+                'matched': 'translation' if translation else 'lemma',
+            })
+            if len(matches) == limit:
+                break
+        return matches
+
+
+class Typeahead:
+    """LRU индексов подсказок по пользователям"""
+
+    def __init__(self, db: WordoorioDatabase, max_users: int = TYPEAHEAD_CACHE_SIZE):
+        self.db = db
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[int, _UserTypeahead]" = OrderedDict()
+
+    def _index(self, user_id: int) -> _UserTypeahead:
+        """Индекс пользователя (строится одним запросом при промахе)"""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index and time.time() - index.built_at < TYPEAHEAD_TTL:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        started = time.time()
+        index = _UserTypeahead(self.db.get_typeahead_rows(user_id))
+        logger.info(f"[Typeahead] Индекс user_id={user_id}: {len(index.keys)} ключей "
+                    f"за {(time.time() - started) * 1000:.0f} мс")
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def suggest(self, user_id: int, query: str, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """
+        Подсказки по началу слова леммы или перевода
+
+        Args:
+            user_id: ID пользователя
+            query: Введённый текст
+            limit: Максимум подсказок
+            offset: Сколько первых совпадений пропустить (следующая страница)
+
+        Returns:
+            [{'word_id', 'lemma', 'translation', 'matched'}, ...]
+        """
+        prefix = search_key(query)
+        if not prefix:
+            return []
+        return self._index(user_id).lookup(prefix, limit, offset)
+
+    def invalidate(self, user_id: Optional[int]):
+        """Сбросить индекс пользователя (словарь изменился)"""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def clear(self):
+        """Сбросить все индексы"""
+        with self._lock:
+            self._indexes.clear()
+
+
+_typeahead: Optional[Typeahead] = None
+_typeahead_lock = threading.Lock()
+
+
+def get_typeahead(db: WordoorioDatabase) -> Typeahead:
+    """Общий экземпляр на процесс"""
+    global _typeahead
+    with _typeahead_lock:
+        if _typeahead is None:
+            _typeahead = Typeahead(db)
+        return _typeahead
+
+
+def invalidate_typeahead(user_id: Optional[int]):
+    """Сбросить индекс пользователя, если подсказки уже используются в процессе"""
+    if _typeahead is not None:
+        _typeahead.invalidate(user_id)
+
+
+def clear_typeahead():
+    """Сбросить все индексы, если подсказки уже используются в процессе"""
+    if _typeahead is not None:
+        _typeahead.clear()
@@ -19,10 +19,15 @@ load_dotenv()
 
 # Импортируем контракты
 from contracts.analysis_contracts import AgentResponse
+from core.shared_cache import get_shared_cache
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+# Время жизни ответов в общем кэше процессов (core/shared_cache.py)
+AGENT_CACHE_TTL = int(os.getenv('AGENT_CACHE_TTL', str(24 * 3600)))  # секунд, 0 — не кэшировать
+DICTIONARY_LOOKUP_TTL = 30 * 24 * 3600  # секунд
+
 class YandexAIClient:
     """Клиент для работы с Yandex AI Studio"""
 
@@ -227,6 +232,14 @@ class YandexAIClient:
         """
         logger.info(f"Вызов агента {agent_id[:10]}...")
 
+        # Тот же вход у того же агента — ответ из общего кэша процессов
+        cache_key = f"{agent_id}:{user_input}"
+        if AGENT_CACHE_TTL > 0:
+            cached = get_shared_cache().get('agent', cache_key)
+            if cached is not None:
+                logger.info(f"Ответ агента {agent_id[:10]} из кэша")
+                return AgentResponse.from_dict(cached)
+
         # Получаем API ключ (приоритет: YANDEX_CLOUD_API_KEY > IAM токен)
         api_key = os.getenv('YANDEX_CLOUD_API_KEY', self.iam_token)
 
@@ -281,10 +294,14 @@ class YandexAIClient:
                     # Парсим JSON ответ агента в AgentResponse
                     try:
                         agent_data = json.loads(response_text)
-                        return AgentResponse.from_dict(agent_data)
+                        agent_response = AgentResponse.from_dict(agent_data)
                     except json.JSONDecodeError as e:
                         raise Exception(f"Не удалось распарсить JSON от агента: {e}. Ответ: {response_text[:200]}")
 
+                    if AGENT_CACHE_TTL > 0:
+                        get_shared_cache().set('agent', cache_key, agent_data, AGENT_CACHE_TTL)
+                    return agent_response
+
         except Exception as e:
             logger.error(f"ERROR in call_agent: {type(e).__name__}: {str(e)}", exc_info=True)
             raise Exception(f"Ошибка вызова агента: {str(e)}")
@@ -343,10 +360,15 @@ class YandexAIClient:
         if not self.dict_api_key:
             return []
 
+        cache_key = word.lower()
+        cached = get_shared_cache().get('dictionary', cache_key)
+        if cached is not None:
+            return cached
+
         params = {
             'key': self.dict_api_key,
             'lang': 'en-ru',
-            'text': word.lower()
+            'text': cache_key
         }
 
         try:
@@ -365,6 +387,7 @@ class YandexAIClient:
                                 for translation in definition['tr']:
                                     translations.append(translation.get('text', ''))
 
+                    get_shared_cache().set('dictionary', cache_key, translations, DICTIONARY_LOOKUP_TTL)
                     return translations
         except Exception as e:
             return []
@@ -10,8 +10,12 @@ import logging
 import aiohttp
 from typing import Optional, Dict, List
 
+from core.shared_cache import get_shared_cache
+
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_CACHE_TTL = 7 * 24 * 3600  # секунд, общий кэш процессов (core/shared_cache.py)
+
 
 class YouTubeService:
     """Сервис для работы с YouTube транскриптами через TranscriptAPI"""
@@ -56,6 +60,12 @@ class YouTubeService:
                 'error': 'API ключ не настроен'
             }
 
+        cache_key = f"{video_id}:{language}"
+        cached = get_shared_cache().get('transcript', cache_key)
+        if cached is not None:
+            logger.info(f"[YouTubeService] Транскрипт video_id={video_id} из кэша")
+            return cached
+
         try:
             url = f"{self.BASE_URL}/youtube/transcript"
             params = {
@@ -88,7 +98,7 @@ class YouTubeService:
 
                         logger.info(f"[YouTubeService] Получен транскрипт, длина={len(transcript_text)}")
 
-                        return {
+                        result = {
                             'success': True,
                             'video_id': video_id,
                             'text': transcript_text,
@@ -96,6 +106,8 @@ class YouTubeService:
                             'title': metadata.get('title', ''),
                             'duration': metadata.get('duration', 0)
                         }
+                        get_shared_cache().set('transcript', cache_key, result, TRANSCRIPT_CACHE_TTL)
+                        return result
 
                     elif response.status == 401:
                         return {'success': False, 'error': 'Неверный API ключ'}
@@ -42,6 +42,15 @@ def create_tables(pool, session):
         """,
 
         # 2. Таблица словарных слов
+        # Таблицы словаря ключуются по пользователю: слова одного пользователя
+        # лежат подряд, чтения по пользователю — диапазон первичного ключа.
+        # idx_id — для точечного доступа по одному ID (тест, ответ).
+        # Вторичные индексы повторяют условия запросов: (user_id, added_ts) —
+        # последние слова, (user_id, lemma) — поиск по лемме.
+        # Время — в колонках *_ts (Timestamp); Utf8-колонки *_at пишутся параллельно
+        # на время перехода (migrations/add_timestamp_columns.py)
+        # doc — документ слова (JSON: переводы, примеры, их количество) для чтения
+        # карточки одной строкой; таблицы переводов и примеров — полная история
         """
         CREATE TABLE dictionary_words (
             id Uint64,
@@ -55,42 +64,50 @@ def create_tables(pool, session):
             correct_streak Uint32,
             rating Uint32,
             last_rating_change Utf8,
-            PRIMARY KEY (id),
+            added_ts Timestamp,
+            last_reviewed_ts Timestamp,
+            last_rating_change_ts Timestamp,
+            doc Utf8,
+            PRIMARY KEY (user_id, id),
+            INDEX idx_id GLOBAL ON (id),
             INDEX idx_user_lemma GLOBAL ON (user_id, lemma),
-            INDEX idx_lemma GLOBAL ON (lemma),
-            INDEX idx_status GLOBAL ON (status),
-            INDEX idx_rating GLOBAL ON (rating)
+            INDEX idx_user_added_ts GLOBAL ON (user_id, added_ts)
         )
         """,
 
-        # 3. Переводы слов
+        # 3. Переводы слов (idx_word_translation покрывает чтение переводов пачки слов)
         """
         CREATE TABLE dictionary_translations (
             id Uint64,
+            user_id Uint64,
             word_id Uint64,
             translation Utf8,
             source_session_id Utf8,
             added_at Utf8,
-            PRIMARY KEY (id),
-            INDEX idx_word_id GLOBAL ON (word_id)
+            added_ts Timestamp,
+            PRIMARY KEY (user_id, word_id, id),
+            INDEX idx_word_translation GLOBAL ON (word_id) COVER (translation, added_at)
         )
         """,
 
-        # 4. Примеры использования слов
+        # 4. Примеры использования слов (idx_word_example покрывает чтение примеров пачки слов)
         """
         CREATE TABLE dictionary_examples (
             id Uint64,
+            user_id Uint64,
             word_id Uint64,
             original_form Utf8,
             context Utf8,
             session_id Utf8,
             added_at Utf8,
-            PRIMARY KEY (id),
-            INDEX idx_word_id GLOBAL ON (word_id)
+            added_ts Timestamp,
+            PRIMARY KEY (user_id, word_id, id),
+            INDEX idx_word_example GLOBAL ON (word_id) COVER (original_form, context, added_at)
         )
         """,
 
         # 5. Анализы текста
+        # expire_at заполняется у анонимных и пустых анализов — их удаляет TTL
         """
         CREATE TABLE analyses (
             id Uint64,
@@ -101,14 +118,17 @@ def create_tables(pool, session):
             total_words Uint32,
             session_id Utf8,
             ip_address Utf8,
+            expire_at Timestamp,
             PRIMARY KEY (id),
-            INDEX idx_user_id GLOBAL ON (user_id),
+            INDEX idx_user_date GLOBAL ON (user_id, analysis_date),
             INDEX idx_analysis_date GLOBAL ON (analysis_date),
-            INDEX idx_session_id GLOBAL ON (session_id)
+            INDEX idx_session_user GLOBAL ON (session_id, user_id, analysis_date)
         )
+        WITH (TTL = Interval("PT0S") ON expire_at)
         """,
 
         # 6. Хайлайты (связь анализов и слов из словаря)
+        # idx_analysis_position покрывает чтение хайлайтов анализа по порядку
         """
         CREATE TABLE highlights (
             id Uint64,
@@ -116,7 +136,7 @@ def create_tables(pool, session):
             word_id Uint64,
             position Uint32,
             PRIMARY KEY (id),
-            INDEX idx_analysis_id GLOBAL ON (analysis_id),
+            INDEX idx_analysis_position GLOBAL ON (analysis_id, position) COVER (word_id),
             INDEX idx_word_id GLOBAL ON (word_id)
         )
         """,
@@ -133,6 +153,7 @@ def create_tables(pool, session):
 
         # 8. Тесты
         # test_mode: 1 = EN→RU (англ→рус), 2 = RU→EN (рус→англ)
+        # Брошенные тренировки удаляются TTL через 7 дней
         """
         CREATE TABLE tests (
             id Uint64,
@@ -145,24 +166,135 @@ def create_tables(pool, session):
             wrong_option_3 Utf8,
             test_mode Uint32,
             created_at Utf8,
-            PRIMARY KEY (id),
-            INDEX idx_user_id GLOBAL ON (user_id)
+            created_ts Timestamp,
+            PRIMARY KEY (user_id, id),
+            INDEX idx_id GLOBAL ON (id)
         )
+        WITH (TTL = Interval("P7D") ON created_ts)
         """,
 
         # 9. Статистика тестирования слов
         """
         CREATE TABLE word_test_statistics (
-            id Uint64,
             user_id Uint64,
             word_id Uint64,
             total_tests Uint32,
             correct_answers Uint32,
             wrong_answers Uint32,
             last_test_at Utf8,
+            last_test_ts Timestamp,
             last_result Bool,
-            PRIMARY KEY (id),
-            INDEX idx_user_word GLOBAL ON (user_id, word_id)
+            PRIMARY KEY (user_id, word_id)
+        )
+        """,
+
+        # 10. Очередь повторений (SM-2)
+        """
+        CREATE TABLE word_schedule (
+            user_id Uint64,
+            word_id Uint64,
+            due_at Timestamp,
+            interval_days Double,
+            ease Double,
+            repetitions Uint32,
+            reviews_seen Uint32,
+            PRIMARY KEY (user_id, word_id),
+            INDEX idx_user_due GLOBAL ON (user_id, due_at)
+        )
+        """,
+
+        # 11. Готовые варианты ответов для тестов (заполняются в фоне)
+        """
+        CREATE TABLE test_pool (
+            user_id Uint64,
+            word_id Uint64,
+            test_mode Uint32,
+            word Utf8,
+            correct_translation Utf8,
+            wrong_option_1 Utf8,
+            wrong_option_2 Utf8,
+            wrong_option_3 Utf8,
+            created_at Utf8,
+            PRIMARY KEY (user_id, word_id, test_mode)
+        )
+        """,
+
+        # 12. Общий кэш вариантов ответов (не зависит от пользователя)
+        """
+        CREATE TABLE distractor_sets (
+            lemma Utf8,
+            translation Utf8,
+            test_mode Uint32,
+            set_id Uint32,
+            wrong_option_1 Utf8,
+            wrong_option_2 Utf8,
+            wrong_option_3 Utf8,
+            created_at Timestamp,
+            last_used_at Timestamp,
+            PRIMARY KEY (lemma, translation, test_mode, set_id)
+        )
+        WITH (TTL = Interval("P90D") ON created_at)
+        """,
+
+        # 13. Активные тренировки Telegram-бота (материализованные тесты)
+        """
+        CREATE TABLE training_sessions (
+            token Utf8,
+            user_id Uint64,
+            payload Utf8,
+            created_at Timestamp,
+            PRIMARY KEY (token)
+        )
+        WITH (TTL = Interval("P1D") ON created_at)
+        """,
+
+        # 14. Журнал ответов тренировки (пишется пачками из AnswerLog)
+        """
+        CREATE TABLE answer_events (
+            event_id Utf8,
+            user_id Uint64,
+            word_id Uint64,
+            test_id Uint64,
+            test_mode Uint32,
+            answer Utf8,
+            is_correct Bool,
+            answered_at Utf8,
+            PRIMARY KEY (event_id),
+            INDEX idx_user_answered GLOBAL ON (user_id, answered_at)
+        )
+        """,
+
+        # 15. Счётчики для статистики (обновляются в транзакциях записи)
+        # scope: 'global/<shard>', 'user:<id>', 'anonymous'; name: 'analyses', 'type:word', 'status:new', ...
+        """
+        CREATE TABLE counters (
+            scope Utf8,
+            name Utf8,
+            value Int64,
+            PRIMARY KEY (scope, name)
+        )
+        """,
+
+        # 16. Поисковый индекс (постинги лемм и триграмм, пишутся вместе со словами/хайлайтами)
+        # term: 'w:<лемма>' или 't:<триграмма>'; analysis_id = 0 — запись словаря
+        """
+        CREATE TABLE search_index (
+            scope Utf8,
+            term Utf8,
+            word_id Uint64,
+            analysis_id Uint64,
+            text Utf8,
+            PRIMARY KEY (scope, term, word_id, analysis_id)
+        )
+        """,
+
+        # 17. Аренда consumer'ов changefeed'а сброса кэшей (слот — процесс, core/cache_invalidation.py)
+        """
+        CREATE TABLE cache_consumers (
+            slot Uint32,
+            owner Utf8,
+            expires_ts Timestamp,
+            PRIMARY KEY (slot)
         )
         """
     ]
@@ -176,7 +308,15 @@ def create_tables(pool, session):
         "highlights",
         "user_training_state",
         "tests",
-        "word_test_statistics"
+        "word_test_statistics",
+        "word_schedule",
+        "test_pool",
+        "distractor_sets",
+        "training_sessions",
+        "answer_events",
+        "counters",
+        "search_index",
+        "cache_consumers"
     ]
 
     for i, query in enumerate(tables):
@@ -187,6 +327,22 @@ def create_tables(pool, session):
         except Exception as e:
             print(f"❌ Ошибка при создании таблицы {table_names[i]}: {e}")
 
+    # Changefeed'ы сброса кэшей и consumer'ы cache_0 … cache_15
+    # (CHANGEFEED, CONSUMER_PREFIX, CACHE_INVALIDATION_SLOTS в core/cache_invalidation.py)
+    for table in ["dictionary_words", "dictionary_translations", "tests"]:
+        try:
+            print(f"Создаем changefeed {table}/cache_invalidation...")
+            session.execute_scheme(f"""
+            ALTER TABLE {table} ADD CHANGEFEED cache_invalidation WITH (
+                FORMAT = 'JSON', MODE = 'KEYS_ONLY', RETENTION_PERIOD = Interval("PT1H")
+            )
+            """)
+            session.execute_scheme(f"ALTER TOPIC `{table}/cache_invalidation` " +
+                                   ", ".join(f"ADD CONSUMER cache_{slot}" for slot in range(16)))
+            print(f"✅ Changefeed {table}/cache_invalidation создан")
+        except Exception as e:
+            print(f"❌ Ошибка при создании changefeed {table}/cache_invalidation: {e}")
+
 
 def main():
     print("🔧 Подключаемся к YDB...")
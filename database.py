@@ -8,10 +8,15 @@ import ydb
 import os
 import logging
 import json
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
 
+from core.dictionary_cache import get_dictionary_cache, invalidate_dictionary
+from core.dictionary_cache import WORD_SET_QUERY
+from core.row_decoding import rows_as_dicts, rows_as_tuples
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -46,6 +51,9 @@ def _typed_params(params: Dict[str, Any]) -> Dict[str, ydb.TypedValue]:
             # Счетчики: review_count, correct_streak, rating, position, total_highlights, total_words, limit
             else:
                 typed[key] = ydb.TypedValue(value, ydb.OptionalType(ydb.PrimitiveType.Uint32))
+        elif isinstance(value, datetime):
+            # Колонки *_ts: Timestamp (микросекунды UTC)
+            typed[key] = ydb.TypedValue(timestamp_us(value), ydb.OptionalType(ydb.PrimitiveType.Timestamp))
         elif value is None:
             # Для None используем Optional<Uint64>
             typed[key] = ydb.TypedValue(None, ydb.OptionalType(ydb.PrimitiveType.Uint64))
@@ -54,6 +62,243 @@ def _typed_params(params: Dict[str, Any]) -> Dict[str, ydb.TypedValue]:
     return typed
 
 
+def _struct_list(rows: List[Dict[str, Any]], columns: Dict[str, Any]) -> ydb.TypedValue:
+    """
+    Собирает параметр List<Struct<...>> для запросов вида UPSERT ... SELECT * FROM AS_TABLE($rows)
+
+    Все поля Optional (как и колонки таблиц), поэтому None допустим.
+
+    Args:
+        rows: Список словарей со значениями
+        columns: {'имя_колонки': ydb.PrimitiveType.Uint64, ...}
+
+    Returns:
+        TypedValue, который _typed_params() передаёт без изменений
+    """
+    struct_type = ydb.StructType()
+    for name, primitive in columns.items():
+        struct_type.add_member(name, ydb.OptionalType(primitive))
+
+    values = [{name: row.get(name) for name in columns} for row in rows]
+    return ydb.TypedValue(values, ydb.ListType(struct_type))
+
+
+def _id_list(ids: List[int]) -> ydb.TypedValue:
+    """
+    Собирает параметр List<Uint64> для условий вида WHERE id IN $ids
+
+    Args:
+        ids: Список ID
+
+    Returns:
+        TypedValue, который _typed_params() передаёт без изменений
+    """
+    return ydb.TypedValue([int(i) for i in ids], ydb.ListType(ydb.PrimitiveType.Uint64))
+
+
+def timestamp_us(moment: datetime) -> int:
+    """
+    datetime → микросекунды epoch для колонок Timestamp
+
+    Наивное время (datetime.now(), старые isoformat-строки) считается локальным
+    """
+    return round(moment.timestamp() * 1_000_000)
+
+
+# Счётчики статистики (таблица counters). scope — 'global/<shard>' (весь сервис),
+# 'user:<id>' или 'anonymous' (словарь без пользователя); name — 'analyses',
+# 'highlights', 'dictionary_words' (global), 'type:<type>', 'status:<status>' (словарь)
+#
+# Глобальные счётчики меняет каждое сохранение анализа, хайлайта и слова, и
+# одна строка на счётчик сериализовала бы эти транзакции (конфликты TLI).
+# Поэтому счётчик разбит на GLOBAL_COUNTER_SHARDS строк: запись меняет шард
+# по ID своей записи (global_scope), чтение суммирует все шарды — диапазон
+# ключа 'global/' … 'global0' (get_global_counters). Число шардов можно
+# менять без миграции.
+GLOBAL_SCOPE = 'global'
+GLOBAL_COUNTER_SHARDS = int(os.getenv('GLOBAL_COUNTER_SHARDS', '16'))
+_GLOBAL_SHARDS_FROM = GLOBAL_SCOPE + '/'
+_GLOBAL_SHARDS_TO = GLOBAL_SCOPE + '0'  # '0' — следующий символ после '/'
+
+
+def global_scope(key: int) -> str:
+    """scope шарда глобальных счётчиков для записи с ID key"""
+    return f'{_GLOBAL_SHARDS_FROM}{key % GLOBAL_COUNTER_SHARDS}'
+
+
+def counter_scope(user_id: Optional[int]) -> str:
+    """scope счётчиков словаря пользователя"""
+    return f'user:{user_id}' if user_id is not None else 'anonymous'
+
+
+def counter_rows(deltas: List[tuple]) -> ydb.TypedValue:
+    """
+    Собирает параметр $counter_rows из [(scope, name, delta), ...]
+
+    Запрос объявляет его через COUNTER_ROWS_DECLARE и применяет APPLY_COUNTER_DELTAS
+    """
+    return _struct_list(
+        [{'scope': scope, 'name': name, 'delta': delta} for scope, name, delta in deltas],
+        {'scope': ydb.PrimitiveType.Utf8, 'name': ydb.PrimitiveType.Utf8, 'delta': ydb.PrimitiveType.Int64}
+    )
+
+
+COUNTER_ROWS_DECLARE = """
+DECLARE $counter_rows AS List<Struct<scope: Utf8?, name: Utf8?, delta: Int64?>>;
+"""
+
+# Применить дельты из именованного выражения $deltas (scope, name, delta) в той же транзакции.
+# Ставится до записей в таблицы, которые читает $deltas (YDB не читает таблицу после её изменения)
+APPLY_COUNTER_DELTAS = """
+$counter_deltas = (
+    SELECT scope, name, SUM(delta) AS delta
+    FROM $deltas
+    WHERE scope IS NOT NULL AND name IS NOT NULL
+    GROUP BY scope, name
+);
+
+UPSERT INTO counters
+SELECT d.scope AS scope, d.name AS name, COALESCE(c.value, 0l) + d.delta AS value
+FROM $counter_deltas AS d
+LEFT JOIN counters AS c ON c.scope = d.scope AND c.name = d.name;
+"""
+
+
+# Анонимные и пустые анализы (без хайлайтов) удаляются TTL по analyses.expire_at.
+# Их хайлайты и постинги поиска подчищает core.maintenance (compact_orphan_highlights)
+EXPIRING_ANALYSIS_TTL = 'Interval("P30D")'
+
+
+# Поисковый индекс (таблица search_index). Постинги лежат по ключу
+# (scope, term, word_id, analysis_id), scope — как у счётчиков словаря.
+# term: 'w:<лемма>' (точное совпадение и префикс — диапазон по ключу)
+# или 't:<триграмма>' (поиск по подстроке). analysis_id = 0 — запись словаря,
+# иначе хайлайт слова в анализе.
+SEARCH_WORD_TERM = 'w:'
+SEARCH_TRIGRAM_TERM = 't:'
+# Сколько триграмм запроса оценивается при выборе самой редкой (равномерно по запросу)
+SEARCH_PROBED_TRIGRAMS = 8
+
+
+def search_key(text: str) -> str:
+    """Нормализованный текст для поиска: регистр, ё/е, лишние пробелы"""
+    return ' '.join((text or '').lower().replace('ё', 'е').split())
+
+
+def search_trigrams(key: str) -> List[str]:
+    """Триграммы нормализованного текста (без повторов, по порядку)"""
+    return list(dict.fromkeys(key[i:i + 3] for i in range(len(key) - 2)))
+
+
+def search_terms(text: str) -> List[str]:
+    """Все термы текста для search_index"""
+    key = search_key(text)
+    if not key:
+        return []
+    return [SEARCH_WORD_TERM + key] + [SEARCH_TRIGRAM_TERM + t for t in search_trigrams(key)]
+
+
+def search_rows(postings: List[tuple]) -> ydb.TypedValue:
+    """
+    Собирает параметр $search_rows из [(scope, word_id, analysis_id, text), ...]
+
+    Каждый текст раскладывается на термы search_terms(). Запрос объявляет
+    параметр через SEARCH_ROWS_DECLARE и пишет INDEX_SEARCH_ROWS
+    """
+    rows = []
+    for scope, word_id, analysis_id, text in postings:
+        key = search_key(text)
+        rows.extend({'scope': scope, 'term': term, 'word_id': word_id, 'analysis_id': analysis_id, 'text': key}
+                    for term in search_terms(key))
+    return _struct_list(rows, {
+        'scope': ydb.PrimitiveType.Utf8, 'term': ydb.PrimitiveType.Utf8, 'word_id': ydb.PrimitiveType.Uint64,
+        'analysis_id': ydb.PrimitiveType.Uint64, 'text': ydb.PrimitiveType.Utf8
+    })
+
+
+SEARCH_ROWS_DECLARE = """
+DECLARE $search_rows AS List<Struct<scope: Utf8?, term: Utf8?, word_id: Uint64?, analysis_id: Uint64?, text: Utf8?>>;
+"""
+
+INDEX_SEARCH_ROWS = """
+UPSERT INTO search_index
+SELECT * FROM AS_TABLE($search_rows);
+"""
+
+
+# Документ слова (dictionary_words.doc, JSON в Utf8): переводы, примеры и их
+# количество — всё, что нужно карточке слова, списку словаря и обратной связи
+# тренировки, читается вместе со строкой слова. Документ пишется в той же
+# транзакции, что и строки dictionary_translations / dictionary_examples
+# (DictionaryManager.add_word); эти таблицы остаются полной историей.
+WORD_DOC_TRANSLATIONS = 10  # первые переводы (первый — основной)
+WORD_DOC_EXAMPLES = 5  # первый пример (из него слово добавлено) + последние
+
+
+def merge_word_doc(doc: Optional[Dict], translations: List[Dict], examples: List[Dict]) -> Dict:
+    """
+    Добавить в документ слова новые переводы и примеры
+
+    Args:
+        doc: Текущий документ (None — пустой)
+        translations: [{'text', 'source_session_id', 'added_at'}, ...] в порядке добавления
+        examples: [{'original_form', 'context', 'session_id', 'added_at'}, ...] в порядке добавления
+
+    Returns:
+        {'translations': [...], 'translations_count', 'examples': [...], 'examples_count'}
+    """
+    doc = doc or {'translations': [], 'translations_count': 0, 'examples': [], 'examples_count': 0}
+    all_translations = doc['translations'] + translations
+    all_examples = doc['examples'] + examples
+    return {
+        'translations': all_translations[:WORD_DOC_TRANSLATIONS],
+        'translations_count': doc['translations_count'] + len(translations),
+        'examples': all_examples[:1] + all_examples[1:][-(WORD_DOC_EXAMPLES - 1):],
+        'examples_count': doc['examples_count'] + len(examples),
+    }
+
+
+def dump_word_doc(doc: Dict) -> str:
+    """Документ → значение колонки doc"""
+    return json.dumps(doc, ensure_ascii=False)
+
+
+def load_word_doc(value: Optional[str]) -> Optional[Dict]:
+    """Документ из колонки doc (None — слово записано до появления документов)"""
+    return json.loads(value) if value else None
+
+
+def word_doc_translations(doc: Dict) -> Optional[List[str]]:
+    """Все переводы слова по документу (None, если в документ вошли не все)"""
+    if doc['translations_count'] > len(doc['translations']):
+        return None
+    return [t['text'] for t in doc['translations']]
+
+
+def word_doc_example(doc: Dict) -> Optional[Dict]:
+    """Первый пример слова {'context', 'original_form'} (None — примеров нет)"""
+    if not doc['examples']:
+        return None
+    first = doc['examples'][0]
+    return {'context': first.get('context'), 'original_form': first.get('original_form')}
+
+
+# Режимы транзакций чтения: _execute_query(..., tx_mode=...). По умолчанию —
+# serializable (записи и чтения, от которых зависит запись). Страницы только
+# для чтения:
+#   TX_STALE_READ  — счётчики и публичная история: данные с задержкой до
+#                    нескольких секунд, читаются с реплик-фолловеров;
+#   TX_ONLINE_READ — словарь и карточки пользователя: последние закоммиченные
+#                    данные без блокировок serializable.
+# Несколько запросов одного метода читают один снимок — _in_snapshot()
+# (SnapshotReadOnly).
+TX_STALE_READ = ydb.QueryStaleReadOnly()
+TX_ONLINE_READ = ydb.QueryOnlineReadOnly()
+
+# Колонки кортежей get_typeahead_rows
+TYPEAHEAD_COLUMNS = ('word_id', 'lemma', 'translation')
+
+
 class WordoorioDatabase:
     """YDB-based database manager for Wordoorio application"""
 
@@ -71,6 +316,9 @@ class WordoorioDatabase:
         # For API compatibility
         self.db_path = db_path or "ydb"
 
+        # Открытая транзакция _in_snapshot() текущего потока
+        self._local = threading.local()
+
         # Initialize YDB driver
         self._init_driver()
 
@@ -111,13 +359,15 @@ class WordoorioDatabase:
         # QuerySessionPool is newer and handles typed parameters better
         self.pool = ydb.QuerySessionPool(self.driver)
 
-    def _execute_query(self, query: str, parameters: Dict = None):
+    def _execute_query(self, query: str, parameters: Dict = None, tx_mode=None):
         """
         Execute YQL query with automatic retries using QuerySessionPool
 
         Args:
             query: YQL query string
             parameters: Query parameters as dict
+            tx_mode: Режим транзакции только для чтения (TX_STALE_READ, TX_ONLINE_READ);
+                     None — serializable. Внутри _in_snapshot() не учитывается
 
         Returns:
             Query result
@@ -125,6 +375,16 @@ class WordoorioDatabase:
         # Конвертируем параметры в типизированный формат YDB
         typed_params = _typed_params(parameters) if parameters else {}
 
+        snapshot = getattr(self._local, 'tx', None)
+        if snapshot is not None:
+            return list(snapshot.execute(query, parameters=typed_params))
+
+        if tx_mode is not None:
+            return self.pool.retry_tx_sync(
+                lambda tx: list(tx.execute(query, parameters=typed_params, commit_tx=True)),
+                tx_mode=tx_mode
+            )
+
         # Use execute_with_retries instead of session.transaction().execute()
         # QuerySessionPool handles typed parameters correctly
         return self.pool.execute_with_retries(
@@ -132,9 +392,29 @@ class WordoorioDatabase:
             parameters=typed_params
         )
 
-    def _fetch_one(self, query: str, parameters: Dict = None) -> Optional[Dict]:
+    def _in_snapshot(self, callee):
+        """
+        Выполнить чтения callee() в одной транзакции SnapshotReadOnly
+
+        Все запросы callee через _execute_query видят один согласованный снимок;
+        при повторе транзакции callee вызывается заново (только чтения!).
+        Вложенный вызов использует уже открытую транзакцию.
+        """
+        if getattr(self._local, 'tx', None) is not None:
+            return callee()
+
+        def run(tx):
+            self._local.tx = tx
+            try:
+                return callee()
+            finally:
+                self._local.tx = None
+
+        return self.pool.retry_tx_sync(run, tx_mode=ydb.QuerySnapshotReadOnly())
+
+    def _fetch_one(self, query: str, parameters: Dict = None, tx_mode=None) -> Optional[Dict]:
         """Execute query and return first row as dict"""
-        result = self._execute_query(query, parameters)
+        result = self._execute_query(query, parameters, tx_mode)
 
         if not result or not result[0].rows:
             return None
@@ -149,15 +429,19 @@ class WordoorioDatabase:
 
         return row_dict
 
-    def _fetch_all(self, query: str, parameters: Dict = None) -> List[Dict]:
-        """Execute query and return all rows as list of dicts"""
-        result = self._execute_query(query, parameters)
+    def _fetch_all(self, query: str, parameters: Dict = None, tx_mode=None, decode=rows_as_dicts) -> List:
+        """
+        Execute query and return all rows of the first result set
 
-        if not result or not result[0].rows:
+        Args:
+            decode: Декодер результата (core/row_decoding.py); по умолчанию — список dict
+        """
+        result = self._execute_query(query, parameters, tx_mode)
+
+        if not result:
             return []
 
-        # YDB rows are already dict-like objects
-        return [dict(row) for row in result[0].rows]
+        return decode(result[0])
 
     def _get_next_id(self, table_name: str) -> int:
         """
@@ -212,12 +496,16 @@ class WordoorioDatabase:
         DECLARE $total_words AS Uint32?;
         DECLARE $session_id AS Utf8?;
         DECLARE $ip_address AS Utf8?;
-
-        UPSERT INTO analyses (id, user_id, original_text, analysis_date, total_highlights, total_words, session_id, ip_address)
-        VALUES ($id, $user_id, $original_text, CurrentUtcTimestamp(), $total_highlights, $total_words, $session_id, $ip_address)
+        """ + COUNTER_ROWS_DECLARE + """
+        $deltas = (SELECT * FROM AS_TABLE($counter_rows));
+        """ + APPLY_COUNTER_DELTAS + """
+        UPSERT INTO analyses (id, user_id, original_text, analysis_date, total_highlights, total_words, session_id, ip_address, expire_at)
+        VALUES ($id, $user_id, $original_text, CurrentUtcTimestamp(), $total_highlights, $total_words, $session_id, $ip_address,
+                IF($user_id IS NULL OR $total_highlights = 0u, CurrentUtcTimestamp() + """ + EXPIRING_ANALYSIS_TTL + """, NULL))
         """
 
         self._execute_query(query, {
+            '$counter_rows': counter_rows([(global_scope(analysis_id), 'analyses', 1)]),
             '$id': analysis_id,
             '$user_id': user_id,
             '$original_text': original_text,
@@ -244,14 +532,19 @@ class WordoorioDatabase:
 
         Returns:
             List of analyses with their highlights
+
+        Все запросы читают один снимок (SnapshotReadOnly)
         """
+        return self._in_snapshot(lambda: self._get_user_highlights(user_id, limit))
+
+    def _get_user_highlights(self, user_id: int, limit: int) -> List[Dict]:
         # Get user's analyses
         analyses_query = """
         DECLARE $user_id AS Uint64?;
         DECLARE $limit AS Uint32?;
 
         SELECT id, original_text, analysis_date, total_highlights, total_words, session_id
-        FROM analyses
+        FROM analyses VIEW idx_user_date
         WHERE user_id = $user_id
         ORDER BY analysis_date DESC
         LIMIT $limit
@@ -270,84 +563,63 @@ class WordoorioDatabase:
         for analysis in analyses:
             analysis_id = analysis['id']
 
-            # НОВЫЙ ЗАПРОС: JOIN с dictionary_words для получения полных данных слова
+            # JOIN с dictionary_words: переводы и пример — из документа слова
             # ВАЖНО: Явно задаем алиасы с AS для всех полей, чтобы YDB возвращал их без префиксов
             highlights_query = """
             DECLARE $analysis_id AS Uint64?;
+            DECLARE $user_id AS Uint64?;
+
+            $highlights = (
+                SELECT word_id, position, $user_id AS user_id
+                FROM highlights VIEW idx_analysis_position
+                WHERE analysis_id = $analysis_id
+            );
 
             SELECT
                 h.word_id AS word_id,
                 h.position AS position,
                 w.lemma AS highlight,
                 w.type AS type,
-                t.translation AS highlight_translation
-            FROM highlights AS h
-            INNER JOIN dictionary_words AS w ON h.word_id = w.id
-            LEFT JOIN dictionary_translations AS t ON w.id = t.word_id
-            WHERE h.analysis_id = $analysis_id
-            ORDER BY h.position
+                w.doc AS doc
+            FROM $highlights AS h
+            INNER JOIN dictionary_words AS w ON w.user_id = h.user_id AND w.id = h.word_id
+            ORDER BY position
             """
 
-            raw_highlights = self._fetch_all(highlights_query, {
-                '$analysis_id': analysis_id
+            rows = self._fetch_all(highlights_query, {
+                '$analysis_id': analysis_id,
+                '$user_id': user_id
             })
 
-            # Группируем переводы и примеры по word_id
-            highlights_map = {}
-            for row in raw_highlights:
-                # DEBUG: проверяем какие ключи возвращает YDB
-                if not highlights_map:  # Логируем только первую запись
-                    logger.debug(f"[YDB] Row keys: {list(row.keys())}")
-                    logger.debug(f"[YDB] Row values: {row}")
-
-                word_id = row.get('word_id')
-                if not word_id:
-                    logger.warning(f"[YDB] word_id not found in row: {row}")
-                    continue
-
-                if word_id not in highlights_map:
-                    highlights_map[word_id] = {
-                        'highlight': row['highlight'],
-                        'type': row['type'],
-                        'highlight_translation': row['highlight_translation'],
-                        'main_translation': row['highlight_translation'],  # Сохраняем основной перевод
-                        'translations': [],  # Дополнительные переводы (без основного)
-                        'position': row['position']
-                    }
-                else:
-                    # Добавляем дополнительные переводы (исключая основной)
-                    translation = row['highlight_translation']
-                    main_translation = highlights_map[word_id]['main_translation']
-
-                    if translation and translation != main_translation and translation not in highlights_map[word_id]['translations']:
-                        highlights_map[word_id]['translations'].append(translation)
-
-            # Получаем примеры для каждого слова
-            for word_id in highlights_map.keys():
-                examples_query = """
-                DECLARE $word_id AS Uint64?;
-
-                SELECT context
-                FROM dictionary_examples
-                WHERE word_id = $word_id
-                LIMIT 1
-                """
+            # Слова без документа (записаны до его появления) — из таблиц переводов и примеров
+            docs = {row['word_id']: load_word_doc(row['doc']) for row in rows}
+            hydrated = self.hydrate_words([word_id for word_id, doc in docs.items() if doc is None],
+                                          ['translations', 'example'])
 
-                examples = self._fetch_all(examples_query, {'$word_id': word_id})
-                if examples and len(examples) > 0:
-                    highlights_map[word_id]['context'] = examples[0]['context']
+            highlights = []
+            seen = set()
+            for row in sorted(rows, key=lambda r: r['position']):
+                # Слово, выделенное в тексте несколько раз, показывается один раз
+                if row['word_id'] in seen:
+                    continue
+                seen.add(row['word_id'])
+                doc = docs[row['word_id']]
+                if doc is not None:
+                    translations = [t['text'] for t in doc['translations']]
+                    example = word_doc_example(doc)
                 else:
-                    highlights_map[word_id]['context'] = ''
-
-            # Сортируем highlights по position
-            highlights = sorted(highlights_map.values(), key=lambda x: x['position'])
-
-            # Удаляем служебные поля перед отправкой
-            for h in highlights:
-                h.pop('position', None)
-                h.pop('main_translation', None)  # Удаляем служебное поле
-                # Переименовываем translations → dictionary_meanings для обратной совместимости
-                h['dictionary_meanings'] = h.pop('translations', [])
+                    translations = hydrated[row['word_id']]['translations']
+                    example = hydrated[row['word_id']]['example']
+
+                main_translation = translations[0] if translations else None
+                highlights.append({
+                    'highlight': row['highlight'],
+                    'type': row['type'],
+                    'highlight_translation': main_translation,
+                    'context': example['context'] if example else '',
+                    # Дополнительные переводы (без основного), имя — для обратной совместимости
+                    'dictionary_meanings': [t for t in dict.fromkeys(translations) if t != main_translation]
+                })
 
             result.append({
                 'analysis_id': analysis_id,
@@ -378,7 +650,7 @@ class WordoorioDatabase:
         DECLARE $user_id AS Uint64?;
 
         SELECT id, original_text, analysis_date, total_highlights, total_words, session_id
-        FROM analyses
+        FROM analyses VIEW idx_session_user
         WHERE session_id = $session_id AND user_id = $user_id
         ORDER BY analysis_date DESC
         LIMIT 1
@@ -391,7 +663,8 @@ class WordoorioDatabase:
 
         return result
 
-    def add_highlight_to_analysis(self, analysis_id: int, word_id: int, user_id: Optional[int], session_id: str) -> int:
+    def add_highlight_to_analysis(self, analysis_id: int, word_id: int, user_id: Optional[int], session_id: str,
+                                  lemma: Optional[str] = None) -> int:
         """
         Add a single highlight to an existing analysis
 
@@ -400,6 +673,7 @@ class WordoorioDatabase:
             word_id: ID of word in dictionary_words (already created)
             user_id: User ID (for verification)
             session_id: Session ID (for logging)
+            lemma: Lemma of the word (for search_index; read from dictionary_words if not given)
 
         Returns:
             highlight_id: ID of created highlight record
@@ -411,8 +685,10 @@ class WordoorioDatabase:
         get_max_position_query = """
         DECLARE $analysis_id AS Uint64?;
 
-        SELECT MAX(position) AS max_position FROM highlights
+        SELECT position AS max_position FROM highlights VIEW idx_analysis_position
         WHERE analysis_id = $analysis_id
+        ORDER BY position DESC
+        LIMIT 1
         """
 
         result = self._fetch_one(get_max_position_query, {'$analysis_id': analysis_id})
@@ -421,17 +697,26 @@ class WordoorioDatabase:
         # Создать highlight со ссылкой на word_id
         highlight_id = self._get_next_id('highlights')
 
+        if lemma is None:
+            word = self.get_word_by_id(word_id)
+            lemma = word.get('lemma') if word else None
+
+        # Хайлайт, счётчик и постинги поиска — одной транзакцией
         highlight_query = """
         DECLARE $id AS Uint64?;
         DECLARE $analysis_id AS Uint64?;
         DECLARE $word_id AS Uint64?;
         DECLARE $position AS Uint32?;
-
+        """ + COUNTER_ROWS_DECLARE + SEARCH_ROWS_DECLARE + """
+        $deltas = (SELECT * FROM AS_TABLE($counter_rows));
+        """ + APPLY_COUNTER_DELTAS + INDEX_SEARCH_ROWS + """
         UPSERT INTO highlights (id, analysis_id, word_id, position)
         VALUES ($id, $analysis_id, $word_id, $position)
         """
 
         self._execute_query(highlight_query, {
+            '$counter_rows': counter_rows([(global_scope(highlight_id), 'highlights', 1)]),
+            '$search_rows': search_rows([(counter_scope(user_id), word_id, analysis_id, lemma)]),
             '$id': highlight_id,
             '$analysis_id': analysis_id,
             '$word_id': word_id,
@@ -439,11 +724,13 @@ class WordoorioDatabase:
         })
 
         # Update total_highlights counter in analyses table
+        # (анализ пользователя с хайлайтом больше не удаляется по TTL)
         update_query = """
         DECLARE $analysis_id AS Uint64?;
 
         UPDATE analyses
-        SET total_highlights = total_highlights + 1
+        SET total_highlights = total_highlights + 1,
+            expire_at = IF(user_id IS NULL, expire_at, NULL)
         WHERE id = $analysis_id
         """
 
@@ -483,46 +770,64 @@ class WordoorioDatabase:
             logger.warning(f"[YDB] Анализ {analysis_id} не найден или не принадлежит пользователю {user_id}")
             return False
 
-        # Удаляем связанные хайлайты
-        delete_highlights_query = """
+        # Удаляем хайлайты и сам анализ, счётчики уменьшаются в той же транзакции.
+        # Постинги анализа ищутся в пределах scope пользователя (удаление редкое)
+        delete_query = """
         DECLARE $analysis_id AS Uint64?;
-
-        DELETE FROM highlights
-        WHERE analysis_id = $analysis_id
-        """
-
-        self._execute_query(delete_highlights_query, {
-            '$analysis_id': analysis_id
-        })
-
-        # Удаляем сам анализ
-        delete_analysis_query = """
-        DECLARE $id AS Uint64?;
+        DECLARE $scope AS Utf8?;
+        DECLARE $global_scope AS Utf8?;
+
+        $deltas = (
+            SELECT $global_scope AS scope, 'highlights'u AS name, -CAST(COUNT(*) AS Int64) AS delta
+            FROM highlights VIEW idx_analysis_position
+            WHERE analysis_id = $analysis_id
+            UNION ALL
+            SELECT $global_scope AS scope, 'analyses'u AS name, -1l AS delta
+        );
+        """ + APPLY_COUNTER_DELTAS + """
+        DELETE FROM search_index ON
+        SELECT scope, term, word_id, analysis_id FROM search_index
+        WHERE scope = $scope AND analysis_id = $analysis_id;
+
+        DELETE FROM highlights ON
+        SELECT id FROM highlights VIEW idx_analysis_position
+        WHERE analysis_id = $analysis_id;
 
         DELETE FROM analyses
-        WHERE id = $id
+        WHERE id = $analysis_id;
         """
 
-        self._execute_query(delete_analysis_query, {
-            '$id': analysis_id
+        self._execute_query(delete_query, {
+            '$analysis_id': analysis_id,
+            '$scope': counter_scope(user_id),
+            '$global_scope': global_scope(analysis_id)
         })
 
         logger.info(f"[YDB] Удален анализ {analysis_id} пользователя {user_id}")
         return True
 
-    def get_recent_analyses(self, limit: int = 10) -> List[Dict]:
-        """Get recent text analyses"""
+    def get_recent_analyses(self, limit: int = 10, decode=rows_as_dicts) -> List:
+        """
+        Get recent text analyses (stale read: public history may lag by seconds)
+
+        Args:
+            limit: Количество анализов
+            decode: Декодер результата (rows_as_json — строка JSON для ответа API)
+        """
         query = f"""
         SELECT *
-        FROM analyses
+        FROM analyses VIEW idx_analysis_date
         ORDER BY analysis_date DESC
         LIMIT {limit}
         """
 
-        return self._fetch_all(query)
+        return self._fetch_all(query, tx_mode=TX_STALE_READ, decode=decode)
 
     def get_analysis_by_id(self, analysis_id: int) -> Optional[Dict]:
-        """Get analysis by ID with all highlights"""
+        """Get analysis by ID with all highlights (one snapshot)"""
+        return self._in_snapshot(lambda: self._get_analysis_by_id(analysis_id))
+
+    def _get_analysis_by_id(self, analysis_id: int) -> Optional[Dict]:
         # Get analysis
         analysis_query = """
         DECLARE $id AS Uint64?;
@@ -542,7 +847,7 @@ class WordoorioDatabase:
         DECLARE $analysis_id AS Uint64?;
 
         SELECT *
-        FROM highlights
+        FROM highlights VIEW idx_analysis_position
         WHERE analysis_id = $analysis_id
         ORDER BY id
         """
@@ -552,44 +857,254 @@ class WordoorioDatabase:
         analysis['highlights'] = highlights
         return analysis
 
-    def search_by_word(self, word: str, limit: int = 20) -> List[Dict]:
-        """Search analyses by word in highlights"""
-        query = f"""
-        DECLARE $word AS Utf8?;
+    def search_postings(self, scope: str, key: str, trigrams: List[str], limit: int) -> List[Dict]:
+        """
+        Candidate postings from search_index (bounded range reads by the PK)
 
-        SELECT DISTINCT a.*
-        FROM analyses AS a
-        JOIN highlights AS h ON a.id = h.analysis_id
-        WHERE h.highlight_word LIKE '%' || $word || '%'
-        ORDER BY a.analysis_date DESC
-        LIMIT {limit}
+        Подстрока ищется от самой редкой триграммы: по каждой оцениваемой
+        триграмме считается не больше limit постингов, затем читаются первые
+        limit постингов самой редкой. Каждое чтение ограничено limit строк;
+        если и у самой редкой триграммы постингов больше limit, часть
+        совпадений по подстроке не попадёт в выдачу.
+
+        Args:
+            scope: counter_scope(user_id)
+            key: search_key() of the query
+            trigrams: Trigrams of the key for the infix lookup (empty — only exact/prefix)
+            limit: Max rows of each range read
+
+        Returns:
+            [{'word_id', 'analysis_id', 'text'}, ...] — exact/prefix hits and
+            postings of the rarest trigram (substring is checked by the caller)
+        """
+        # Верхняя граница диапазона префикса: следующий за ключом символ
+        prefix_from = SEARCH_WORD_TERM + key
+        prefix_to = SEARCH_WORD_TERM + key[:-1] + chr(ord(key[-1]) + 1)
+
+        params = {
+            '$scope': scope,
+            '$prefix_from': prefix_from,
+            '$prefix_to': prefix_to,
+        }
+        query = """
+        DECLARE $scope AS Utf8?;
+        DECLARE $prefix_from AS Utf8?;
+        DECLARE $prefix_to AS Utf8?;
+"""
+
+        if trigrams:
+            step = max(1, len(trigrams) // SEARCH_PROBED_TRIGRAMS)
+            probed = trigrams[::step][:SEARCH_PROBED_TRIGRAMS]
+            counts = []
+            for i, trigram in enumerate(probed):
+                params[f'$t{i}'] = SEARCH_TRIGRAM_TERM + trigram
+                query += f"        DECLARE $t{i} AS Utf8?;\n"
+                # Агрегат без GROUP BY даёт строку и для триграммы без постингов (hits = 0)
+                counts.append(f"""
+            SELECT $t{i} AS term, COUNT(*) AS hits FROM (
+                SELECT word_id FROM search_index WHERE scope = $scope AND term = $t{i} LIMIT {limit}
+            )""")
+
+            query += f"""
+        $counts = ({' UNION ALL '.join(counts)}
+        );
+
+        $rarest = (SELECT term FROM $counts ORDER BY hits, term LIMIT 1);
+        """
+
+        query += f"""
+        SELECT word_id, analysis_id, text
+        FROM search_index
+        WHERE scope = $scope AND term >= $prefix_from AND term < $prefix_to
+        ORDER BY term, word_id, analysis_id
+        LIMIT {limit};
+        """
+
+        if trigrams:
+            query += f"""
+        SELECT word_id, analysis_id, text
+        FROM search_index
+        WHERE scope = $scope AND term = $rarest
+        ORDER BY word_id, analysis_id
+        LIMIT {limit};
+        """
+
+        result_sets = self._execute_query(query, params, tx_mode=TX_ONLINE_READ)
+
+        return [dict(row) for result_set in result_sets for row in result_set.rows]
+
+    def get_analyses_by_ids(self, analysis_ids: List[int]) -> Dict[int, Dict]:
+        """Get analyses (without highlights) by IDs: {analysis_id: row}"""
+        if not analysis_ids:
+            return {}
+
+        query = """
+        DECLARE $ids AS List<Uint64>;
+
+        SELECT id, user_id, original_text, analysis_date, total_highlights
+        FROM analyses
+        WHERE id IN $ids
+        """
+
+        return {row['id']: row for row in self._fetch_all(query, {'$ids': _id_list(analysis_ids)})}
+
+    def compact_orphan_highlights(self, last_id: int, limit: int) -> Dict:
+        """
+        Delete highlights whose analysis no longer exists (one page by highlight ID)
+
+        Анализы удаляются TTL (expire_at) без транзакции приложения, поэтому их
+        хайлайты и постинги search_index удаляются здесь, а счётчик highlights
+        уменьшается в той же транзакции. Scope постингов — по владельцу слова.
+
+        Args:
+            last_id: Курсор — последний просмотренный ID хайлайта
+            limit: Размер страницы
+
+        Returns:
+            {'last_id': последний ID страницы (None — таблица пройдена), 'removed': удалено хайлайтов}
+        """
+        query = """
+        DECLARE $last_id AS Uint64?;
+        DECLARE $limit AS Uint32?;
+        DECLARE $global_scope AS Utf8?;
+
+        $page = (
+            SELECT id, analysis_id, word_id
+            FROM highlights
+            WHERE id > $last_id
+            ORDER BY id
+            LIMIT $limit
+        );
+
+        $orphans = (
+            SELECT p.id AS id, p.analysis_id AS analysis_id, p.word_id AS word_id
+            FROM $page AS p
+            LEFT ONLY JOIN analyses AS a ON a.id = p.analysis_id
+        );
+
+        $orphan_scopes = (
+            SELECT DISTINCT
+                IF(w.user_id IS NULL, 'anonymous'u, 'user:'u || CAST(w.user_id AS Utf8)) AS scope,
+                o.analysis_id AS analysis_id
+            FROM $orphans AS o
+            INNER JOIN dictionary_words VIEW idx_id AS w ON w.id = o.word_id
+        );
+
+        SELECT MAX(id) AS last_id FROM $page;
+        SELECT COUNT(*) AS removed FROM $orphans;
+
+        $deltas = (
+            SELECT $global_scope AS scope, 'highlights'u AS name, -CAST(COUNT(*) AS Int64) AS delta
+            FROM $orphans
+        );
+        """ + APPLY_COUNTER_DELTAS + """
+        DELETE FROM search_index ON
+        SELECT s.scope AS scope, s.term AS term, s.word_id AS word_id, s.analysis_id AS analysis_id
+        FROM $orphan_scopes AS o
+        INNER JOIN search_index AS s ON s.scope = o.scope AND s.analysis_id = o.analysis_id;
+
+        DELETE FROM highlights ON
+        SELECT id FROM $orphans;
+        """
+
+        result_sets = self._execute_query(query, {
+            '$last_id': last_id,
+            '$limit': limit,
+            '$global_scope': global_scope(last_id or 0)
+        })
+        return {
+            'last_id': result_sets[0].rows[0]['last_id'],
+            'removed': result_sets[1].rows[0]['removed'],
+        }
+
+    def recount_analyses(self) -> int:
+        """
+        Recalculate the global analyses counter (TTL deletions bypass the write transactions)
+
+        Количество пишется в первый шард, остальные шарды обнуляются.
+
+        Returns:
+            Текущее количество анализов
         """
+        query = """
+        DECLARE $first AS Utf8?;
+        DECLARE $to AS Utf8?;
+
+        $count = (SELECT CAST(COUNT(*) AS Int64) AS value FROM analyses);
+
+        SELECT value FROM $count;
+
+        UPSERT INTO counters
+        SELECT scope, name, 0l AS value FROM counters
+        WHERE scope > $first AND scope < $to AND name = 'analyses'u;
 
-        return self._fetch_all(query, {'$word': word})
+        UPSERT INTO counters
+        SELECT $first AS scope, 'analyses'u AS name, value FROM $count;
+        """
+
+        result_sets = self._execute_query(query, {
+            '$first': global_scope(0),
+            '$to': _GLOBAL_SHARDS_TO,
+        })
+        return result_sets[0].rows[0]['value']
 
     def get_stats(self) -> Dict:
-        """Get database statistics"""
-        # Count analyses
-        analyses_query = "SELECT COUNT(*) AS count FROM analyses"
-        analyses_result = self._fetch_one(analyses_query)
-        total_analyses = analyses_result['count'] if analyses_result else 0
-
-        # Count highlights
-        highlights_query = "SELECT COUNT(*) AS count FROM highlights"
-        highlights_result = self._fetch_one(highlights_query)
-        total_highlights = highlights_result['count'] if highlights_result else 0
-
-        # Count dictionary words
-        words_query = "SELECT COUNT(*) AS count FROM dictionary_words"
-        words_result = self._fetch_one(words_query)
-        total_words = words_result['count'] if words_result else 0
+        """Get database statistics (one read of the global counters)"""
+        counters = self.get_global_counters()
 
         return {
-            'total_analyses': total_analyses,
-            'total_highlights': total_highlights,
-            'total_dictionary_words': total_words
+            'total_analyses': counters.get('analyses', 0),
+            'total_highlights': counters.get('highlights', 0),
+            'total_dictionary_words': counters.get('dictionary_words', 0)
         }
 
+    def get_counters(self, scope: str) -> Dict[str, int]:
+        """
+        Get all counters of a scope (one range read by the PK prefix)
+
+        Stale read: счётчики показываются на страницах статистики, задержка
+        в несколько секунд допустима
+
+        Args:
+            scope: counter_scope(user_id)
+
+        Returns:
+            {name: value}
+        """
+        query = """
+        DECLARE $scope AS Utf8?;
+
+        SELECT name, value
+        FROM counters
+        WHERE scope = $scope
+        """
+
+        return {row['name']: row['value'] or 0
+                for row in self._fetch_all(query, {'$scope': scope}, tx_mode=TX_STALE_READ)}
+
+    def get_global_counters(self) -> Dict[str, int]:
+        """
+        Get global counters: sums over all shards (one range read by the PK)
+
+        Returns:
+            {name: value}
+        """
+        query = """
+        DECLARE $from AS Utf8?;
+        DECLARE $to AS Utf8?;
+
+        SELECT name, SUM(value) AS value
+        FROM counters
+        WHERE scope >= $from AND scope < $to
+        GROUP BY name
+        """
+
+        return {row['name']: row['value'] or 0
+                for row in self._fetch_all(query, {
+                    '$from': _GLOBAL_SHARDS_FROM,
+                    '$to': _GLOBAL_SHARDS_TO,
+                }, tx_mode=TX_STALE_READ)}
+
     # ====================
     # Training Methods
     # ====================
@@ -637,57 +1152,85 @@ class WordoorioDatabase:
     # Test Methods
     # ====================
 
-    def insert_test(self, user_id: int, word_id: int, word: str,
-                   correct_translation: str, wrong_option_1: str,
-                   wrong_option_2: str, wrong_option_3: str,
-                   test_mode: int = 1) -> int:
-        """Insert new test
+    def insert_tests_bulk(self, rows: List[Dict]) -> List[Dict]:
+        """
+        Insert many tests in one statement
+
+        Диапазон ID резервируется в той же транзакции, что и запись
+        (последний ID по индексу idx_id + номер строки), поэтому параллельные тренировки
+        не получат одинаковые ID: конфликт транзакций повторяется execute_with_retries.
 
         Args:
-            test_mode: 1 = EN→RU (показываем англ, выбираем рус)
-                       2 = RU→EN (показываем рус, выбираем англ)
+            rows: [{'user_id', 'word_id', 'word', 'correct_translation',
+                    'wrong_option_1', 'wrong_option_2', 'wrong_option_3', 'test_mode'}, ...]
+
+        Returns:
+            Записанные тесты в порядке rows — строки как у get_test() (с id и created_at)
         """
-        test_id = self._get_next_id('tests')
+        if not rows:
+            return []
 
-        query = """
-        DECLARE $id AS Uint64?;
-        DECLARE $user_id AS Uint64?;
-        DECLARE $word_id AS Uint64?;
-        DECLARE $word AS Utf8?;
-        DECLARE $correct_translation AS Utf8?;
-        DECLARE $wrong_option_1 AS Utf8?;
-        DECLARE $wrong_option_2 AS Utf8?;
-        DECLARE $wrong_option_3 AS Utf8?;
-        DECLARE $test_mode AS Uint32?;
-        DECLARE $created_at AS Utf8?;
+        now = datetime.now()
+        numbered = [dict(row, idx=i, created_at=now.isoformat(), created_ts=timestamp_us(now))
+                    for i, row in enumerate(rows, start=1)]
 
-        UPSERT INTO tests (id, user_id, word_id, word, correct_translation, wrong_option_1, wrong_option_2, wrong_option_3, test_mode, created_at)
-        VALUES ($id, $user_id, $word_id, $word, $correct_translation, $wrong_option_1, $wrong_option_2, $wrong_option_3, $test_mode, $created_at)
+        query = """
+        DECLARE $rows AS List<Struct<
+            idx: Uint64?,
+            user_id: Uint64?,
+            word_id: Uint64?,
+            word: Utf8?,
+            correct_translation: Utf8?,
+            wrong_option_1: Utf8?,
+            wrong_option_2: Utf8?,
+            wrong_option_3: Utf8?,
+            test_mode: Uint32?,
+            created_at: Utf8?,
+            created_ts: Timestamp?
+        >>;
+
+        $last_id = COALESCE((SELECT id FROM tests VIEW idx_id ORDER BY id DESC LIMIT 1), 0ul);
+
+        SELECT $last_id AS last_id;
+
+        UPSERT INTO tests
+        SELECT
+            $last_id + idx AS id,
+            user_id, word_id, word, correct_translation,
+            wrong_option_1, wrong_option_2, wrong_option_3,
+            test_mode, created_at, created_ts
+        FROM AS_TABLE($rows);
         """
 
-        self._execute_query(query, {
-            '$id': test_id,
-            '$user_id': user_id,
-            '$word_id': word_id,
-            '$word': word,
-            '$correct_translation': correct_translation,
-            '$wrong_option_1': wrong_option_1,
-            '$wrong_option_2': wrong_option_2,
-            '$wrong_option_3': wrong_option_3,
-            '$test_mode': test_mode,
-            '$created_at': datetime.now().isoformat()
+        result = self._fetch_one(query, {
+            '$rows': _struct_list(numbered, {
+                'idx': ydb.PrimitiveType.Uint64,
+                'user_id': ydb.PrimitiveType.Uint64,
+                'word_id': ydb.PrimitiveType.Uint64,
+                'word': ydb.PrimitiveType.Utf8,
+                'correct_translation': ydb.PrimitiveType.Utf8,
+                'wrong_option_1': ydb.PrimitiveType.Utf8,
+                'wrong_option_2': ydb.PrimitiveType.Utf8,
+                'wrong_option_3': ydb.PrimitiveType.Utf8,
+                'test_mode': ydb.PrimitiveType.Uint32,
+                'created_at': ydb.PrimitiveType.Utf8,
+                'created_ts': ydb.PrimitiveType.Timestamp,
+            })
         })
 
-        return test_id
+        last_id = result['last_id'] if result else 0
+        return [dict(row, id=last_id + row.pop('idx')) for row in numbered]
 
     def get_test(self, test_id: int) -> Optional[Dict]:
-        """Get test by ID"""
+        """Get test by ID (ключ (user_id, id) находится по индексу idx_id)"""
         query = """
         DECLARE $id AS Uint64?;
 
-        SELECT *
-        FROM tests
-        WHERE id = $id
+        $key = (SELECT user_id, id FROM tests VIEW idx_id WHERE id = $id);
+
+        SELECT t.*
+        FROM $key AS k
+        INNER JOIN tests AS t ON t.user_id = k.user_id AND t.id = k.id
         """
 
         return self._fetch_one(query, {'$id': test_id})
@@ -697,8 +1240,8 @@ class WordoorioDatabase:
         query = """
         DECLARE $id AS Uint64?;
 
-        DELETE FROM tests
-        WHERE id = $id
+        DELETE FROM tests ON
+        SELECT user_id, id FROM tests VIEW idx_id WHERE id = $id
         """
 
         self._execute_query(query, {'$id': test_id})
@@ -717,7 +1260,7 @@ class WordoorioDatabase:
     def get_pending_tests(self, user_id: int) -> List[Dict]:
         """Get all pending tests for user
 
-        Returns tests sorted by test_mode (1 first, then 2), then by created_at
+        Returns tests sorted by test_mode (1 first, then 2), then by created_ts
         """
         query = """
         DECLARE $user_id AS Uint64?;
@@ -725,335 +1268,1053 @@ class WordoorioDatabase:
         SELECT *
         FROM tests
         WHERE user_id = $user_id
-        ORDER BY test_mode ASC, created_at ASC
+        ORDER BY test_mode ASC, created_ts ASC
         """
 
         return self._fetch_all(query, {'$user_id': user_id})
 
-    # ====================
-    # Word Methods
-    # ====================
+    def count_existing_tests(self, user_id: int, test_ids: List[int]) -> int:
+        """
+        Count tests of a user that still exist (answered tests are deleted when the answer is applied)
 
-    def update_word_rating(self, word_id: int, rating: int, last_rating_change: str = None):
-        """Update word rating"""
-        if last_rating_change is None:
-            last_rating_change = datetime.now().isoformat()
+        Args:
+            user_id: User ID
+            test_ids: ID тестов
+        """
+        if not test_ids:
+            return 0
 
         query = """
-        DECLARE $id AS Uint64?;
-        DECLARE $rating AS Uint32?;
-        DECLARE $last_rating_change AS Utf8?;
+        DECLARE $user_id AS Uint64?;
+        DECLARE $test_ids AS List<Uint64>;
 
-        UPDATE dictionary_words
-        SET rating = $rating, last_rating_change = $last_rating_change
-        WHERE id = $id
+        SELECT COUNT(*) AS tests
+        FROM tests
+        WHERE user_id = $user_id AND id IN $test_ids
         """
 
-        self._execute_query(query, {
-            '$id': word_id,
-            '$rating': rating,
-            '$last_rating_change': last_rating_change
-        })
+        result = self._fetch_one(query, {'$user_id': user_id, '$test_ids': _id_list(test_ids)})
+        return result['tests'] if result else 0
+
+    # ====================
+    # Training Session Methods
+    # ====================
 
-    def update_word_status(self, word_id: int, status: str):
-        """Update word status"""
+    def save_training_session(self, token: str, user_id: int, payload: str):
+        """Store materialized tests of an active Telegram training (JSON payload)"""
         query = """
-        DECLARE $id AS Uint64?;
-        DECLARE $status AS Utf8?;
+        DECLARE $token AS Utf8?;
+        DECLARE $user_id AS Uint64?;
+        DECLARE $payload AS Utf8?;
 
-        UPDATE dictionary_words
-        SET status = $status
-        WHERE id = $id
+        UPSERT INTO training_sessions (token, user_id, payload, created_at)
+        VALUES ($token, $user_id, $payload, CurrentUtcTimestamp())
         """
 
         self._execute_query(query, {
-            '$id': word_id,
-            '$status': status
+            '$token': token,
+            '$user_id': user_id,
+            '$payload': payload
         })
 
-    def update_word_statistics(self, user_id: int, word_id: int, is_correct: bool):
-        """Update word test statistics"""
-        # Get existing statistics
+    def get_training_session(self, token: str) -> Optional[Dict]:
+        """Get training session by token"""
         query = """
-        DECLARE $user_id AS Uint64?;
-        DECLARE $word_id AS Uint64?;
+        DECLARE $token AS Utf8?;
 
-        SELECT *
-        FROM word_test_statistics
-        WHERE user_id = $user_id AND word_id = $word_id
+        SELECT user_id, payload
+        FROM training_sessions
+        WHERE token = $token
         """
 
-        stats = self._fetch_one(query, {
-            '$user_id': user_id,
-            '$word_id': word_id
-        })
+        return self._fetch_one(query, {'$token': token})
 
-        if stats:
-            # Update existing
-            update_query = """
-            DECLARE $id AS Uint64?;
-            DECLARE $total_tests AS Uint32?;
-            DECLARE $correct_answers AS Uint32?;
-            DECLARE $wrong_answers AS Uint32?;
-            DECLARE $last_test_at AS Utf8?;
-            DECLARE $last_result AS Bool?;
-
-            UPDATE word_test_statistics
-            SET total_tests = $total_tests,
-                correct_answers = $correct_answers,
-                wrong_answers = $wrong_answers,
-                last_test_at = $last_test_at,
-                last_result = $last_result
-            WHERE id = $id
-            """
+    def delete_training_session(self, token: str):
+        """Delete training session by token"""
+        query = """
+        DECLARE $token AS Utf8?;
 
-            self._execute_query(update_query, {
-                '$id': stats['id'],
-                '$total_tests': stats['total_tests'] + 1,
-                '$correct_answers': stats['correct_answers'] + (1 if is_correct else 0),
-                '$wrong_answers': stats['wrong_answers'] + (0 if is_correct else 1),
-                '$last_test_at': datetime.now().isoformat(),
-                '$last_result': is_correct
+        DELETE FROM training_sessions
+        WHERE token = $token
+        """
+
+        self._execute_query(query, {'$token': token})
+
+    # ====================
+    # Test Pool Methods
+    # ====================
+
+    def get_test_pool(self, user_id: int, word_ids: List[int], test_mode: int) -> List[Dict]:
+        """
+        Get pregenerated test options for words (one query for the whole batch)
+
+        Args:
+            user_id: User ID
+            word_ids: Word IDs
+            test_mode: 1 = EN→RU, 2 = RU→EN
+
+        Returns:
+            List of rows: word_id, word, correct_translation, wrong_option_1..3
+        """
+        if not word_ids:
+            return []
+
+        query = """
+        DECLARE $user_id AS Uint64?;
+        DECLARE $test_mode AS Uint32?;
+        DECLARE $word_ids AS List<Uint64>;
+
+        SELECT word_id, word, correct_translation, wrong_option_1, wrong_option_2, wrong_option_3
+        FROM test_pool
+        WHERE user_id = $user_id
+          AND test_mode = $test_mode
+          AND word_id IN $word_ids
+        """
+
+        return self._fetch_all(query, {
+            '$user_id': user_id,
+            '$test_mode': test_mode,
+            '$word_ids': _id_list(word_ids)
+        })
+
+    def upsert_test_pool(self, rows: List[Dict]):
+        """
+        Store pregenerated test options (replaces previous options for the same word/mode)
+
+        Args:
+            rows: [{'user_id', 'word_id', 'test_mode', 'word', 'correct_translation',
+                    'wrong_option_1', 'wrong_option_2', 'wrong_option_3'}, ...]
+        """
+        if not rows:
+            return
+
+        created_at = datetime.now().isoformat()
+        for row in rows:
+            row.setdefault('created_at', created_at)
+
+        query = """
+        DECLARE $rows AS List<Struct<
+            user_id: Uint64?,
+            word_id: Uint64?,
+            test_mode: Uint32?,
+            word: Utf8?,
+            correct_translation: Utf8?,
+            wrong_option_1: Utf8?,
+            wrong_option_2: Utf8?,
+            wrong_option_3: Utf8?,
+            created_at: Utf8?
+        >>;
+
+        UPSERT INTO test_pool
+        SELECT * FROM AS_TABLE($rows)
+        """
+
+        self._execute_query(query, {
+            '$rows': _struct_list(rows, {
+                'user_id': ydb.PrimitiveType.Uint64,
+                'word_id': ydb.PrimitiveType.Uint64,
+                'test_mode': ydb.PrimitiveType.Uint32,
+                'word': ydb.PrimitiveType.Utf8,
+                'correct_translation': ydb.PrimitiveType.Utf8,
+                'wrong_option_1': ydb.PrimitiveType.Utf8,
+                'wrong_option_2': ydb.PrimitiveType.Utf8,
+                'wrong_option_3': ydb.PrimitiveType.Utf8,
+                'created_at': ydb.PrimitiveType.Utf8,
             })
-        else:
-            # Create new
-            stat_id = self._get_next_id('word_test_statistics')
+        })
 
-            insert_query = """
-            DECLARE $id AS Uint64?;
-            DECLARE $user_id AS Uint64?;
-            DECLARE $word_id AS Uint64?;
-            DECLARE $total_tests AS Uint32?;
-            DECLARE $correct_answers AS Uint32?;
-            DECLARE $wrong_answers AS Uint32?;
-            DECLARE $last_test_at AS Utf8?;
-            DECLARE $last_result AS Bool?;
-
-            UPSERT INTO word_test_statistics (id, user_id, word_id, total_tests, correct_answers, wrong_answers, last_test_at, last_result)
-            VALUES ($id, $user_id, $word_id, $total_tests, $correct_answers, $wrong_answers, $last_test_at, $last_result)
-            """
+    # ====================
+    # Distractor Cache Methods
+    # ====================
 
-            self._execute_query(insert_query, {
-                '$id': stat_id,
-                '$user_id': user_id,
-                '$word_id': word_id,
-                '$total_tests': 1,
-                '$correct_answers': 1 if is_correct else 0,
-                '$wrong_answers': 0 if is_correct else 1,
-                '$last_test_at': datetime.now().isoformat(),
-                '$last_result': is_correct
+    def get_distractor_sets(self, keys: List[Dict], test_mode: int) -> List[Dict]:
+        """
+        Get all cached option sets for many (lemma, translation) keys in one query
+
+        Args:
+            keys: [{'lemma': 'threshold', 'translation': 'порог'}, ...] (уже нормализованы)
+            test_mode: 1 = EN→RU, 2 = RU→EN
+
+        Returns:
+            List of rows: lemma, translation, set_id, wrong_option_1..3, last_used_at
+        """
+        if not keys:
+            return []
+
+        query = """
+        DECLARE $keys AS List<Struct<lemma: Utf8?, translation: Utf8?, test_mode: Uint32?>>;
+
+        SELECT
+            d.lemma AS lemma,
+            d.translation AS translation,
+            d.set_id AS set_id,
+            d.wrong_option_1 AS wrong_option_1,
+            d.wrong_option_2 AS wrong_option_2,
+            d.wrong_option_3 AS wrong_option_3,
+            d.last_used_at AS last_used_at
+        FROM AS_TABLE($keys) AS k
+        INNER JOIN distractor_sets AS d
+            ON d.lemma = k.lemma AND d.translation = k.translation AND d.test_mode = k.test_mode
+        """
+
+        return self._fetch_all(query, {
+            '$keys': _struct_list([dict(k, test_mode=test_mode) for k in keys], {
+                'lemma': ydb.PrimitiveType.Utf8,
+                'translation': ydb.PrimitiveType.Utf8,
+                'test_mode': ydb.PrimitiveType.Uint32,
             })
+        })
+
+    def upsert_distractor_sets(self, rows: List[Dict]):
+        """
+        Store generated option sets
+
+        Args:
+            rows: [{'lemma', 'translation', 'test_mode', 'set_id', 'wrong_option_1..3',
+                    'created_at' (мкс), 'last_used_at' (мкс)}, ...]
+        """
+        if not rows:
+            return
+
+        query = """
+        DECLARE $rows AS List<Struct<
+            lemma: Utf8?,
+            translation: Utf8?,
+            test_mode: Uint32?,
+            set_id: Uint32?,
+            wrong_option_1: Utf8?,
+            wrong_option_2: Utf8?,
+            wrong_option_3: Utf8?,
+            created_at: Timestamp?,
+            last_used_at: Timestamp?
+        >>;
+
+        UPSERT INTO distractor_sets
+        SELECT * FROM AS_TABLE($rows)
+        """
+
+        self._execute_query(query, {
+            '$rows': _struct_list(rows, {
+                'lemma': ydb.PrimitiveType.Utf8,
+                'translation': ydb.PrimitiveType.Utf8,
+                'test_mode': ydb.PrimitiveType.Uint32,
+                'set_id': ydb.PrimitiveType.Uint32,
+                'wrong_option_1': ydb.PrimitiveType.Utf8,
+                'wrong_option_2': ydb.PrimitiveType.Utf8,
+                'wrong_option_3': ydb.PrimitiveType.Utf8,
+                'created_at': ydb.PrimitiveType.Timestamp,
+                'last_used_at': ydb.PrimitiveType.Timestamp,
+            })
+        })
+
+    def touch_distractor_sets(self, rows: List[Dict]):
+        """
+        Update last_used_at of option sets (rotation), other columns are untouched
+
+        UPDATE ON меняет только существующие строки: набор, удалённый TTL между
+        чтением и записью, не создаётся заново без options и created_at
+
+        Args:
+            rows: [{'lemma', 'translation', 'test_mode', 'set_id', 'last_used_at' (мкс)}, ...]
+        """
+        if not rows:
+            return
+
+        query = """
+        DECLARE $rows AS List<Struct<
+            lemma: Utf8?,
+            translation: Utf8?,
+            test_mode: Uint32?,
+            set_id: Uint32?,
+            last_used_at: Timestamp?
+        >>;
+
+        UPDATE distractor_sets ON
+        SELECT * FROM AS_TABLE($rows)
+        """
+
+        self._execute_query(query, {
+            '$rows': _struct_list(rows, {
+                'lemma': ydb.PrimitiveType.Utf8,
+                'translation': ydb.PrimitiveType.Utf8,
+                'test_mode': ydb.PrimitiveType.Uint32,
+                'set_id': ydb.PrimitiveType.Uint32,
+                'last_used_at': ydb.PrimitiveType.Timestamp,
+            })
+        })
+
+    def get_user_vocabulary(self, user_id: int) -> List[Dict]:
+        """
+        Get all user's words with main translation in one query (for local distractors)
+
+        Returns:
+            List of rows: word_id, lemma, translation
+        """
+        query = """
+        DECLARE $user_id AS Uint64?;
+
+        SELECT w.id AS word_id, w.lemma AS lemma, t.translation AS translation, t.id AS translation_id
+        FROM dictionary_words AS w
+        INNER JOIN dictionary_translations AS t ON t.user_id = w.user_id AND t.word_id = w.id
+        WHERE w.user_id = $user_id
+        """
+
+        rows = self._fetch_all(query, {'$user_id': user_id})
+
+        # Основной перевод — добавленный первым (ID переводов растут по порядку добавления)
+        vocabulary = {}
+        for row in sorted(rows, key=lambda r: r['translation_id']):
+            if row.get('lemma') and row.get('translation'):
+                vocabulary.setdefault(row['word_id'], {
+                    'word_id': row['word_id'],
+                    'lemma': row['lemma'],
+                    'translation': row['translation'],
+                })
+        return list(vocabulary.values())
+
+    def get_typeahead_rows(self, user_id: int) -> List[tuple]:
+        """
+        Get all user's lemmas with all their translations in one query (for typeahead)
+
+        Returns:
+            List of tuples (word_id, lemma, translation); translation is None if the word has no translations
+        """
+        query = """
+        DECLARE $user_id AS Uint64?;
+
+        SELECT w.id AS word_id, w.lemma AS lemma, t.translation AS translation
+        FROM dictionary_words AS w
+        LEFT JOIN dictionary_translations AS t ON t.user_id = w.user_id AND t.word_id = w.id
+        WHERE w.user_id = $user_id
+        """
+
+        return self._fetch_all(query, {'$user_id': user_id},
+                               decode=lambda result_set: rows_as_tuples(result_set, TYPEAHEAD_COLUMNS))
+
+    def get_global_vocabulary(self, limit: int) -> List[Dict]:
+        """
+        Get (lemma, translation) pairs known across all users (keys of distractor_sets)
+
+        Returns:
+            List of rows: lemma, translation (нормализованные)
+        """
+        query = """
+        DECLARE $limit AS Uint32?;
+
+        SELECT DISTINCT lemma, translation
+        FROM distractor_sets
+        LIMIT $limit
+        """
+
+        return self._fetch_all(query, {'$limit': limit})
+
+    # ====================
+    # Word Methods
+    # ====================
+
+    def submit_test_answer(self, test_id: int, answer: str) -> Optional[Dict]:
+        """
+        Check answer and apply all its effects in one transaction (one round trip)
+
+        Новый рейтинг и статус считаются на стороне YDB по тем же правилам,
+        что и раньше в TestManager: new → learning; верно — rating + 1 (максимум 10),
+        неверно — rating = 0 и learned → learning; learning с rating 10 → learned.
+        Статистика увеличивается инкрементом, тест удаляется.
+
+        Все чтения идут до записей (в транзакции YDB нельзя читать таблицу после её изменения).
+
+        Args:
+            test_id: Test ID
+            answer: Selected option text
+
+        Returns:
+            {'word_id', 'user_id', 'word', 'correct_translation', 'test_mode', 'is_correct',
+             'new_rating', 'new_status', 'translations' [translation, ...]}
+            или None, если теста нет (уже отвечен)
+        """
+        query = """
+        DECLARE $test_id AS Uint64?;
+        DECLARE $answer AS Utf8?;
+        DECLARE $now AS Utf8?;
+        DECLARE $now_ts AS Timestamp?;
+
+        $test = (
+            SELECT t.id AS id, t.user_id AS user_id, t.word_id AS word_id, t.word AS word,
+                   t.correct_translation AS correct_translation, COALESCE(t.test_mode, 1u) AS test_mode
+            FROM tests VIEW idx_id AS k
+            INNER JOIN tests AS t ON t.user_id = k.user_id AND t.id = k.id
+            WHERE k.id = $test_id
+        );
+
+        $checked = (
+            SELECT
+                t.user_id AS user_id,
+                t.word_id AS word_id,
+                t.word AS word,
+                t.correct_translation AS correct_translation,
+                t.test_mode AS test_mode,
+                COALESCE(IF(t.test_mode = 1u, t.correct_translation, t.word) = $answer, false) AS is_correct,
+                COALESCE(w.status, 'new'u) AS old_status,
+                IF(COALESCE(w.status, 'new'u) = 'new'u, 'learning'u, w.status) AS status_seen,
+                COALESCE(w.rating, 0u) AS old_rating,
+                w.doc AS doc
+            FROM $test AS t
+            INNER JOIN dictionary_words AS w ON w.user_id = t.user_id AND w.id = t.word_id
+        );
+
+        $rated = (
+            SELECT
+                c.*,
+                IF(c.is_correct, IF(c.old_rating >= 10u, 10u, c.old_rating + 1u), 0u) AS new_rating,
+                IF(NOT c.is_correct AND c.status_seen = 'learned'u, 'learning'u, c.status_seen) AS status_after_answer
+            FROM $checked AS c
+        );
+
+        $result = (
+            SELECT
+                r.*,
+                IF(r.status_after_answer = 'learning'u AND r.new_rating >= 10u, 'learned'u, r.status_after_answer) AS new_status
+            FROM $rated AS r
+        );
+
+        $stats = (
+            SELECT s.word_id AS word_id, s.total_tests AS total_tests,
+                   s.correct_answers AS correct_answers, s.wrong_answers AS wrong_answers
+            FROM word_test_statistics AS s
+            INNER JOIN $test AS t ON s.user_id = t.user_id AND s.word_id = t.word_id
+        );
+
+        SELECT
+            word_id,
+            user_id,
+            word,
+            correct_translation,
+            test_mode,
+            is_correct,
+            new_rating,
+            new_status,
+            doc
+        FROM $result;
+
+        -- Переходы статуса → счётчики словаря пользователя
+        $deltas = (
+            SELECT 'user:'u || CAST(user_id AS Utf8) AS scope, 'status:'u || new_status AS name, 1l AS delta
+            FROM $result WHERE old_status != new_status
+            UNION ALL
+            SELECT 'user:'u || CAST(user_id AS Utf8) AS scope, 'status:'u || old_status AS name, -1l AS delta
+            FROM $result WHERE old_status != new_status
+        );
+        """ + APPLY_COUNTER_DELTAS + """
+
+        UPSERT INTO dictionary_words
+        SELECT
+            user_id,
+            word_id AS id,
+            new_rating AS rating,
+            new_status AS status,
+            $now AS last_rating_change,
+            $now_ts AS last_rating_change_ts
+        FROM $result;
+
+        UPSERT INTO word_test_statistics
+        SELECT
+            r.user_id AS user_id,
+            r.word_id AS word_id,
+            COALESCE(s.total_tests, 0u) + 1u AS total_tests,
+            COALESCE(s.correct_answers, 0u) + IF(r.is_correct, 1u, 0u) AS correct_answers,
+            COALESCE(s.wrong_answers, 0u) + IF(r.is_correct, 0u, 1u) AS wrong_answers,
+            $now AS last_test_at,
+            $now_ts AS last_test_ts,
+            r.is_correct AS last_result
+        FROM $result AS r
+        LEFT JOIN $stats AS s ON s.word_id = r.word_id;
+
+        DELETE FROM tests ON
+        SELECT user_id, id FROM $test;
+        """
+
+        now = datetime.now()
+        result = self._fetch_one(query, {
+            '$test_id': test_id,
+            '$answer': answer,
+            '$now': now.isoformat(),
+            '$now_ts': now
+        })
+        if not result:
+            return None
+        invalidate_dictionary(result['user_id'])
+
+        # Переводы — из документа слова (прочитан вместе со строкой слова)
+        doc = load_word_doc(result.pop('doc', None))
+        translations = word_doc_translations(doc) if doc else None
+        if translations is None:
+            translations = self.get_translations_for_words([result['word_id']]).get(result['word_id'], [])
+        result['translations'] = translations
+        return result
+
+    def apply_answer_events(self, events: List[Dict]) -> int:
+        """
+        Apply a batch of answer events from AnswerLog in one transaction
+
+        Идемпотентно: события, уже записанные в answer_events, отбрасываются
+        (повтор пачки после сбоя ничего не удваивает). Ответ засчитывается,
+        только пока тест существует — запись ответа тест удаляет, поэтому
+        дубль ответа на тот же тест из другого воркера (или уже записанный
+        синхронно submit_test_answer) не применяется второй раз.
+
+        Рейтинг и статус слова пересчитываются по последовательности ответов
+        с теми же правилами, что в submit_test_answer:
+          - была ошибка → rating = число верных ответов после последней ошибки;
+          - ошибок не было → rating + число верных ответов;
+          - rating 10 у learning/learned → learned, ошибка у learned → learning.
+        Статистика увеличивается на агрегаты пачки, отвеченные тесты удаляются.
+
+        Args:
+            events: [{'event_id', 'user_id', 'word_id', 'test_id', 'test_mode',
+                      'answer', 'is_correct', 'answered_at'}, ...]
+
+        Returns:
+            Количество применённых (новых) событий
+        """
+        if not events:
+            return 0
+
+        query = """
+        DECLARE $events AS List<Struct<
+            event_id: Utf8?,
+            user_id: Uint64?,
+            word_id: Uint64?,
+            test_id: Uint64?,
+            test_mode: Uint32?,
+            answer: Utf8?,
+            is_correct: Bool?,
+            answered_at: Utf8?,
+            answered_ts: Timestamp?
+        >>;
+
+        $fresh = (
+            SELECT e.*
+            FROM AS_TABLE($events) AS e
+            INNER JOIN tests AS t ON t.user_id = e.user_id AND t.id = e.test_id
+            LEFT ONLY JOIN answer_events AS a ON a.event_id = e.event_id
+        );
+
+        $last_wrong = (
+            SELECT user_id, word_id, MAX(IF(NOT is_correct, answered_at)) AS last_wrong_at
+            FROM $fresh
+            GROUP BY user_id, word_id
+        );
+
+        $agg = (
+            SELECT
+                user_id,
+                word_id,
+                CAST(COUNT(*) AS Uint32) AS answers,
+                CAST(COUNT_IF(f.is_correct) AS Uint32) AS correct,
+                CAST(COUNT_IF(f.is_correct AND (l.last_wrong_at IS NULL OR f.answered_at > l.last_wrong_at)) AS Uint32) AS correct_tail,
+                MAX_BY(f.is_correct, f.answered_at) AS last_result,
+                MAX(f.answered_at) AS last_answered_at,
+                MAX(f.answered_ts) AS last_answered_ts
+            FROM $fresh AS f
+            INNER JOIN $last_wrong AS l ON l.user_id = f.user_id AND l.word_id = f.word_id
+            GROUP BY f.user_id AS user_id, f.word_id AS word_id
+        );
+
+        $rated = (
+            SELECT
+                g.*,
+                COALESCE(w.status, 'new'u) AS old_status,
+                IF(COALESCE(w.status, 'new'u) = 'new'u, 'learning'u, w.status) AS status_seen,
+                IF(g.correct < g.answers,
+                   MIN_OF(g.correct_tail, 10u),
+                   MIN_OF(COALESCE(w.rating, 0u) + g.correct, 10u)) AS new_rating
+            FROM $agg AS g
+            INNER JOIN dictionary_words AS w ON w.user_id = g.user_id AND w.id = g.word_id
+        );
+
+        $result = (
+            SELECT
+                r.*,
+                IF(r.new_rating >= 10u AND r.status_seen IN ('learning'u, 'learned'u), 'learned'u,
+                   IF(r.correct < r.answers AND r.status_seen = 'learned'u, 'learning'u, r.status_seen)) AS new_status
+            FROM $rated AS r
+        );
+
+        $stats = (
+            SELECT s.user_id AS user_id, s.word_id AS word_id, s.total_tests AS total_tests,
+                   s.correct_answers AS correct_answers, s.wrong_answers AS wrong_answers
+            FROM word_test_statistics AS s
+            INNER JOIN $agg AS g ON s.user_id = g.user_id AND s.word_id = g.word_id
+        );
+
+        SELECT COUNT(*) AS applied FROM $fresh;
+
+        -- Переходы статуса → счётчики словаря пользователя
+        $deltas = (
+            SELECT 'user:'u || CAST(user_id AS Utf8) AS scope, 'status:'u || new_status AS name, 1l AS delta
+            FROM $result WHERE old_status != new_status
+            UNION ALL
+            SELECT 'user:'u || CAST(user_id AS Utf8) AS scope, 'status:'u || old_status AS name, -1l AS delta
+            FROM $result WHERE old_status != new_status
+        );
+        """ + APPLY_COUNTER_DELTAS + """
+
+        UPSERT INTO dictionary_words
+        SELECT
+            user_id,
+            word_id AS id,
+            new_rating AS rating,
+            new_status AS status,
+            last_answered_at AS last_rating_change,
+            last_answered_ts AS last_rating_change_ts
+        FROM $result;
+
+        UPSERT INTO word_test_statistics
+        SELECT
+            g.user_id AS user_id,
+            g.word_id AS word_id,
+            COALESCE(s.total_tests, 0u) + g.answers AS total_tests,
+            COALESCE(s.correct_answers, 0u) + g.correct AS correct_answers,
+            COALESCE(s.wrong_answers, 0u) + g.answers - g.correct AS wrong_answers,
+            g.last_answered_at AS last_test_at,
+            g.last_answered_ts AS last_test_ts,
+            g.last_result AS last_result
+        FROM $agg AS g
+        LEFT JOIN $stats AS s ON s.user_id = g.user_id AND s.word_id = g.word_id;
+
+        DELETE FROM tests ON
+        SELECT user_id, test_id AS id FROM $fresh;
+
+        UPSERT INTO answer_events
+        SELECT event_id, user_id, word_id, test_id, test_mode, answer, is_correct, answered_at FROM $fresh;
+        """
+
+        # Один ответ на тест и в пределах пачки (в неё попадают и события из чужого спула)
+        rows = []
+        answered = set()
+        for event in events:
+            if event['test_id'] in answered:
+                continue
+            answered.add(event['test_id'])
+            rows.append(dict(event, answered_ts=timestamp_us(datetime.fromisoformat(event['answered_at']))))
+
+        result = self._fetch_one(query, {
+            '$events': _struct_list(rows, {
+                'event_id': ydb.PrimitiveType.Utf8,
+                'user_id': ydb.PrimitiveType.Uint64,
+                'word_id': ydb.PrimitiveType.Uint64,
+                'test_id': ydb.PrimitiveType.Uint64,
+                'test_mode': ydb.PrimitiveType.Uint32,
+                'answer': ydb.PrimitiveType.Utf8,
+                'is_correct': ydb.PrimitiveType.Bool,
+                'answered_at': ydb.PrimitiveType.Utf8,
+                'answered_ts': ydb.PrimitiveType.Timestamp,
+            })
+        })
+        for user_id in {e['user_id'] for e in events}:
+            invalidate_dictionary(user_id)
+        return (result or {}).get('applied') or 0
 
     def get_word_by_id(self, word_id: int) -> Optional[Dict]:
-        """Get dictionary word by ID"""
+        """Get dictionary word by ID (ключ (user_id, id) находится по индексу idx_id)"""
         query = """
         DECLARE $id AS Uint64?;
 
-        SELECT *
-        FROM dictionary_words
-        WHERE id = $id
+        $key = (SELECT user_id, id FROM dictionary_words VIEW idx_id WHERE id = $id);
+
+        SELECT w.*
+        FROM $key AS k
+        INNER JOIN dictionary_words AS w ON w.user_id = k.user_id AND w.id = k.id
         """
 
         return self._fetch_one(query, {'$id': word_id})
 
-    def get_words_by_training_step(self, user_id: int, step: int) -> List[Dict]:
+    def get_user_words_by_ids(self, user_id: int, word_ids: List[int]) -> List[Dict]:
+        """
+        Get many words of one user in one query (point reads by the PK)
+
+        Returns:
+            List of rows: id, lemma (удалённые слова отсутствуют)
+        """
+        if not word_ids:
+            return []
+
+        query = """
+        DECLARE $user_id AS Uint64?;
+        DECLARE $word_ids AS List<Uint64>;
+
+        SELECT id, lemma
+        FROM dictionary_words
+        WHERE user_id = $user_id AND id IN $word_ids
         """
-        Get words for training by step number (8-step algorithm)
+
+        return self._fetch_all(query, {'$user_id': user_id, '$word_ids': _id_list(word_ids)})
+
+    def get_training_candidates(self, user_id: int) -> List[Dict]:
+        """
+        Get all user's words with the fields needed by the 8-step algorithm
+
+        Один запрос вместо отдельного запроса на каждый шаг:
+        TrainingService раскладывает результат по шагам в памяти.
+        Набор слов берётся из DictionaryCache (запрос — только при промахе).
 
         Args:
             user_id: User ID
-            step: Step number (1-8)
 
         Returns:
-            List of words for the given step
+            List of words (id, lemma, type, status, rating, added_at, last_reviewed_at,
+            last_rating_change, added_ts, last_reviewed_ts, last_rating_change_ts) — копии
         """
-        if step == 1:
-            # Шаг 1: Новое слово, добавленное последним
-            query = """
-            DECLARE $user_id AS Uint64?;
+        words = get_dictionary_cache().words(
+            user_id, lambda: self._fetch_all(WORD_SET_QUERY, {'$user_id': user_id}, tx_mode=TX_ONLINE_READ))
+        return [dict(row) for row in words.values()]
 
-            SELECT *
-            FROM dictionary_words
-            WHERE user_id = $user_id AND status = 'new'
-            ORDER BY added_at DESC
-            LIMIT 1
-            """
-            return self._fetch_all(query, {'$user_id': user_id})
+    # ====================
+    # Spaced Repetition Methods
+    # ====================
 
-        elif step == 2:
-            # Шаг 2: Слово learning по давности повтора
-            query = """
-            DECLARE $user_id AS Uint64?;
+    def get_schedule_inputs(self, user_id: int) -> List[Dict]:
+        """
+        Get everything the scheduler needs for all user's words in one query
 
-            SELECT *
-            FROM dictionary_words
-            WHERE user_id = $user_id AND status = 'learning'
-            ORDER BY COALESCE(last_reviewed_at, added_at) ASC
-            LIMIT 1
-            """
-            return self._fetch_all(query, {'$user_id': user_id})
+        Returns:
+            List of rows: word_id, added_at, due_at, interval_days, ease,
+            repetitions, reviews_seen (из word_schedule, могут быть NULL)
+            и total_tests, last_result (из word_test_statistics)
+        """
+        query = """
+        DECLARE $user_id AS Uint64?;
 
-        elif step == 3 or step == 7:
-            # Шаг 3 и 7: Новое слово, добавленное давнее всего
-            query = """
-            DECLARE $user_id AS Uint64?;
+        SELECT
+            w.id AS word_id,
+            w.added_at AS added_at,
+            s.due_at AS due_at,
+            s.interval_days AS interval_days,
+            s.ease AS ease,
+            s.repetitions AS repetitions,
+            s.reviews_seen AS reviews_seen,
+            st.total_tests AS total_tests,
+            st.last_result AS last_result
+        FROM dictionary_words AS w
+        LEFT JOIN word_schedule AS s ON s.user_id = w.user_id AND s.word_id = w.id
+        LEFT JOIN word_test_statistics AS st ON st.user_id = w.user_id AND st.word_id = w.id
+        WHERE w.user_id = $user_id
+        """
 
-            SELECT *
-            FROM dictionary_words
-            WHERE user_id = $user_id AND status = 'new'
-            ORDER BY added_at ASC
-            LIMIT 1
-            """
-            return self._fetch_all(query, {'$user_id': user_id})
+        return self._fetch_all(query, {'$user_id': user_id})
 
-        elif step == 4 or step == 6:
-            # Шаг 4 и 6: Learning с макс рейтингом (рандомно)
-            # Сортируем по рейтингу DESC, затем RANDOM() для случайного выбора среди одинаковых
-            query = """
-            DECLARE $user_id AS Uint64?;
+    def upsert_schedule(self, rows: List[Dict]):
+        """
+        Write recomputed schedule rows in one statement
 
-            SELECT *
-            FROM dictionary_words
-            WHERE user_id = $user_id
-              AND status = 'learning'
-            ORDER BY COALESCE(rating, 0) DESC, Random(TableRow())
-            LIMIT 1
-            """
-            return self._fetch_all(query, {'$user_id': user_id})
+        Args:
+            rows: [{'user_id', 'word_id', 'due_at' (мкс), 'interval_days', 'ease',
+                    'repetitions', 'reviews_seen'}, ...]
+        """
+        if not rows:
+            return
 
-        elif step == 5:
-            # Шаг 5: Слово, обнулившее рейтинг последним
-            query = """
-            DECLARE $user_id AS Uint64?;
+        query = """
+        DECLARE $rows AS List<Struct<
+            user_id: Uint64?,
+            word_id: Uint64?,
+            due_at: Timestamp?,
+            interval_days: Double?,
+            ease: Double?,
+            repetitions: Uint32?,
+            reviews_seen: Uint32?
+        >>;
 
-            SELECT *
-            FROM dictionary_words
-            WHERE user_id = $user_id
-              AND status = 'learning'
-              AND COALESCE(rating, 0) = 0
-              AND last_rating_change IS NOT NULL
-            ORDER BY last_rating_change DESC
-            LIMIT 1
-            """
-            return self._fetch_all(query, {'$user_id': user_id})
+        UPSERT INTO word_schedule
+        SELECT * FROM AS_TABLE($rows)
+        """
 
-        elif step == 8:
-            # Шаг 8: Рандомное выученное слово
-            query = """
-            DECLARE $user_id AS Uint64?;
+        self._execute_query(query, {
+            '$rows': _struct_list(rows, {
+                'user_id': ydb.PrimitiveType.Uint64,
+                'word_id': ydb.PrimitiveType.Uint64,
+                'due_at': ydb.PrimitiveType.Timestamp,
+                'interval_days': ydb.PrimitiveType.Double,
+                'ease': ydb.PrimitiveType.Double,
+                'repetitions': ydb.PrimitiveType.Uint32,
+                'reviews_seen': ydb.PrimitiveType.Uint32,
+            })
+        })
 
-            SELECT *
-            FROM dictionary_words
-            WHERE user_id = $user_id AND status = 'learned'
-            ORDER BY Random(TableRow())
-            LIMIT 1
-            """
-            return self._fetch_all(query, {'$user_id': user_id})
+    def get_due_words(self, user_id: int, limit: int) -> List[Dict]:
+        """
+        Get top-N words that are due now, ordered by due_at
+        (bounded range read over idx_user_due)
 
-        else:
-            return []
+        Args:
+            user_id: User ID
+            limit: Maximum number of words to return
 
-    def get_translation_for_word(self, word_id: int) -> str:
-        """Get first (main) translation for a word"""
+        Returns:
+            List of words with the columns of get_training_candidates() plus due_at
+        """
         query = """
-        DECLARE $word_id AS Uint64?;
+        DECLARE $user_id AS Uint64?;
+        DECLARE $limit AS Uint32?;
 
-        SELECT translation
-        FROM dictionary_translations
-        WHERE word_id = $word_id
-        ORDER BY added_at ASC
-        LIMIT 1
+        $due = (
+            SELECT user_id, word_id, due_at
+            FROM word_schedule VIEW idx_user_due
+            WHERE user_id = $user_id AND due_at <= CurrentUtcTimestamp()
+            ORDER BY due_at ASC
+            LIMIT $limit
+        );
+
+        SELECT
+            w.id AS id,
+            w.lemma AS lemma,
+            w.type AS type,
+            w.status AS status,
+            w.rating AS rating,
+            w.added_at AS added_at,
+            w.last_reviewed_at AS last_reviewed_at,
+            w.last_rating_change AS last_rating_change,
+            w.added_ts AS added_ts,
+            w.last_reviewed_ts AS last_reviewed_ts,
+            w.last_rating_change_ts AS last_rating_change_ts,
+            d.due_at AS due_at
+        FROM $due AS d
+        INNER JOIN dictionary_words AS w ON w.user_id = d.user_id AND w.id = d.word_id
+        ORDER BY due_at ASC
         """
 
-        result = self._fetch_one(query, {'$word_id': word_id})
-        if not result:
-            logger.warning(f"[YDB] Нет перевода для word_id={word_id}")
-            return ""
+        return self._fetch_all(query, {'$user_id': user_id, '$limit': limit})
 
-        # Проверяем наличие ключа translation
-        if 'translation' not in result:
-            logger.error(f"[YDB] Ключ 'translation' не найден в результате: {result.keys()}")
-            return ""
+    def get_translations_for_words(self, word_ids: List[int]) -> Dict[int, List[str]]:
+        """
+        Get all translations for many words in one query
 
-        return result['translation']
+        Returns:
+            {word_id: [translation, ...]} в порядке добавления (первый — основной)
+        """
+        if not word_ids:
+            return {}
 
-    def get_all_translations_for_word(self, word_id: int) -> List[str]:
-        """Get all translations for a word"""
+        # ID переводов растут по порядку добавления и есть в индексе (часть ключа таблицы)
         query = """
-        DECLARE $word_id AS Uint64?;
+        DECLARE $word_ids AS List<Uint64>;
 
-        SELECT translation
-        FROM dictionary_translations
-        WHERE word_id = $word_id
-        ORDER BY added_at ASC
+        SELECT id, word_id, translation
+        FROM dictionary_translations VIEW idx_word_translation
+        WHERE word_id IN $word_ids
         """
 
-        results = self._fetch_all(query, {'$word_id': word_id})
-        translations = []
-        for r in results:
-            if 'translation' in r:
-                translations.append(r['translation'])
+        rows = self._fetch_all(query, {'$word_ids': _id_list(word_ids)})
+
+        translations = {}
+        for row in sorted(rows, key=lambda r: r['id']):
+            if row.get('translation'):
+                translations.setdefault(row['word_id'], []).append(row['translation'])
         return translations
 
-    def get_random_translations(self, user_id: int, exclude_translation: str, limit: int = 3) -> List[str]:
-        """Get random translations from user's dictionary (for fallback test options)"""
-        query = f"""
-        DECLARE $user_id AS Uint64?;
-        DECLARE $exclude AS Utf8?;
-
-        SELECT DISTINCT dt.translation
-        FROM dictionary_translations dt
-        JOIN dictionary_words dw ON dt.word_id = dw.id
-        WHERE dw.user_id = $user_id
-          AND dt.translation != $exclude
-        ORDER BY Random(TableRow())
-        LIMIT {limit}
+    def get_examples_for_words(self, word_ids: List[int]) -> Dict[int, Dict]:
         """
+        Get first example for many words in one query
 
-        results = self._fetch_all(query, {
-            '$user_id': user_id,
-            '$exclude': exclude_translation
-        })
-        # Безопасное извлечение с проверкой ключа
-        translations = []
-        for r in results:
-            if 'translation' in r:
-                translations.append(r['translation'])
-            else:
-                logger.warning(f"[YDB] Ключ 'translation' не найден в результате: {r.keys()}")
-        return translations
+        Returns:
+            {word_id: {'context', 'original_form'}} (слова без примеров отсутствуют)
+        """
+        if not word_ids:
+            return {}
+
+        query = """
+        DECLARE $word_ids AS List<Uint64>;
+
+        SELECT id, word_id, context, original_form
+        FROM dictionary_examples VIEW idx_word_example
+        WHERE word_id IN $word_ids
+        """
+
+        rows = self._fetch_all(query, {'$word_ids': _id_list(word_ids)})
+
+        examples = {}
+        for row in sorted(rows, key=lambda r: r['id']):
+            examples.setdefault(row['word_id'], {
+                'context': row.get('context'),
+                'original_form': row.get('original_form'),
+            })
+        return examples
 
-    def get_random_words_excluding(self, user_id: int, exclude_ids: List[int], limit: int = 8) -> List[Dict]:
+    def get_stats_for_words(self, word_ids: List[int]) -> Dict[int, Dict]:
         """
-        Get random words excluding specific IDs
+        Get test statistics for many words in one query
+
+        Ключ статистики (user_id, word_id): user_id берётся из индекса idx_id слов.
+
+        Returns:
+            {word_id: {'total_tests', 'correct_answers', 'wrong_answers', 'last_test_at', 'last_result'}}
+        """
+        if not word_ids:
+            return {}
+
+        query = """
+        DECLARE $word_ids AS List<Uint64>;
+
+        SELECT
+            s.word_id AS word_id,
+            s.total_tests AS total_tests,
+            s.correct_answers AS correct_answers,
+            s.wrong_answers AS wrong_answers,
+            s.last_test_at AS last_test_at,
+            s.last_result AS last_result
+        FROM dictionary_words VIEW idx_id AS w
+        INNER JOIN word_test_statistics AS s
+            ON s.user_id = w.user_id AND s.word_id = w.id
+        WHERE w.id IN $word_ids
+        """
+
+        rows = self._fetch_all(query, {'$word_ids': _id_list(word_ids)})
+        return {row.pop('word_id'): row for row in rows}
+
+    def get_word_docs(self, word_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Get word documents (dictionary_words.doc) for many words in one query
+
+        Returns:
+            {word_id: doc} (слова без документа отсутствуют)
+        """
+        if not word_ids:
+            return {}
+
+        query = """
+        DECLARE $word_ids AS List<Uint64>;
+
+        SELECT id, doc
+        FROM dictionary_words VIEW idx_id
+        WHERE id IN $word_ids
+        """
+
+        rows = self._fetch_all(query, {'$word_ids': _id_list(word_ids)})
+        return {row['id']: load_word_doc(row['doc']) for row in rows if row.get('doc')}
+
+    def hydrate_words(self, word_ids: List[int], fields: List[str] = ('translations', 'example', 'stats')) -> Dict[int, Dict]:
+        """
+        Load related data for many words: one grouped query per requested field
+
+        'translations' и 'example' берутся из документов слов (одно чтение на оба поля),
+        из dictionary_translations / dictionary_examples — только для слов без
+        документа или с переводами, не вошедшими в документ.
 
         Args:
-            user_id: User ID
-            exclude_ids: List of word IDs to exclude
-            limit: Maximum number of words to return
+            word_ids: Word IDs
+            fields: Что загрузить:
+                    'translations' — все переводы в порядке добавления (первый — основной),
+                    'example' — первый пример из текста (или None),
+                    'stats' — статистика тестов (или None)
 
         Returns:
-            List of random words
+            {word_id: {'translations': [...], 'example': {...}, 'stats': {...}}} для каждого word_id
+
+        Все запросы читают один снимок (SnapshotReadOnly)
         """
-        if not exclude_ids:
-            exclude_ids = [0]  # Dummy value to avoid empty list
+        word_ids = list(dict.fromkeys(word_ids))
+        if not word_ids:
+            return {}
+        return self._in_snapshot(lambda: self._hydrate_words(word_ids, fields))
 
-        # YDB doesn't support IN with lists directly in DECLARE, so we use a different approach
-        # Build the query dynamically with the exclude list
-        exclude_str = ', '.join([str(id) for id in exclude_ids])
+    def _hydrate_words(self, word_ids: List[int], fields: List[str]) -> Dict[int, Dict]:
+        loaders = {
+            'translations': (self.get_translations_for_words, list),
+            'example': (self.get_examples_for_words, lambda: None),
+            'stats': (self.get_stats_for_words, lambda: None),
+        }
 
-        query = f"""
-        DECLARE $user_id AS Uint64?;
+        docs = self.get_word_docs(word_ids) if {'translations', 'example'} & set(fields) else {}
+        from_doc = {'translations': word_doc_translations, 'example': word_doc_example}
+
+        hydrated = {word_id: {} for word_id in word_ids}
+        for field in fields:
+            loader, default = loaders[field]
+            values, rest = {}, word_ids
+            if field in from_doc:
+                values = {word_id: from_doc[field](doc) for word_id, doc in docs.items()}
+                rest = [word_id for word_id in word_ids if word_id not in docs
+                        or (field == 'translations' and values[word_id] is None)]
+            if rest:
+                values.update(loader(rest))
+            for word_id, data in hydrated.items():
+                data[field] = values.get(word_id) or default()
+        return hydrated
 
-        SELECT *
-        FROM dictionary_words
-        WHERE user_id = $user_id
-          AND id NOT IN ({exclude_str})
-        ORDER BY Random(TableRow())
-        LIMIT {limit}
+    # ====================
+    # Cache Invalidation Methods
+    # ====================
+
+    def get_busy_cache_consumers(self, owner: str) -> List[int]:
         """
+        Slots of changefeed consumers leased by other processes
 
-        return self._fetch_all(query, {'$user_id': user_id})
+        Args:
+            owner: Идентификатор текущего процесса
+
+        Returns:
+            Номера слотов с неистёкшей арендой
+        """
+        query = """
+        DECLARE $owner AS Utf8?;
+        DECLARE $now AS Timestamp?;
+
+        SELECT slot FROM cache_consumers
+        WHERE owner != $owner AND expires_ts > $now
+        """
+
+        rows = self._fetch_all(query, {'$owner': owner, '$now': datetime.now()})
+        return [row['slot'] for row in rows]
+
+    def claim_cache_consumer(self, slot: int, owner: str, lease_seconds: int) -> bool:
+        """
+        Take or renew the lease of a changefeed consumer slot
+
+        Проверка и запись — в одной транзакции: слот с неистёкшей арендой
+        другого процесса не перезаписывается.
+
+        Returns:
+            False, если слот занят другим процессом
+        """
+        query = """
+        DECLARE $slot AS Uint32?;
+        DECLARE $owner AS Utf8?;
+        DECLARE $now AS Timestamp?;
+        DECLARE $expires_ts AS Timestamp?;
+
+        SELECT Ensure(COUNT(*), COUNT(*) = 0, 'SLOT_TAKEN') AS leases
+        FROM cache_consumers
+        WHERE slot = $slot AND owner != $owner AND expires_ts > $now;
+
+        UPSERT INTO cache_consumers (slot, owner, expires_ts)
+        VALUES ($slot, $owner, $expires_ts);
+        """
+
+        moment = datetime.now()
+        try:
+            self._execute_query(query, {
+                '$slot': slot,
+                '$owner': owner,
+                '$now': moment,
+                '$expires_ts': moment + timedelta(seconds=lease_seconds)
+            })
+            return True
+        except Exception as e:
+            if 'SLOT_TAKEN' not in str(e):
+                raise
+            return False
+
+    def release_cache_consumer(self, slot: int, owner: str):
+        """Release the lease of a changefeed consumer slot (if still held by owner)"""
+        query = """
+        DECLARE $slot AS Uint32?;
+        DECLARE $owner AS Utf8?;
+
+        DELETE FROM cache_consumers
+        WHERE slot = $slot AND owner = $owner
+        """
+
+        self._execute_query(query, {'$slot': slot, '$owner': owner})
 
     # ====================
     # User/Auth Methods
@@ -1096,7 +2357,7 @@ class WordoorioDatabase:
         DECLARE $telegram_id AS Uint64?;
 
         SELECT *
-        FROM users
+        FROM users VIEW idx_telegram_id
         WHERE telegram_id = $telegram_id
         """
 
@@ -1112,33 +2373,18 @@ class WordoorioDatabase:
         Returns:
             Dict with keys: total, new, learning, learned
         """
-        query = """
-        DECLARE $user_id AS Uint64?;
-
-        SELECT
-            COUNT(*) AS total,
-            COUNT_IF(status = 'new') AS new_count,
-            COUNT_IF(status = 'learning') AS learning_count,
-            COUNT_IF(status = 'learned') AS learned_count
-        FROM dictionary_words
-        WHERE user_id = $user_id
-        """
+        counters = self.get_counters(counter_scope(user_id))
 
-        result = self._fetch_one(query, {'$user_id': user_id})
-
-        if result:
-            return {
-                'total': result.get('total', 0) or 0,
-                'new': result.get('new_count', 0) or 0,
-                'learning': result.get('learning_count', 0) or 0,
-                'learned': result.get('learned_count', 0) or 0,
-            }
-
-        return {'total': 0, 'new': 0, 'learning': 0, 'learned': 0}
+        return {
+            'total': sum(value for name, value in counters.items() if name.startswith('type:')),
+            'new': counters.get('status:new', 0),
+            'learning': counters.get('status:learning', 0),
+            'learned': counters.get('status:learned', 0),
+        }
 
     def get_user_words(self, user_id: int, limit: int = 10) -> List[Dict]:
         """
-        Get user's dictionary words ordered by added_at DESC
+        Get user's dictionary words ordered by added_ts DESC
 
         Args:
             user_id: User ID
@@ -1152,34 +2398,13 @@ class WordoorioDatabase:
         DECLARE $limit AS Uint32?;
 
         SELECT *
-        FROM dictionary_words
+        FROM dictionary_words VIEW idx_user_added_ts
         WHERE user_id = $user_id
-        ORDER BY added_at DESC
+        ORDER BY added_ts DESC
         LIMIT $limit
         """
 
-        return self._fetch_all(query, {'$user_id': user_id, '$limit': limit})
-
-    def get_word_example(self, word_id: int) -> Optional[Dict]:
-        """
-        Get example context for a word
-
-        Args:
-            word_id: Word ID
-
-        Returns:
-            Dict with 'context' and 'original_form' or None
-        """
-        query = """
-        DECLARE $word_id AS Uint64?;
-
-        SELECT context, original_form
-        FROM dictionary_examples
-        WHERE word_id = $word_id
-        LIMIT 1
-        """
-
-        return self._fetch_one(query, {'$word_id': word_id})
+        return self._fetch_all(query, {'$user_id': user_id, '$limit': limit}, tx_mode=TX_ONLINE_READ)
 
     def ensure_test_users_exist(self):
         """
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Миграция: таблица answer_events (журнал ответов тренировки)
+
+AnswerLog подтверждает ответы сразу и записывает их пачками: состояние
+слов, статистику и сами события. event_id делает повтор пачки после
+сбоя идемпотентным, индекс idx_user_answered — для аналитики по пользователю.
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_migration(session):
+    """Создать таблицу answer_events"""
+
+    query = """
+    CREATE TABLE answer_events (
+        event_id Utf8,
+        user_id Uint64,
+        word_id Uint64,
+        test_id Uint64,
+        test_mode Uint32,
+        answer Utf8,
+        is_correct Bool,
+        answered_at Utf8,
+        PRIMARY KEY (event_id),
+        INDEX idx_user_answered GLOBAL ON (user_id, answered_at)
+    )
+    """
+
+    try:
+        print("Создаём таблицу answer_events...")
+        session.execute_scheme(query)
+        print("✅ Таблица answer_events создана")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Таблица answer_events уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def main():
+    print("🔧 Миграция: таблица answer_events")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: run_migration(session))
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
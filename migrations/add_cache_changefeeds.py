@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Миграция: changefeed'ы для сброса кэшей процессов
+
+Кэши в памяти процесса (словарь, подсказки) не видели записей других
+воркеров и инстансов и жили на коротком TTL. Миграция добавляет:
+
+  changefeed cache_invalidation  на dictionary_words, dictionary_translations, tests
+                                 (FORMAT JSON, MODE KEYS_ONLY, хранение 1 час);
+  consumer'ы cache_0 … cache_N-1 на каждом топике — по одному на процесс;
+  таблицу cache_consumers        аренда слотов consumer'ов процессами.
+
+Читает топики core/cache_invalidation.py. Чтобы добавить слоты, увеличьте
+CACHE_INVALIDATION_SLOTS и запустите миграцию повторно — существующие
+consumer'ы пропускаются.
+"""
+
+import os
+import sys
+import ydb
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cache_invalidation import (  # noqa: E402
+    CHANGEFEED, CONSUMER_PREFIX, CACHE_INVALIDATION_SLOTS, INVALIDATION_TABLES
+)
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_scheme(session, query: str, description: str):
+    """Выполнить изменение схемы (повторный запуск миграции безопасен)"""
+    try:
+        print(f"{description}...")
+        session.execute_scheme(query)
+        print("✅ Готово")
+    except Exception as e:
+        if "already exists" in str(e).lower() or "duplicate" in str(e).lower():
+            print("ℹ️ Уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def create_table(session):
+    """Таблица аренды слотов"""
+    run_scheme(session, """
+    CREATE TABLE cache_consumers (
+        slot Uint32,
+        owner Utf8,
+        expires_ts Timestamp,
+        PRIMARY KEY (slot)
+    )
+    """, "Создаем таблицу cache_consumers")
+
+
+def add_changefeeds(session):
+    """Changefeed'ы и consumer'ы"""
+    for table in INVALIDATION_TABLES:
+        run_scheme(session, f"""
+        ALTER TABLE {table} ADD CHANGEFEED {CHANGEFEED} WITH (
+            FORMAT = 'JSON', MODE = 'KEYS_ONLY', RETENTION_PERIOD = Interval("PT1H")
+        )
+        """, f"Changefeed {table}/{CHANGEFEED}")
+
+        for slot in range(CACHE_INVALIDATION_SLOTS):
+            run_scheme(session, f"""
+            ALTER TOPIC `{table}/{CHANGEFEED}` ADD CONSUMER {CONSUMER_PREFIX}{slot}
+            """, f"Consumer {CONSUMER_PREFIX}{slot} на {table}/{CHANGEFEED}")
+
+
+def main():
+    print("🔧 Миграция: changefeed'ы для сброса кэшей")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: create_table(session))
+            pool.retry_operation_sync(lambda session: add_changefeeds(session))
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Миграция: таблица counters (счётчики для статистики)
+
+Статистика (/api/stats, /api/dictionary/stats, "📊 Моя статистика") читает
+готовые счётчики одним запросом вместо COUNT(*) по таблицам. Счётчики
+меняются в тех же транзакциях, что и сами данные.
+
+Глобальные счётчики разбиты на шарды 'global/<N>' (database.global_scope):
+backfill() пишет значение в шард 'global/0' и обнуляет остальные.
+
+backfill() записывает абсолютные значения, поэтому его можно запустить
+повторно после выкладки кода, чтобы пересчитать счётчики.
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def create_table(session):
+    """Создать таблицу counters"""
+
+    query = """
+    CREATE TABLE counters (
+        scope Utf8,
+        name Utf8,
+        value Int64,
+        PRIMARY KEY (scope, name)
+    )
+    """
+
+    try:
+        print("Создаём таблицу counters...")
+        session.execute_scheme(query)
+        print("✅ Таблица counters создана")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Таблица counters уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def backfill(pool):
+    """Посчитать счётчики по текущим данным"""
+
+    query = """
+    $scope = ($user_id) -> (IF($user_id IS NULL, 'anonymous'u, 'user:'u || CAST($user_id AS Utf8)));
+
+    UPSERT INTO counters
+    SELECT scope, name, 0l AS value FROM counters
+    WHERE scope > 'global/0'u AND scope < 'global0'u;
+
+    UPSERT INTO counters
+    SELECT 'global/0'u AS scope, 'analyses'u AS name, CAST(COUNT(*) AS Int64) AS value FROM analyses
+    UNION ALL
+    SELECT 'global/0'u AS scope, 'highlights'u AS name, CAST(COUNT(*) AS Int64) AS value FROM highlights
+    UNION ALL
+    SELECT 'global/0'u AS scope, 'dictionary_words'u AS name, CAST(COUNT(*) AS Int64) AS value FROM dictionary_words;
+
+    UPSERT INTO counters
+    SELECT $scope(user_id) AS scope, 'type:'u || type AS name, CAST(COUNT(*) AS Int64) AS value
+    FROM dictionary_words
+    WHERE type IS NOT NULL
+    GROUP BY user_id, type;
+
+    UPSERT INTO counters
+    SELECT $scope(user_id) AS scope, 'status:'u || status AS name, CAST(COUNT(*) AS Int64) AS value
+    FROM dictionary_words
+    GROUP BY user_id, COALESCE(status, 'new'u) AS status;
+    """
+
+    print("Считаем счётчики по текущим данным...")
+    pool.execute_with_retries(query)
+    print("✅ Счётчики заполнены")
+
+
+def main():
+    print("🔧 Миграция: таблица counters")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: create_table(session))
+
+        with ydb.QuerySessionPool(driver) as query_pool:
+            backfill(query_pool)
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
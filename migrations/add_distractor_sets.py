@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Миграция: таблица distractor_sets (общий кэш вариантов ответов)
+
+Ключ — нормализованные (lemma, translation, test_mode) + set_id: для одного
+ключа хранится несколько наборов, DistractorCache выдаёт их по очереди.
+Наборы старше 90 дней удаляются TTL по created_at.
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_migration(session):
+    """Создать таблицу distractor_sets"""
+
+    query = """
+    CREATE TABLE distractor_sets (
+        lemma Utf8,
+        translation Utf8,
+        test_mode Uint32,
+        set_id Uint32,
+        wrong_option_1 Utf8,
+        wrong_option_2 Utf8,
+        wrong_option_3 Utf8,
+        created_at Timestamp,
+        last_used_at Timestamp,
+        PRIMARY KEY (lemma, translation, test_mode, set_id)
+    )
+    WITH (TTL = Interval("P90D") ON created_at)
+    """
+
+    try:
+        print("Создаём таблицу distractor_sets...")
+        session.execute_scheme(query)
+        print("✅ Таблица distractor_sets создана")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Таблица distractor_sets уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def main():
+    print("🔧 Миграция: таблица distractor_sets")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: run_migration(session))
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Миграция: составные индексы под реальные условия запросов
+
+Одноколоночные индексы (idx_status, idx_rating, idx_user_id, ...) не
+подходят ни одному запросу, и выборки тренировки и истории читали таблицы
+целиком. Новые индексы повторяют условия и сортировку запросов
+database.py / dictionary_manager.py, запросы обращаются к ним явно (VIEW):
+
+  dictionary_words         idx_user_status_added (user_id, status, added_at)   — шаги тренировки 1, 3, 7
+                           idx_user_added (user_id, added_at)                  — последние слова
+  dictionary_translations  idx_word_translation (word_id) COVER (translation, added_at)
+  dictionary_examples      idx_word_example (word_id) COVER (original_form, context, added_at)
+  analyses                 idx_user_date (user_id, analysis_date)              — история
+                           idx_session_user (session_id, user_id, analysis_date)
+  highlights               idx_analysis_position (analysis_id, position) COVER (word_id)
+                           idx_word_id (word_id)                               — удаление слова
+
+tests и word_test_statistics индексы не нужны: после schema_v2_user_keys
+их запросы — диапазоны первичного ключа (user_id, ...).
+
+Индексы строятся онлайн, таблицы остаются доступны для записи. Порядок:
+  1. python migrations/add_query_indexes.py             — построить индексы;
+  2. выкладка кода (запросы с VIEW на новые индексы);
+  3. python migrations/add_query_indexes.py --drop-old  — удалить заменённые.
+"""
+
+import sys
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+NEW_INDEXES = [
+    ('dictionary_words', 'idx_user_status_added', 'GLOBAL ON (user_id, status, added_at)'),
+    ('dictionary_words', 'idx_user_added', 'GLOBAL ON (user_id, added_at)'),
+    ('dictionary_translations', 'idx_word_translation', 'GLOBAL ON (word_id) COVER (translation, added_at)'),
+    ('dictionary_examples', 'idx_word_example', 'GLOBAL ON (word_id) COVER (original_form, context, added_at)'),
+    ('analyses', 'idx_user_date', 'GLOBAL ON (user_id, analysis_date)'),
+    ('analyses', 'idx_analysis_date', 'GLOBAL ON (analysis_date)'),
+    ('analyses', 'idx_session_user', 'GLOBAL ON (session_id, user_id, analysis_date)'),
+    ('highlights', 'idx_analysis_position', 'GLOBAL ON (analysis_id, position) COVER (word_id)'),
+    ('highlights', 'idx_word_id', 'GLOBAL ON (word_id)'),
+]
+
+# Заменённые индексы (часть из них есть только в базах из ydb_schema.yql)
+OLD_INDEXES = [
+    ('dictionary_words', 'idx_lemma'),
+    ('dictionary_words', 'idx_status'),
+    ('dictionary_words', 'idx_rating'),
+    ('dictionary_translations', 'idx_word_id'),
+    ('dictionary_examples', 'idx_word_id'),
+    ('analyses', 'idx_user_id'),
+    ('analyses', 'idx_session_id'),
+    ('highlights', 'idx_analysis_id'),
+    ('highlights', 'idx_highlight_word'),
+]
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_scheme(session, query: str, description: str):
+    """Выполнить изменение схемы (повторный запуск миграции безопасен)"""
+    try:
+        print(f"{description}...")
+        session.execute_scheme(query)
+        print("✅ Готово")
+    except Exception as e:
+        message = str(e).lower()
+        if "already exists" in message or "duplicate" in message:
+            print("ℹ️ Уже существует")
+        elif "not found" in message or "doesn't exist" in message or "does not exist" in message:
+            print("ℹ️ Уже удалён")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def add_indexes(session):
+    """Построить новые индексы (онлайн)"""
+    for table, name, definition in NEW_INDEXES:
+        run_scheme(session, f"ALTER TABLE {table} ADD INDEX {name} {definition}",
+                   f"Строим индекс {table}.{name}")
+
+
+def drop_old_indexes(session):
+    """Удалить индексы, заменённые составными"""
+    for table, name in OLD_INDEXES:
+        run_scheme(session, f"ALTER TABLE {table} DROP INDEX {name}",
+                   f"Удаляем индекс {table}.{name}")
+
+
+def main():
+    drop_old = '--drop-old' in sys.argv[1:]
+
+    print("🔧 Миграция: составные индексы под запросы" + (" (удаление старых)" if drop_old else ""))
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            if drop_old:
+                pool.retry_operation_sync(lambda session: drop_old_indexes(session))
+            else:
+                pool.retry_operation_sync(lambda session: add_indexes(session))
+
+        print("\n✅ Миграция завершена!")
+        if not drop_old:
+            print("После выкладки кода: python migrations/add_query_indexes.py --drop-old")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
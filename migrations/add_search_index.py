@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Миграция: таблица search_index (инвертированный индекс для /api/search)
+
+Создаёт таблицу и строит постинги для существующих слов словаря и
+хайлайтов. Новые постинги пишут DictionaryManager.add_word() и
+db.add_highlight_to_analysis(), поэтому повторный запуск лишь перезаписывает
+те же строки.
+"""
+
+import os
+import sys
+import ydb
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import counter_scope, search_rows, SEARCH_ROWS_DECLARE, INDEX_SEARCH_ROWS  # noqa: E402
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+PAGE_SIZE = 500
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def create_table(session):
+    """Создать таблицу search_index"""
+
+    query = """
+    CREATE TABLE search_index (
+        scope Utf8,
+        term Utf8,
+        word_id Uint64,
+        analysis_id Uint64,
+        text Utf8,
+        PRIMARY KEY (scope, term, word_id, analysis_id)
+    )
+    """
+
+    try:
+        print("Создаём таблицу search_index...")
+        session.execute_scheme(query)
+        print("✅ Таблица search_index создана")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Таблица search_index уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def _write_postings(pool, postings):
+    """Записать постинги одной пачкой"""
+    if postings:
+        pool.execute_with_retries(SEARCH_ROWS_DECLARE + INDEX_SEARCH_ROWS, parameters={
+            '$search_rows': search_rows(postings)
+        })
+
+
+def backfill(pool):
+    """Постинги для существующих слов (analysis_id = 0) и хайлайтов, страницами по id"""
+
+    words_query = """
+    DECLARE $last_id AS Uint64;
+
+    SELECT id, user_id, lemma FROM dictionary_words
+    WHERE id > $last_id
+    ORDER BY id
+    LIMIT %d
+    """ % PAGE_SIZE
+
+    highlights_query = """
+    DECLARE $last_id AS Uint64;
+
+    $page = (
+        SELECT id, analysis_id, word_id FROM highlights
+        WHERE id > $last_id
+        ORDER BY id
+        LIMIT %d
+    );
+
+    SELECT h.id AS id, h.analysis_id AS analysis_id, h.word_id AS word_id, w.user_id AS user_id, w.lemma AS lemma
+    FROM $page AS h
+    JOIN dictionary_words AS w ON w.id = h.word_id
+    ORDER BY id;
+
+    SELECT MAX(id) AS last_id FROM $page;
+    """ % PAGE_SIZE
+
+    print("Строим постинги для слов словаря...")
+    last_id, total = 0, 0
+    while True:
+        rows = pool.execute_with_retries(words_query, parameters={
+            '$last_id': ydb.TypedValue(last_id, ydb.PrimitiveType.Uint64)
+        })[0].rows
+        if not rows:
+            break
+        _write_postings(pool, [(counter_scope(r.user_id), r.id, 0, r.lemma) for r in rows if r.lemma])
+        last_id = rows[-1].id
+        total += len(rows)
+    print(f"✅ Слов: {total}")
+
+    print("Строим постинги для хайлайтов...")
+    last_id, total = 0, 0
+    while True:
+        result = pool.execute_with_retries(highlights_query, parameters={
+            '$last_id': ydb.TypedValue(last_id, ydb.PrimitiveType.Uint64)
+        })
+        page_last_id = result[1].rows[0].last_id if result[1].rows else None
+        if page_last_id is None:
+            break
+        rows = result[0].rows
+        _write_postings(pool, [(counter_scope(r.user_id), r.word_id, r.analysis_id, r.lemma) for r in rows if r.lemma])
+        last_id = page_last_id
+        total += len(rows)
+    print(f"✅ Хайлайтов: {total}")
+
+
+def main():
+    print("🔧 Миграция: таблица search_index")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: create_table(session))
+
+        with ydb.QuerySessionPool(driver) as query_pool:
+            backfill(query_pool)
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Миграция: таблица test_pool (готовые варианты ответов для тестов)
+
+Варианты для обоих режимов (test_mode 1 и 2) генерируются в фоне
+TestPregenerator'ом при добавлении слова и после каждой тренировки.
+Существующие слова попадают в пул после первой тренировки с ними.
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_migration(session):
+    """Создать таблицу test_pool"""
+
+    query = """
+    CREATE TABLE test_pool (
+        user_id Uint64,
+        word_id Uint64,
+        test_mode Uint32,
+        word Utf8,
+        correct_translation Utf8,
+        wrong_option_1 Utf8,
+        wrong_option_2 Utf8,
+        wrong_option_3 Utf8,
+        created_at Utf8,
+        PRIMARY KEY (user_id, word_id, test_mode)
+    )
+    """
+
+    try:
+        print("Создаём таблицу test_pool...")
+        session.execute_scheme(query)
+        print("✅ Таблица test_pool создана")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Таблица test_pool уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def main():
+    print("🔧 Миграция: таблица test_pool")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: run_migration(session))
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
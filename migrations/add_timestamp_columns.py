@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Миграция: время в колонках Timestamp вместо isoformat-строк Utf8
+
+Время хранилось как datetime.now().isoformat() — локальное, без зоны,
+переменной длины (без микросекунд, если они нулевые). ORDER BY и индексы
+сравнивали строки. Колонку YDB не переименовать и тип не сменить, поэтому
+рядом добавляются колонки *_ts:
+
+  dictionary_words         added_ts, last_reviewed_ts, last_rating_change_ts
+  dictionary_translations  added_ts
+  dictionary_examples      added_ts
+  tests                    created_ts
+  word_test_statistics     last_test_ts
+
+Индекс idx_user_added заменяется на idx_user_added_ts; idx_user_status_added
+удаляется без замены (шаги тренировки отбираются в памяти).
+
+Порядок:
+  1. python migrations/add_timestamp_columns.py — колонки, заполнение, индексы;
+  2. выкладка кода: он пишет *_at и *_ts параллельно, сортирует по *_ts;
+  3. python migrations/add_timestamp_columns.py --restart — повторный полный
+     проход: строки, записанные старым кодом между шагами 1 и 2;
+  4. python migrations/add_timestamp_columns.py --drop-old — удалить старые индексы.
+Utf8-колонки *_at удаляются отдельно, когда код перестанет их писать.
+
+Заполнение идёт по пользователям (строки пользователя — диапазон первичного
+ключа) и продолжается с места остановки: пройденные пользователи сохраняются
+в CHECKPOINT_FILE. Запрос меняет только строки с пустыми *_ts, поэтому повтор
+безопасен. Строки без зоны считаются временем в зоне SOURCE_TZ_OFFSET
+(по умолчанию — зона машины, где запущена миграция; должна совпадать с серверами).
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from datetime import datetime
+
+import ydb
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+SOURCE_TZ_OFFSET = os.getenv('SOURCE_TZ_OFFSET') or datetime.now().astimezone().isoformat()[-6:]
+CHECKPOINT_FILE = os.path.join(tempfile.gettempdir(), 'wordoorio-timestamp-backfill.json')
+
+# Таблица → [(Utf8-колонка, Timestamp-колонка)], ключ строки
+COLUMNS = {
+    'dictionary_words': [('added_at', 'added_ts'), ('last_reviewed_at', 'last_reviewed_ts'),
+                         ('last_rating_change', 'last_rating_change_ts')],
+    'dictionary_translations': [('added_at', 'added_ts')],
+    'dictionary_examples': [('added_at', 'added_ts')],
+    'tests': [('created_at', 'created_ts')],
+    'word_test_statistics': [('last_test_at', 'last_test_ts')],
+}
+KEYS = {
+    'dictionary_words': 'user_id, id',
+    'dictionary_translations': 'user_id, word_id, id',
+    'dictionary_examples': 'user_id, word_id, id',
+    'tests': 'user_id, id',
+    'word_test_statistics': 'user_id, word_id',
+}
+
+NEW_INDEXES = [
+    ('dictionary_words', 'idx_user_added_ts', 'GLOBAL ON (user_id, added_ts)'),
+]
+OLD_INDEXES = [
+    ('dictionary_words', 'idx_user_status_added'),
+    ('dictionary_words', 'idx_user_added'),
+]
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_scheme(session, query: str, description: str):
+    """Выполнить изменение схемы (повторный запуск миграции безопасен)"""
+    try:
+        print(f"{description}...")
+        session.execute_scheme(query)
+        print("✅ Готово")
+    except Exception as e:
+        message = str(e).lower()
+        if "already exists" in message or "duplicate" in message:
+            print("ℹ️ Уже существует")
+        elif "not found" in message or "doesn't exist" in message or "does not exist" in message:
+            print("ℹ️ Уже удалён")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def add_columns(session):
+    """Добавить колонки *_ts"""
+    for table, columns in COLUMNS.items():
+        for _, ts_column in columns:
+            run_scheme(session, f"ALTER TABLE {table} ADD COLUMN {ts_column} Timestamp",
+                       f"Добавляем колонку {table}.{ts_column}")
+
+
+def add_indexes(session):
+    """Построить индексы по *_ts (онлайн)"""
+    for table, name, definition in NEW_INDEXES:
+        run_scheme(session, f"ALTER TABLE {table} ADD INDEX {name} {definition}",
+                   f"Строим индекс {table}.{name}")
+
+
+def drop_old_indexes(session):
+    """Удалить индексы по Utf8-колонкам"""
+    for table, name in OLD_INDEXES:
+        run_scheme(session, f"ALTER TABLE {table} DROP INDEX {name}",
+                   f"Удаляем индекс {table}.{name}")
+
+
+def load_checkpoint() -> dict:
+    """{таблица: [пройденные user_id]} (None — анонимные строки)"""
+    try:
+        with open(CHECKPOINT_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(checkpoint: dict):
+    with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+
+
+def backfill_query(table: str, anonymous: bool) -> str:
+    """Заполнить пустые *_ts строк одного пользователя по их *_at"""
+    columns = COLUMNS[table]
+    owner = "user_id IS NULL" if anonymous else "user_id = $user_id"
+    values = ",\n        ".join(
+        f"COALESCE({ts}, $ts({at})) AS {ts}" for at, ts in columns
+    )
+    missing = " OR ".join(f"({ts} IS NULL AND {at} IS NOT NULL)" for at, ts in columns)
+
+    return f"""
+    DECLARE $user_id AS Uint64?;
+    DECLARE $tz AS Utf8;
+
+    $ts = ($value) -> (DateTime::MakeTimestamp(DateTime::ParseIso8601($value || $tz)));
+
+    UPSERT INTO {table}
+    SELECT
+        {KEYS[table]},
+        {values}
+    FROM {table}
+    WHERE {owner} AND ({missing});
+    """
+
+
+def backfill(pool, restart: bool):
+    """Заполнить *_ts по пользователям с продолжением с места остановки"""
+    checkpoint = {} if restart else load_checkpoint()
+    print(f"Зона строк без смещения: {SOURCE_TZ_OFFSET}")
+
+    for table in COLUMNS:
+        done = set(checkpoint.get(table, []))
+        result_sets = pool.execute_with_retries(f"SELECT DISTINCT user_id FROM {table}")
+        users = [row.user_id for rs in result_sets for row in rs.rows]
+        pending = [user_id for user_id in users if user_id not in done]
+        print(f"{table}: пользователей {len(users)}, осталось {len(pending)}")
+
+        for user_id in pending:
+            pool.execute_with_retries(backfill_query(table, user_id is None), parameters={
+                '$user_id': ydb.TypedValue(user_id, ydb.OptionalType(ydb.PrimitiveType.Uint64)),
+                '$tz': ydb.TypedValue(SOURCE_TZ_OFFSET, ydb.PrimitiveType.Utf8),
+            })
+            done.add(user_id)
+            checkpoint[table] = sorted(done, key=lambda u: (u is not None, u))
+            save_checkpoint(checkpoint)
+
+        print(f"✅ {table} заполнена")
+
+
+def main():
+    args = sys.argv[1:]
+    drop_old = '--drop-old' in args
+    restart = '--restart' in args
+
+    print("🔧 Миграция: колонки Timestamp (*_ts)")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        if drop_old:
+            with ydb.SessionPool(driver) as pool:
+                pool.retry_operation_sync(lambda session: drop_old_indexes(session))
+            print("\n✅ Старые индексы удалены!")
+            return
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: add_columns(session))
+
+        with ydb.QuerySessionPool(driver) as query_pool:
+            backfill(query_pool, restart)
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: add_indexes(session))
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
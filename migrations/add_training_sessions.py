@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Миграция: таблица training_sessions (активные тренировки Telegram-бота)
+
+Материализованные тесты сессии хранятся под коротким токеном из
+callback_data, чтобы воркеры gunicorn видели сессии друг друга.
+Сессии старше суток удаляются TTL по created_at.
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_migration(session):
+    """Создать таблицу training_sessions"""
+
+    query = """
+    CREATE TABLE training_sessions (
+        token Utf8,
+        user_id Uint64,
+        payload Utf8,
+        created_at Timestamp,
+        PRIMARY KEY (token)
+    )
+    WITH (TTL = Interval("P1D") ON created_at)
+    """
+
+    try:
+        print("Создаём таблицу training_sessions...")
+        session.execute_scheme(query)
+        print("✅ Таблица training_sessions создана")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Таблица training_sessions уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def main():
+    print("🔧 Миграция: таблица training_sessions")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: run_migration(session))
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
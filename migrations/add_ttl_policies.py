@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Миграция: TTL для брошенных тестов и анонимных/пустых анализов
+
+  tests     TTL 7 дней по created_ts — тесты брошенных тренировок
+            (раньше удалялись, только когда пользователь начинал новую);
+  analyses  колонка expire_at: у анализов без пользователя или без хайлайтов —
+            дата анализа + 30 дней, TTL удаляет строку в этот момент.
+            Анализ пользователя с хайлайтом expire_at не имеет.
+
+Хайлайты и постинги поиска удалённых анализов подчищает фоновый поток
+core/maintenance.py, он же пересчитывает счётчик analyses.
+
+Запускать после migrations/add_timestamp_columns.py (нужна tests.created_ts;
+тесты с пустой created_ts TTL не удаляет).
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_scheme(session, query: str, description: str):
+    """Выполнить изменение схемы (повторный запуск миграции безопасен)"""
+    try:
+        print(f"{description}...")
+        session.execute_scheme(query)
+        print("✅ Готово")
+    except Exception as e:
+        if "already exists" in str(e).lower() or "duplicate" in str(e).lower():
+            print("ℹ️ Уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def add_column(session):
+    """Добавить колонку analyses.expire_at"""
+    run_scheme(session, """
+    ALTER TABLE analyses ADD COLUMN expire_at Timestamp
+    """, "Добавляем колонку analyses.expire_at")
+
+
+def backfill(pool):
+    """Проставить expire_at существующим анонимным и пустым анализам"""
+
+    query = """
+    UPDATE analyses
+    SET expire_at = analysis_date + Interval("P30D")
+    WHERE (user_id IS NULL OR COALESCE(total_highlights, 0u) = 0u) AND expire_at IS NULL
+    """
+
+    print("Заполняем expire_at для анонимных и пустых анализов...")
+    pool.execute_with_retries(query)
+    print("✅ expire_at заполнен")
+
+
+def set_ttl(session):
+    """Включить TTL"""
+    run_scheme(session, """
+    ALTER TABLE tests SET (TTL = Interval("P7D") ON created_ts)
+    """, "TTL tests: 7 дней по created_ts")
+
+    run_scheme(session, """
+    ALTER TABLE analyses SET (TTL = Interval("PT0S") ON expire_at)
+    """, "TTL analyses: по expire_at")
+
+
+def main():
+    print("🔧 Миграция: TTL для tests и analyses")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: add_column(session))
+
+        with ydb.QuerySessionPool(driver) as query_pool:
+            backfill(query_pool)
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: set_ttl(session))
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
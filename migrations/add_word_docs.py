@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Миграция: документ слова dictionary_words.doc
+
+Карточка слова читалась тремя запросами (слово, переводы, примеры), список
+словаря — двумя подзапросами на каждое слово. Теперь переводы, примеры и их
+количество лежат в колонке doc (JSON) строки слова, её пишет
+DictionaryManager.add_word() в той же транзакции, что и историю.
+
+Миграция добавляет колонку и строит документы существующих слов из
+dictionary_translations / dictionary_examples, страницами по id. Слова,
+которым документ уже записал add_word, не перезаписываются. Код читает
+историю сам, пока у слова нет документа, поэтому миграцию можно запускать
+и до, и после выкладки.
+
+  python migrations/add_word_docs.py            — колонка и документы слов без документа;
+  python migrations/add_word_docs.py --rebuild  — пересобрать документы всех слов
+                                                  (при остановленном приложении).
+"""
+
+import os
+import sys
+import ydb
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import merge_word_doc, dump_word_doc  # noqa: E402
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+PAGE_SIZE = 100
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def add_column(session):
+    """Добавить колонку dictionary_words.doc"""
+    try:
+        print("Добавляем колонку dictionary_words.doc...")
+        session.execute_scheme("ALTER TABLE dictionary_words ADD COLUMN doc Utf8")
+        print("✅ Готово")
+    except Exception as e:
+        if "already exists" in str(e).lower() or "duplicate" in str(e).lower():
+            print("ℹ️ Уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def _doc_rows(docs):
+    """Параметр $docs из [(user_id, id, doc), ...]"""
+    struct_type = ydb.StructType()
+    struct_type.add_member('user_id', ydb.OptionalType(ydb.PrimitiveType.Uint64))
+    struct_type.add_member('id', ydb.OptionalType(ydb.PrimitiveType.Uint64))
+    struct_type.add_member('doc', ydb.OptionalType(ydb.PrimitiveType.Utf8))
+    values = [{'user_id': user_id, 'id': word_id, 'doc': doc} for user_id, word_id, doc in docs]
+    return ydb.TypedValue(values, ydb.ListType(struct_type))
+
+
+def backfill(pool, rebuild: bool):
+    """Документы слов страницами по id"""
+
+    page_query = """
+    DECLARE $last_id AS Uint64;
+
+    SELECT id, user_id, doc IS NULL AS missing
+    FROM dictionary_words VIEW idx_id
+    WHERE id > $last_id
+    ORDER BY id
+    LIMIT %d
+    """ % PAGE_SIZE
+
+    translations_query = """
+    DECLARE $word_ids AS List<Uint64>;
+
+    SELECT id, word_id, translation, source_session_id, added_at
+    FROM dictionary_translations VIEW idx_word_translation
+    WHERE word_id IN $word_ids
+    """
+
+    examples_query = """
+    DECLARE $word_ids AS List<Uint64>;
+
+    SELECT id, word_id, original_form, context, session_id, added_at
+    FROM dictionary_examples VIEW idx_word_example
+    WHERE word_id IN $word_ids
+    """
+
+    # Документ, записанный add_word во время миграции, не перезаписывается
+    write_query = """
+    DECLARE $docs AS List<Struct<user_id: Uint64?, id: Uint64?, doc: Utf8?>>;
+    DECLARE $rebuild AS Bool;
+
+    UPSERT INTO dictionary_words
+    SELECT d.user_id AS user_id, d.id AS id, d.doc AS doc
+    FROM AS_TABLE($docs) AS d
+    INNER JOIN dictionary_words VIEW idx_id AS w ON w.id = d.id
+    WHERE w.doc IS NULL OR $rebuild;
+    """
+
+    print("Строим документы слов" + (" (все слова)" if rebuild else "") + "...")
+    last_id, total = 0, 0
+    while True:
+        rows = pool.execute_with_retries(page_query, parameters={
+            '$last_id': ydb.TypedValue(last_id, ydb.PrimitiveType.Uint64)
+        })[0].rows
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        words = [row for row in rows if rebuild or row.missing]
+        if not words:
+            continue
+
+        word_ids = ydb.TypedValue([row.id for row in words], ydb.ListType(ydb.PrimitiveType.Uint64))
+        translation_rows = [r for rs in pool.execute_with_retries(translations_query, parameters={
+            '$word_ids': word_ids}) for r in rs.rows]
+        example_rows = [r for rs in pool.execute_with_retries(examples_query, parameters={
+            '$word_ids': word_ids}) for r in rs.rows]
+
+        translations, examples = {}, {}
+        for t in sorted(translation_rows, key=lambda r: r.id):
+            translations.setdefault(t.word_id, []).append(
+                {'text': t.translation, 'source_session_id': t.source_session_id, 'added_at': t.added_at})
+        for e in sorted(example_rows, key=lambda r: r.id):
+            examples.setdefault(e.word_id, []).append(
+                {'original_form': e.original_form, 'context': e.context,
+                 'session_id': e.session_id, 'added_at': e.added_at})
+
+        docs = [
+            (row.user_id, row.id, dump_word_doc(merge_word_doc(None, translations.get(row.id, []),
+                                                               examples.get(row.id, []))))
+            for row in words
+        ]
+        pool.execute_with_retries(write_query, parameters={
+            '$docs': _doc_rows(docs),
+            '$rebuild': ydb.TypedValue(rebuild, ydb.PrimitiveType.Bool)
+        })
+        total += len(docs)
+
+    print(f"✅ Документов: {total}")
+
+
+def main():
+    rebuild = '--rebuild' in sys.argv[1:]
+
+    print("🔧 Миграция: документ слова dictionary_words.doc")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: add_column(session))
+
+        with ydb.QuerySessionPool(driver) as query_pool:
+            backfill(query_pool, rebuild)
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
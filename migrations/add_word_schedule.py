@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Миграция: таблица word_schedule (очередь повторений SM-2)
+
+Для каждой пары (user_id, word_id) хранится due_at и параметры SM-2.
+Индекс idx_user_due (user_id, due_at) позволяет выбирать слова на
+тренировку чтением первых N строк вместо сортировки всего словаря.
+
+Слова попадают в очередь после первого ответа (новые слова вводит
+8-шаговый алгоритм), поэтому существующие слова в очередь не ставятся,
+а строки без ответов, созданные прежней версией при добавлении слова
+(due_at = момент добавления), удаляются.
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def create_table(session):
+    """Создать таблицу word_schedule"""
+
+    query = """
+    CREATE TABLE word_schedule (
+        user_id Uint64,
+        word_id Uint64,
+        due_at Timestamp,
+        interval_days Double,
+        ease Double,
+        repetitions Uint32,
+        reviews_seen Uint32,
+        PRIMARY KEY (user_id, word_id),
+        INDEX idx_user_due GLOBAL ON (user_id, due_at)
+    )
+    """
+
+    try:
+        print("Создаём таблицу word_schedule...")
+        session.execute_scheme(query)
+        print("✅ Таблица word_schedule создана")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Таблица word_schedule уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def drop_unreviewed(pool):
+    """Удалить строки расписания слов, по которым ещё не было ответов"""
+
+    query = """
+    DELETE FROM word_schedule
+    WHERE reviews_seen IS NULL OR reviews_seen = 0u
+    """
+
+    print("Удаляем расписание слов без ответов...")
+    pool.execute_with_retries(query)
+    print("✅ Новые слова убраны из очереди повторений")
+
+
+def main():
+    print("🔧 Миграция: таблица word_schedule")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: create_table(session))
+
+        with ydb.QuerySessionPool(driver) as query_pool:
+            drop_unreviewed(query_pool)
+
+        print("\n✅ Миграция завершена!")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
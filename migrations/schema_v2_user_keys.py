@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Миграция: схема v2 — первичные ключи таблиц словаря начинаются с user_id
+
+  dictionary_words         (id)  → (user_id, id), INDEX idx_id ON (id)
+  dictionary_translations  (id)  → (user_id, word_id, id), новая колонка user_id
+  dictionary_examples      (id)  → (user_id, word_id, id), новая колонка user_id
+  tests                    (id)  → (user_id, id), INDEX idx_id ON (id)
+  word_test_statistics     (id)  → (user_id, word_id), колонка id больше не нужна
+
+Строки пользователя лежат подряд, чтения по пользователю становятся
+диапазоном первичного ключа вместо GLOBAL-индекса с дочитыванием строк.
+
+Подходит для баз, созданных и create_ydb_schema.py, и ydb_schema.yql
+(в обеих ключ — id). Порядок:
+  1. создаются таблицы <name>_v2 и данные копируются страницами по id
+     (переводы и примеры получают user_id из dictionary_words, строки
+     удалённых слов не переносятся, дубли статистики суммируются);
+  2. <name> переименовывается в <name>_v1, <name>_v2 — в <name>.
+
+Запускать при остановленном приложении (записи во время копирования
+потеряются) и вместе с выкладкой кода под схему v2. Таблицы <name>_v1
+остаются для отката, удалить их после проверки: DROP TABLE <name>_v1.
+"""
+
+import ydb
+import subprocess
+
+YDB_ENDPOINT = "grpcs://ydb.serverless.yandexcloud.net:2135"
+YDB_DATABASE = "/ru-central1/b1g5sgin5ubfvtkrvjft/etnnib344dr71jrf015e"
+
+PAGE_SIZE = 1000
+
+TABLES_V2 = {
+    'dictionary_words': """
+    CREATE TABLE dictionary_words_v2 (
+        id Uint64,
+        user_id Uint64,
+        lemma Utf8,
+        type Utf8,
+        status Utf8,
+        added_at Utf8,
+        last_reviewed_at Utf8,
+        review_count Uint32,
+        correct_streak Uint32,
+        rating Uint32,
+        last_rating_change Utf8,
+        PRIMARY KEY (user_id, id),
+        INDEX idx_id GLOBAL ON (id),
+        INDEX idx_user_lemma GLOBAL ON (user_id, lemma),
+        INDEX idx_lemma GLOBAL ON (lemma),
+        INDEX idx_status GLOBAL ON (status),
+        INDEX idx_rating GLOBAL ON (rating)
+    )
+    """,
+    'dictionary_translations': """
+    CREATE TABLE dictionary_translations_v2 (
+        id Uint64,
+        user_id Uint64,
+        word_id Uint64,
+        translation Utf8,
+        source_session_id Utf8,
+        added_at Utf8,
+        PRIMARY KEY (user_id, word_id, id),
+        INDEX idx_word_id GLOBAL ON (word_id)
+    )
+    """,
+    'dictionary_examples': """
+    CREATE TABLE dictionary_examples_v2 (
+        id Uint64,
+        user_id Uint64,
+        word_id Uint64,
+        original_form Utf8,
+        context Utf8,
+        session_id Utf8,
+        added_at Utf8,
+        PRIMARY KEY (user_id, word_id, id),
+        INDEX idx_word_id GLOBAL ON (word_id)
+    )
+    """,
+    'tests': """
+    CREATE TABLE tests_v2 (
+        id Uint64,
+        user_id Uint64,
+        word_id Uint64,
+        word Utf8,
+        correct_translation Utf8,
+        wrong_option_1 Utf8,
+        wrong_option_2 Utf8,
+        wrong_option_3 Utf8,
+        test_mode Uint32,
+        created_at Utf8,
+        PRIMARY KEY (user_id, id),
+        INDEX idx_id GLOBAL ON (id)
+    )
+    """,
+    'word_test_statistics': """
+    CREATE TABLE word_test_statistics_v2 (
+        user_id Uint64,
+        word_id Uint64,
+        total_tests Uint32,
+        correct_answers Uint32,
+        wrong_answers Uint32,
+        last_test_at Utf8,
+        last_result Bool,
+        PRIMARY KEY (user_id, word_id)
+    )
+    """,
+}
+
+# Копирование одной страницы: $page — строки старой таблицы с id > $last_id
+COPY_PAGES = {
+    'dictionary_words': """
+    UPSERT INTO dictionary_words_v2
+    SELECT id, user_id, lemma, type, status, added_at, last_reviewed_at, review_count,
+           correct_streak, rating, last_rating_change
+    FROM $page;
+    """,
+    'dictionary_translations': """
+    UPSERT INTO dictionary_translations_v2
+    SELECT p.id AS id, w.user_id AS user_id, p.word_id AS word_id, p.translation AS translation,
+           p.source_session_id AS source_session_id, p.added_at AS added_at
+    FROM $page AS p
+    INNER JOIN dictionary_words AS w ON w.id = p.word_id;
+    """,
+    'dictionary_examples': """
+    UPSERT INTO dictionary_examples_v2
+    SELECT p.id AS id, w.user_id AS user_id, p.word_id AS word_id, p.original_form AS original_form,
+           p.context AS context, p.session_id AS session_id, p.added_at AS added_at
+    FROM $page AS p
+    INNER JOIN dictionary_words AS w ON w.id = p.word_id;
+    """,
+    'tests': """
+    UPSERT INTO tests_v2
+    SELECT id, user_id, word_id, word, correct_translation, wrong_option_1, wrong_option_2,
+           wrong_option_3, test_mode, created_at
+    FROM $page;
+    """,
+}
+
+# Статистика копируется целиком: строки одного (user_id, word_id) суммируются
+COPY_STATISTICS = """
+UPSERT INTO word_test_statistics_v2
+SELECT
+    user_id,
+    word_id,
+    CAST(SUM(total_tests) AS Uint32) AS total_tests,
+    CAST(SUM(correct_answers) AS Uint32) AS correct_answers,
+    CAST(SUM(wrong_answers) AS Uint32) AS wrong_answers,
+    MAX(last_test_at) AS last_test_at,
+    MAX_BY(last_result, last_test_at) AS last_result
+FROM word_test_statistics
+GROUP BY user_id, word_id;
+"""
+
+
+def get_iam_token():
+    """Получить IAM токен из yc CLI"""
+    try:
+        result = subprocess.run(['yc', 'iam', 'create-token'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except Exception as e:
+        print(f"❌ Ошибка получения IAM токена: {e}")
+        return None
+
+
+def run_scheme(session, query: str, description: str):
+    """Выполнить изменение схемы (повторный запуск миграции безопасен)"""
+    try:
+        print(f"{description}...")
+        session.execute_scheme(query)
+        print("✅ Готово")
+    except Exception as e:
+        if "already exists" in str(e).lower():
+            print("ℹ️ Уже существует")
+        else:
+            print(f"❌ Ошибка: {e}")
+            raise
+
+
+def create_tables(session):
+    """Создать таблицы <name>_v2"""
+    for name, query in TABLES_V2.items():
+        run_scheme(session, query, f"Создаём {name}_v2")
+
+
+def copy_table(pool, name: str):
+    """Скопировать таблицу в <name>_v2 страницами по id"""
+    query = """
+    DECLARE $last_id AS Uint64;
+
+    $page = (
+        SELECT * FROM %s
+        WHERE id > $last_id
+        ORDER BY id
+        LIMIT %d
+    );
+
+    SELECT MAX(id) AS last_id, COUNT(*) AS rows FROM $page;
+    """ % (name, PAGE_SIZE) + COPY_PAGES[name]
+
+    print(f"Копируем {name}...")
+    last_id, total = 0, 0
+    while True:
+        row = pool.execute_with_retries(query, parameters={
+            '$last_id': ydb.TypedValue(last_id, ydb.PrimitiveType.Uint64)
+        })[0].rows[0]
+        if row.last_id is None:
+            break
+        last_id = row.last_id
+        total += row.rows
+    print(f"✅ {name}: {total} строк")
+
+
+def copy_data(pool):
+    """Скопировать данные (слова — последними: переводы и примеры читают старую dictionary_words)"""
+    for name in ('dictionary_translations', 'dictionary_examples', 'tests', 'dictionary_words'):
+        copy_table(pool, name)
+
+    print("Копируем word_test_statistics...")
+    pool.execute_with_retries(COPY_STATISTICS)
+    print("✅ word_test_statistics скопирована")
+
+
+def swap_tables(session):
+    """<name> → <name>_v1, <name>_v2 → <name>"""
+    for name in TABLES_V2:
+        run_scheme(session, f"ALTER TABLE `{name}` RENAME TO `{name}_v1`", f"Переименовываем {name} → {name}_v1")
+        run_scheme(session, f"ALTER TABLE `{name}_v2` RENAME TO `{name}`", f"Переименовываем {name}_v2 → {name}")
+
+
+def main():
+    print("🔧 Миграция: схема v2 (ключи таблиц словаря по user_id)")
+    print(f"Endpoint: {YDB_ENDPOINT}")
+    print(f"Database: {YDB_DATABASE}")
+
+    iam_token = get_iam_token()
+    if not iam_token:
+        print("❌ Не удалось получить IAM токен")
+        return
+
+    driver_config = ydb.DriverConfig(
+        endpoint=YDB_ENDPOINT,
+        database=YDB_DATABASE,
+        credentials=ydb.AccessTokenCredentials(iam_token)
+    )
+
+    driver = ydb.Driver(driver_config)
+
+    try:
+        driver.wait(fail_fast=True, timeout=5)
+        print("✅ Подключение установлено")
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: create_tables(session))
+
+        with ydb.QuerySessionPool(driver) as query_pool:
+            copy_data(query_pool)
+
+        with ydb.SessionPool(driver) as pool:
+            pool.retry_operation_sync(lambda session: swap_tables(session))
+
+        print("\n✅ Миграция завершена! Старые таблицы сохранены как *_v1")
+
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        driver.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -180,6 +180,37 @@ async function getDictionaryStats() {
     }
 }
 
+/**
+ * Поиск по словарю при вводе (по началу слова леммы или перевода, ищет сервер)
+ *
+ * @param {string} query - Введённый текст
+ * @param {number} limit - Размер страницы
+ * @param {number} offset - Сколько совпадений пропустить
+ *
+ * @returns {Promise<Object>} {success, matches: [{word_id, lemma, translation, matched}], has_more}
+ */
+async function getTypeahead(query, limit = 50, offset = 0) {
+    try {
+        const params = new URLSearchParams({ q: query, limit: String(limit), offset: String(offset) });
+        const response = await fetch(`/api/dictionary/typeahead?${params}`);
+        const data = await response.json();
+
+        if (!response.ok) {
+            throw new Error(data.error || 'Ошибка подсказок');
+        }
+
+        return data;
+    } catch (error) {
+        console.error('Ошибка getTypeahead:', error);
+        return {
+            success: false,
+            error: error.message,
+            matches: [],
+            has_more: false
+        };
+    }
+}
+
 /**
  * Показать уведомление пользователю
  *
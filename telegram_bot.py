@@ -31,6 +31,7 @@ from dotenv import load_dotenv
 from database import WordoorioDatabase
 from core.training_service import TrainingService
 from core.test_manager import TestManager
+from core.test_pregenerator import get_pregenerator
 from core.yandex_ai_client import YandexAIClient
 
 # Загружаем переменные окружения
@@ -47,7 +48,7 @@ logger = logging.getLogger(__name__)
 db = WordoorioDatabase()
 ai_client = YandexAIClient()
 training_service = TrainingService(db)
-test_manager = TestManager(db, ai_client)
+test_manager = TestManager(db, ai_client, get_pregenerator(db))
 
 # Тестовые аккаунты (синхронизированы с web_app.py)
 TEST_ACCOUNTS = {
@@ -209,27 +210,24 @@ async def start_training(update: Update, context: ContextTypes.DEFAULT_TYPE, use
             return ConversationHandler.END
 
         # 2. Создаем тесты обоих режимов через AI
-        test_ids = await test_manager.create_dual_mode_tests(user_id, words)
+        created_tests = await test_manager.create_dual_mode_tests(user_id, words)
 
-        if not test_ids:
+        if not created_tests:
             await loading_msg.edit_text(
                 "⚠️ Не удалось создать тесты.\n"
                 "Проверь, что у слов есть переводы."
             )
             return ConversationHandler.END
 
-        # 3. Загружаем все тесты с перемешанными вариантами
-        tests = []
-        for test_id in test_ids:
-            test = test_manager.get_test_with_shuffled_options(test_id)
-            if test:
-                tests.append(test)
+        # 3. Загружаем все тесты с перемешанными вариантами и состоянием слов
+        tests = test_manager.build_session_tests(created_tests, words)
 
         if not tests:
             await loading_msg.edit_text("⚠️ Ошибка загрузки тестов.")
             return ConversationHandler.END
 
         # 4. Сохраняем состояние тренировки
+        context.user_data['user_id'] = user_id
         context.user_data['tests'] = tests
         context.user_data['current_index'] = 0
         context.user_data['correct_count'] = 0
@@ -349,7 +347,7 @@ async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Отправляем результат в БД (асинхронно, не блокируем UI)
     try:
-        result = test_manager.submit_answer(test['test_id'], selected_option['text'])
+        result = test_manager.submit_answer(test['test_id'], selected_option['text'], session_test=test)
         new_rating = result.get('new_rating', 0)
         new_status = result.get('new_status', 'learning')
         additional_meanings = result.get('additional_meanings', [])
@@ -461,6 +459,14 @@ async def show_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
 
+    # Пересчитываем очередь повторений по итогам сессии
+    user_id = context.user_data.get('user_id')
+    if user_id:
+        try:
+            training_service.finish_session(user_id)
+        except Exception as e:
+            logger.error(f"Ошибка пересчёта расписания: {e}")
+
     # Очищаем состояние
     context.user_data.clear()
 
@@ -607,6 +613,9 @@ async def show_dictionary(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Формируем список слов
         text = "📚 *Твой словарь* (последние 10 слов)\n\n"
 
+        # Переводы всех слов — одним запросом
+        hydrated = db.hydrate_words([word['id'] for word in words], ['translations'])
+
         for word in words:
             lemma = word.get('lemma', '?')
             status = word.get('status', 'new')
@@ -620,9 +629,9 @@ async def show_dictionary(update: Update, context: ContextTypes.DEFAULT_TYPE):
             else:
                 icon = "🆕"
 
-            # Получаем перевод
-            translation = db.get_translation_for_word(word.get('id'))
-            translation_text = translation if translation else "—"
+            # Основной перевод
+            translations = hydrated[word['id']]['translations']
+            translation_text = translations[0] if translations else "—"
 
             text += f"{icon} *{lemma}* — {translation_text} ({rating}/10)\n"
 
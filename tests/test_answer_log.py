@@ -0,0 +1,48 @@
+"""Тесты AnswerLog: переход состояния слова и ограниченная очередь"""
+
+import pytest
+
+from core.answer_log import AnswerLog, next_word_state, MAX_RATING
+
+
+@pytest.mark.parametrize('status, rating, is_correct, expected', [
+    ('new', 0, True, ('learning', 1)),
+    ('new', 0, False, ('learning', 0)),
+    (None, None, True, ('learning', 1)),
+    ('learning', 4, True, ('learning', 5)),
+    ('learning', 4, False, ('learning', 0)),
+    ('learning', MAX_RATING - 1, True, ('learned', MAX_RATING)),
+    ('learned', MAX_RATING, True, ('learned', MAX_RATING)),
+    ('learned', MAX_RATING, False, ('learning', 0)),
+])
+def test_next_word_state(status, rating, is_correct, expected):
+    assert next_word_state(status, rating, is_correct) == expected
+
+
+class _UnavailableDB:
+    """YDB недоступна: события остаются в очереди"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def apply_answer_events(self, events):
+        self.calls += 1
+        raise ConnectionError('ydb is down')
+
+
+def _test(test_id, word_id=1):
+    return {'user_id': 7, 'word_id': word_id, 'test_id': test_id, 'test_mode': 1, 'status': 'new', 'rating': 0}
+
+
+def test_append_rejects_events_when_queue_is_full(tmp_path):
+    log = AnswerLog(_UnavailableDB(), spool_dir=str(tmp_path), batch_size=100, flush_ms=60000, max_pending=2)
+    try:
+        assert log.append(_test(1), 'кот', True) is not None
+        assert log.append(_test(2), 'кот', True) is not None
+        assert log.append(_test(3), 'кот', True) is None
+        # Отклонённый ответ не меняет состояние слова в процессе
+        assert log.word_state(1) == ('learning', 2)
+        assert log.flush() == -1
+        assert len(log._pending) == 2
+    finally:
+        log.close()
@@ -0,0 +1,86 @@
+"""Тесты признаков DistractorEngine и подбора без ожидания общего словаря"""
+
+import threading
+
+import pytest
+
+import core.distractor_engine as distractor_engine
+from core.distractor_engine import DistractorEngine, length_band, same_stem
+
+
+@pytest.mark.parametrize('text, band', [
+    ('', 0), ('кот', 0), ('порт', 0),
+    ('собака', 1), ('лошадка', 1),
+    ('заоблачный', 2), ('утончённый!', 2),
+    ('достопримечательность', 3), ('run away from', 3),
+])
+def test_length_band(text, band):
+    assert length_band(text) == band
+
+
+@pytest.mark.parametrize('a, b', [
+    ('порог', 'пороги'),
+    ('hinge', 'hinges'),
+    ('книга', 'книги'),
+    ('cat', 'cat'),
+])
+def test_same_stem_matches_forms(a, b):
+    assert same_stem(a, b)
+    assert same_stem(b, a)
+
+
+@pytest.mark.parametrize('a, b', [
+    ('cat', 'car'),        # короткие слова — только полное совпадение
+    ('порог', 'пирог'),    # расходятся раньше последнего символа короткого слова
+    ('hinge', 'hunger'),
+    ('книга', 'кнопка'),
+])
+def test_same_stem_rejects_different_words(a, b):
+    assert not same_stem(a, b)
+
+
+class _VocabularyDB:
+    """Словарь пользователя сразу, общий словарь — только после release"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def get_user_vocabulary(self, user_id):
+        return [{'word_id': i, 'lemma': lemma, 'translation': translation}
+                for i, (lemma, translation) in enumerate(
+                    [('cat', 'кот'), ('dog', 'собака'), ('bird', 'птица'), ('fish', 'рыба'), ('horse', 'лошадь')])]
+
+    def get_global_vocabulary(self, limit):
+        self.release.wait(5)
+        return [{'lemma': f'word{i}', 'translation': f'слово{i}'} for i in range(20)]
+
+
+def test_generate_does_not_wait_for_global_vocabulary(monkeypatch):
+    tagged = []
+
+    def fake_pos_tags(texts, lang):
+        tagged.append(list(texts))
+        return ['NOUN'] * len(texts)
+
+    monkeypatch.setattr(distractor_engine, '_pos_tags', fake_pos_tags)
+
+    db = _VocabularyDB()
+    engine = DistractorEngine(db)
+    words = [{'word': 'cat', 'correct_translation': 'кот', 'word_id': 0},
+             {'word': 'dog', 'correct_translation': 'собака', 'word_id': 1}]
+
+    # Общий словарь ещё строится — варианты только из словаря пользователя
+    options = engine.generate(1, words, test_mode=1)
+    user_translations = {'кот', 'собака', 'птица', 'рыба', 'лошадь'}
+    assert set(options) == {0, 1}
+    assert all(set(picked) <= user_translations for picked in options.values())
+    assert 'кот' not in options[0] and 'собака' not in options[1]
+    # Ответы размечены одним батчем
+    assert ['кот', 'собака'] in tagged
+
+    db.release.set()
+    for thread in threading.enumerate():
+        if thread.name == 'distractor-global':
+            thread.join(5)
+
+    assert len(engine._index(1, 1).texts) == 25
@@ -0,0 +1,76 @@
+"""Тесты декодеров строк результата YDB (core/row_decoding.py)"""
+
+import json
+from datetime import datetime
+
+from core.row_decoding import column_names, rows_as_dicts, rows_as_tuples, rows_as_records, rows_as_json
+
+
+class _Row(dict):
+    """Строка результата как в SDK: dict с доступом через атрибуты"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class _Column:
+    def __init__(self, name):
+        self.name = name
+
+
+class _ResultSet:
+    def __init__(self, columns, rows):
+        self.columns = [_Column(name) for name in columns]
+        self.rows = [_Row(zip(columns, row)) for row in rows]
+
+
+def _result_set():
+    return _ResultSet(('id', 'lemma', 'rating'), [(1, 'run', 3), (2, 'ёж', None)])
+
+
+def test_column_names():
+    assert column_names(_result_set()) == ('id', 'lemma', 'rating')
+
+
+def test_rows_as_dicts_are_independent_copies():
+    result_set = _result_set()
+    rows = rows_as_dicts(result_set)
+
+    assert rows == [{'id': 1, 'lemma': 'run', 'rating': 3}, {'id': 2, 'lemma': 'ёж', 'rating': None}]
+    rows[0]['rating'] = 10
+    assert result_set.rows[0]['rating'] == 3
+    assert type(rows[0]) is dict
+
+
+def test_rows_as_tuples_in_requested_order():
+    result_set = _result_set()
+
+    assert rows_as_tuples(result_set) == [(1, 'run', 3), (2, 'ёж', None)]
+    assert rows_as_tuples(result_set, ('lemma', 'id')) == [('run', 1), ('ёж', 2)]
+    # Одна колонка — тоже кортеж
+    assert rows_as_tuples(result_set, ('id',)) == [(1,), (2,)]
+
+
+def test_rows_as_records():
+    records = rows_as_records(_result_set())
+
+    assert records[0].lemma == 'run'
+    assert records[1].rating is None
+    assert type(records[0]) is type(rows_as_records(_result_set())[1])
+
+    # Имена, недопустимые для namedtuple, переименовываются
+    odd = rows_as_records(_ResultSet(('column0', 'class'), [(1, 2)]))
+    assert tuple(odd[0]) == (1, 2)
+
+
+def test_rows_as_json():
+    assert json.loads(rows_as_json(_result_set())) == [
+        {'id': 1, 'lemma': 'run', 'rating': 3}, {'id': 2, 'lemma': 'ёж', 'rating': None}
+    ]
+    assert 'ёж' in rows_as_json(_result_set())
+
+    dated = _ResultSet(('at',), [(datetime(2026, 1, 2, 3, 4, 5),)])
+    assert json.loads(rows_as_json(dated, default=lambda v: v.isoformat())) == [{'at': '2026-01-02T03:04:05'}]
@@ -0,0 +1,96 @@
+"""Тесты ранжирования SearchIndex"""
+
+import pytest
+
+from core.search_index import SearchIndex, match_kind
+
+
+@pytest.mark.parametrize('text, kind', [
+    ('run', 'exact'),
+    ('runner', 'prefix'),
+    ('outrun', 'infix'),
+    ('ran', None),
+])
+def test_match_kind(text, kind):
+    assert match_kind(text, 'run') == kind
+
+
+class _PostingsDB:
+    """Постинги и анализы в памяти вместо search_index/analyses"""
+
+    def __init__(self, postings, analyses=None):
+        self.postings = postings
+        self.analyses = analyses or {}
+        self.requests = []
+
+    def search_postings(self, scope, key, trigrams, limit):
+        self.requests.append((scope, key, trigrams))
+        return self.postings
+
+    def get_analyses_by_ids(self, analysis_ids):
+        return {i: self.analyses[i] for i in analysis_ids if i in self.analyses}
+
+
+def _posting(word_id, text, analysis_id=0):
+    return {'word_id': word_id, 'analysis_id': analysis_id, 'text': text}
+
+
+def test_words_ranked_exact_prefix_infix_then_length():
+    db = _PostingsDB([
+        _posting(1, 'outrun'),
+        _posting(2, 'running'),
+        _posting(3, 'runner'),
+        _posting(4, 'run'),
+        _posting(5, 'walk'),  # триграммы совпали, подстроки нет
+    ])
+
+    result = SearchIndex(db).search(7, '  RUN ', limit=10)
+
+    assert [(w['word_id'], w['match']) for w in result['words']] == [
+        (4, 'exact'), (3, 'prefix'), (2, 'prefix'), (1, 'infix')
+    ]
+    assert db.requests == [('user:7', 'run', ['run'])]
+
+
+def test_best_match_per_word_and_limit():
+    db = _PostingsDB([
+        _posting(1, 'outrun'),
+        _posting(1, 'run'),
+        _posting(2, 'runway'),
+    ])
+
+    words = SearchIndex(db).search(None, 'run', limit=1)['words']
+
+    assert words == [{'word_id': 1, 'lemma': 'run', 'match': 'exact'}]
+    assert db.requests[0][0] == 'anonymous'
+
+
+def test_analyses_ranked_by_match_then_date():
+    db = _PostingsDB(
+        [
+            _posting(1, 'outrun', analysis_id=10),
+            _posting(2, 'run', analysis_id=11),
+            _posting(3, 'runner', analysis_id=12),
+            _posting(4, 'runner', analysis_id=13),
+            _posting(5, 'run', analysis_id=14),  # анализ удалён
+        ],
+        {
+            10: {'original_text': 'a', 'analysis_date': '2026-01-03'},
+            11: {'original_text': 'b', 'analysis_date': '2026-01-01'},
+            12: {'original_text': 'c', 'analysis_date': '2026-01-01'},
+            13: {'original_text': 'd', 'analysis_date': '2026-01-02'},
+        }
+    )
+
+    results = SearchIndex(db).search(7, 'run')['results']
+
+    assert [(r['analysis_id'], r['match']) for r in results] == [
+        (11, 'exact'), (13, 'prefix'), (12, 'prefix'), (10, 'infix')
+    ]
+    assert results[0]['highlight_word'] == 'run'
+
+
+def test_empty_query_skips_lookup():
+    db = _PostingsDB([])
+    assert SearchIndex(db).search(7, '   ') == {'words': [], 'results': []}
+    assert db.requests == []
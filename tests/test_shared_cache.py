@@ -0,0 +1,81 @@
+"""Тесты SharedCache: TTL, вытеснение давно не читанных записей, лимит записи"""
+
+import pytest
+
+import core.shared_cache as shared_cache
+from core.shared_cache import SharedCache, TOUCH_SECONDS
+
+
+class _Clock:
+    """Подменяет модуль time в core.shared_cache"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(shared_cache, 'time', clock)
+    return clock
+
+
+def _cache(tmp_path, **kwargs):
+    return SharedCache(path=str(tmp_path / 'cache.sqlite3'), **kwargs)
+
+
+def test_get_set_and_ttl(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.set('agent', 'long input text', {'options': ['a', 'b']}, ttl_seconds=60)
+
+    assert cache.get('agent', 'long input text') == {'options': ['a', 'b']}
+    assert cache.get('dictionary', 'long input text') is None
+
+    clock.now += 61
+    assert cache.get('agent', 'long input text') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_evict_removes_expired_entries(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.set('ns', 'short', 1, ttl_seconds=10)
+    cache.set('ns', 'long', 2, ttl_seconds=100)
+
+    clock.now += 50
+    assert cache.evict() == 1
+    assert cache.get('ns', 'long') == 2
+
+
+def test_evict_removes_least_recently_read_over_limit(tmp_path, clock):
+    value = 'x' * 98  # 100 байт в JSON
+    cache = _cache(tmp_path, max_bytes=350)
+    for key in ('a', 'b', 'c'):
+        cache.set('ns', key, value, ttl_seconds=3600)
+        clock.now += 1
+
+    # Чтение обновляет время доступа не чаще раза в TOUCH_SECONDS
+    clock.now += TOUCH_SECONDS + 1
+    assert cache.get('ns', 'a') == value
+    cache.set('ns', 'd', value, ttl_seconds=3600)
+
+    # 400 байт > 350: до 90% лимита (315 байт) освобождает одна запись —
+    # самая давно читанная, b (a прочитана позже)
+    assert cache.evict() == 1
+    assert cache.get('ns', 'a') == value
+    assert cache.get('ns', 'b') is None
+    assert cache.get('ns', 'c') == value
+    assert cache.get('ns', 'd') == value
+    assert cache.stats()['evictions'] == 1
+
+
+def test_items_over_max_item_are_not_stored(tmp_path, clock):
+    cache = _cache(tmp_path, max_item=10)
+    cache.set('ns', 'big', 'x' * 20, ttl_seconds=60)
+    cache.set('ns', 'small', 'x', ttl_seconds=60)
+
+    assert cache.get('ns', 'big') is None
+    assert cache.get('ns', 'small') == 'x'
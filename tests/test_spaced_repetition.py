@@ -0,0 +1,85 @@
+"""Тесты SM-2 (sm2_schedule) и политики расписания новых слов"""
+
+import time
+
+import numpy as np
+import pytest
+
+from core.spaced_repetition import (
+    sm2_schedule, SpacedRepetitionScheduler, DEFAULT_EASE, MIN_EASE, SECONDS_PER_DAY, MICROSECONDS
+)
+
+
+def _step(reviewed, correct, repetitions, interval_days, ease):
+    return sm2_schedule(np.array(reviewed), np.array(correct), np.array(repetitions),
+                        np.array(interval_days, dtype=np.float64), np.array(ease, dtype=np.float64))
+
+
+def test_correct_answers_grow_interval():
+    first = _step([True], [True], [0], [0.0], [DEFAULT_EASE])
+    assert first['repetitions'][0] == 1
+    assert first['interval_days'][0] == 1.0
+    assert first['ease'][0] == pytest.approx(DEFAULT_EASE + 0.1)
+
+    second = _step([True], [True], first['repetitions'], first['interval_days'], first['ease'])
+    assert second['repetitions'][0] == 2
+    assert second['interval_days'][0] == 6.0
+
+    third = _step([True], [True], second['repetitions'], second['interval_days'], second['ease'])
+    assert third['repetitions'][0] == 3
+    assert third['interval_days'][0] == np.round(6.0 * third['ease'][0])
+
+
+def test_wrong_answer_resets_repetitions_and_lowers_ease():
+    result = _step([True], [False], [4], [20.0], [DEFAULT_EASE])
+    assert result['repetitions'][0] == 0
+    assert result['interval_days'][0] == 1.0
+    assert result['ease'][0] == pytest.approx(DEFAULT_EASE + 0.1 - 3 * (0.08 + 3 * 0.02))
+
+
+def test_ease_never_drops_below_minimum():
+    result = _step([True], [False], [0], [1.0], [MIN_EASE])
+    assert result['ease'][0] == MIN_EASE
+
+
+def test_unreviewed_words_keep_their_values():
+    result = _step([False, True], [False, True], [3, 0], [15.0, 0.0], [2.0, DEFAULT_EASE])
+    assert result['repetitions'][0] == 3
+    assert result['interval_days'][0] == 15.0
+    assert result['ease'][0] == 2.0
+    assert result['repetitions'][1] == 1
+
+
+class _ScheduleDB:
+    """Минимальная замена WordoorioDatabase для reschedule_user"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.upserted = None
+
+    def get_schedule_inputs(self, user_id):
+        return self.rows
+
+    def upsert_schedule(self, rows):
+        self.upserted = rows
+
+
+def test_reschedule_skips_words_without_answers():
+    db = _ScheduleDB([
+        # Новое слово без расписания и без ответов — в очередь не попадает
+        {'word_id': 1, 'total_tests': 0},
+        # Первый ответ — расписание по SM-2 с параметрами по умолчанию
+        {'word_id': 2, 'total_tests': 1, 'last_result': True},
+        # Уже учтённые ответы — без изменений
+        {'word_id': 3, 'total_tests': 2, 'reviews_seen': 2, 'ease': 2.5, 'repetitions': 2,
+         'interval_days': 6.0, 'due_at': 10 * MICROSECONDS},
+    ])
+
+    started = time.time()
+    assert SpacedRepetitionScheduler(db).reschedule_user(7) == 1
+    [update] = db.upserted
+    assert update['word_id'] == 2
+    assert update['repetitions'] == 1
+    assert update['reviews_seen'] == 1
+    assert update['interval_days'] == 1.0
+    assert (started + SECONDS_PER_DAY) * MICROSECONDS <= update['due_at'] <= (time.time() + SECONDS_PER_DAY) * MICROSECONDS
@@ -0,0 +1,67 @@
+"""Тесты Typeahead: поиск префикса bisect'ом, страницы, LRU и сброс индекса"""
+
+from core.typeahead import Typeahead, _UserTypeahead, word_starts
+
+ROWS = [
+    (1, 'run away', 'убегать'),
+    (1, 'run away', 'сбежать'),
+    (2, 'Runner', 'бегун'),
+    (3, 'away', 'прочь'),
+    (4, 'ёж', None),
+]
+
+
+def test_word_starts():
+    assert word_starts('run away now') == ['run away now', 'away now', 'now']
+    assert word_starts('run') == ['run']
+
+
+def test_lookup_matches_lemma_and_translation_word_starts():
+    index = _UserTypeahead(ROWS)
+
+    assert [(m['word_id'], m['matched']) for m in index.lookup('aw', 10)] == [(3, 'lemma'), (1, 'lemma')]
+    assert index.lookup('бег', 10) == [
+        {'word_id': 2, 'lemma': 'Runner', 'translation': 'бегун', 'matched': 'translation'}
+    ]
+    assert index.lookup('zzz', 10) == []
+    # Ключи нормализованы: регистр и ё
+    assert [m['word_id'] for m in index.lookup('runn', 10)] == [2]
+    assert [m['word_id'] for m in index.lookup('еж', 10)] == [4]
+
+
+def test_lookup_pages_by_word():
+    index = _UserTypeahead(ROWS)
+
+    pages = [index.lookup('ru', 1, offset) for offset in range(3)]
+
+    assert [[m['word_id'] for m in page] for page in pages] == [[1], [2], []]
+
+
+class _TypeaheadDB:
+    def __init__(self):
+        self.loads = 0
+
+    def get_typeahead_rows(self, user_id):
+        self.loads += 1
+        return [(user_id, f'word{user_id}', None)]
+
+
+def test_indexes_are_cached_evicted_and_invalidated():
+    db = _TypeaheadDB()
+    typeahead = Typeahead(db, max_users=2)
+
+    assert typeahead.suggest(1, 'Word', 5)[0]['word_id'] == 1
+    typeahead.suggest(1, 'word', 5)
+    assert db.loads == 1
+
+    typeahead.suggest(2, 'word', 5)
+    typeahead.suggest(3, 'word', 5)  # вытесняет пользователя 1
+    typeahead.suggest(1, 'word', 5)
+    assert db.loads == 4
+
+    typeahead.invalidate(1)
+    typeahead.suggest(1, 'word', 5)
+    assert db.loads == 5
+
+    assert typeahead.suggest(1, '   ', 5) == []
+    assert db.loads == 5
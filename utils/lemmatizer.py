@@ -155,6 +155,45 @@ def lemmatize_russian(text: str) -> str:
         return text.strip()
 
 
+# Грубые части речи pymorphy2 → теги в стиле spaCy (общие для обоих языков)
+_RUSSIAN_POS = {
+    'NOUN': 'NOUN',
+    'VERB': 'VERB', 'INFN': 'VERB', 'GRND': 'VERB',
+    'ADJF': 'ADJ', 'ADJS': 'ADJ', 'PRTF': 'ADJ', 'PRTS': 'ADJ', 'COMP': 'ADJ',
+    'ADVB': 'ADV',
+}
+
+
+def english_pos_tags(texts: list) -> list:
+    """
+    Часть речи первого токена для списка английских слов/фраз (spaCy, батчем)
+
+    Returns:
+        Список тегов spaCy ('NOUN', 'VERB', 'ADJ', ...), '' для пустых строк
+    """
+    nlp = _get_nlp()
+    return [doc[0].pos_ if len(doc) else '' for doc in nlp.pipe(texts)]
+
+
+def russian_pos_tags(texts: list) -> list:
+    """
+    Часть речи первого слова для списка русских слов/фраз (pymorphy2)
+
+    Returns:
+        Список тегов в стиле spaCy ('NOUN', 'VERB', 'ADJ', 'ADV'), иначе 'X'
+    """
+    morph = _get_morph()
+    tags = []
+    for text in texts:
+        words = text.split()
+        if not words:
+            tags.append('')
+            continue
+        pos = morph.parse(words[0])[0].tag.POS
+        tags.append(_RUSSIAN_POS.get(pos, 'X'))
+    return tags
+
+
 # Тесты для проверки
 if __name__ == "__main__":
     print("🧪 Тестируем лемматизатор...\n")
@@ -12,6 +12,7 @@ import time
 from datetime import timedelta
 from dotenv import load_dotenv
 from database import WordoorioDatabase
+from core.row_decoding import rows_as_json
 import uuid
 
 # Загружаем переменные окружения
@@ -45,6 +46,14 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 # Инициализируем базу данных
 db = WordoorioDatabase()
 
+# Фоновое обслуживание таблиц (хайлайты анализов, удалённых по TTL)
+from core.maintenance import get_maintenance
+get_maintenance(db)
+
+# Сброс кэшей процесса по записям других воркеров/инстансов (changefeed YDB)
+from core.cache_invalidation import get_cache_invalidation
+get_cache_invalidation(db)
+
 @app.route('/')
 def index():
     """Главная страница"""
@@ -55,11 +64,11 @@ def get_history():
     """API для получения истории анализов"""
     try:
         limit = request.args.get('limit', 10, type=int)
-        analyses = db.get_recent_analyses(limit)
-        return jsonify({
-            'success': True,
-            'analyses': analyses
-        })
+        # Строки анализа сериализуются сразу из результата YDB, без копий в dict
+        analyses = db.get_recent_analyses(
+            limit, decode=lambda result_set: rows_as_json(result_set, default=app.json.default))
+        return app.response_class('{"success":true,"analyses":' + analyses + '}',
+                                  mimetype='application/json')
     except Exception as e:
         return jsonify({'error': f'Ошибка получения истории: {str(e)}'})
 
@@ -80,17 +89,24 @@ def get_analysis(analysis_id):
 
 @app.route('/api/search', methods=['GET'])
 def search_word():
-    """API для поиска по словам"""
+    """
+    API для поиска по словарю и анализам пользователя
+
+    Ищет только в данных пользователя из сессии; без входа — в общем
+    анонимном словаре (scope 'anonymous'), не по анализам всех пользователей.
+    """
     try:
         word = request.args.get('word', '').strip()
         if not word:
             return jsonify({'error': 'Поисковый запрос не может быть пустым'})
         
-        results = db.search_by_word(word)
+        from core.search_index import get_search_index
+        found = get_search_index(db).search(session.get('user_id'), word)
         return jsonify({
             'success': True,
             'word': word,
-            'results': results
+            'words': found['words'],
+            'results': found['results']
         })
     except Exception as e:
         return jsonify({'error': f'Ошибка поиска: {str(e)}'})
@@ -256,6 +272,14 @@ def api_dictionary_add():
 
         logger.info(f"[/api/dictionary/add] Словарь: success={result.get('success')}, word_id={result.get('word_id')}")
 
+        # Фоновая генерация вариантов для тестов (тренировка стартует без ожидания AI)
+        if result.get('success') and result.get('is_new') and result.get('word_id'):
+            try:
+                from core.test_pregenerator import get_pregenerator
+                get_pregenerator(db).enqueue(user_id, [result['word_id']])
+            except Exception as pregen_error:
+                logger.warning(f"[/api/dictionary/add] Не удалось запустить предгенерацию тестов: {pregen_error}")
+
         # 2. Также сохраняем в analyses + highlights (для истории)
         try:
             # Получаем word_id из результата добавления в словарь
@@ -294,7 +318,7 @@ def api_dictionary_add():
                 logger.info(f"[/api/dictionary/add] Найден существующий analysis #{analysis_id} (session_id={analysis.get('session_id')})")
 
             # Добавляем highlight (с word_id) к analysis
-            db.add_highlight_to_analysis(analysis_id, word_id, user_id, session_id)
+            db.add_highlight_to_analysis(analysis_id, word_id, user_id, session_id, lemma=result.get('lemma'))
             logger.info(f"[/api/dictionary/add] Добавлен highlight word_id={word_id} к analysis #{analysis_id}")
 
             result['analysis_id'] = analysis_id
@@ -643,6 +667,49 @@ def api_dictionary_stats():
         }), 500
 
 
+@app.route('/api/dictionary/typeahead', methods=['GET'])
+def api_dictionary_typeahead():
+    """
+    API поиска по словарю при вводе (по началу слова леммы или перевода)
+
+    Query параметры:
+    - q: введённый текст
+    - limit: размер страницы (по умолчанию 10, не больше 50)
+    - offset: сколько совпадений пропустить (по умолчанию 0)
+    """
+    try:
+        from core.typeahead import get_typeahead
+
+        query = request.args.get('q', '')
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        user_id = session.get('user_id')
+        if not user_id or not query.strip():
+            return jsonify({
+                'success': True,
+                'matches': [],
+                'has_more': False
+            })
+
+        # Одно лишнее совпадение показывает, есть ли следующая страница
+        matches = get_typeahead(db).suggest(user_id, query, limit + 1, offset)
+
+        return jsonify({
+            'success': True,
+            'matches': matches[:limit],
+            'has_more': len(matches) > limit
+        })
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': f'Ошибка подсказок: {str(e)}'
+        }), 500
+
+
 # ===== HIGHLIGHTS API =====
 
 @app.route('/api/highlights', methods=['GET'])
@@ -934,6 +1001,101 @@ def telegram_answer_callback(callback_query_id: str):
         pass
 
 
+def telegram_finish_training(telegram_id: int, token: str = None):
+    """Пересчитать очередь повторений после завершения тренировки в Telegram"""
+    try:
+        from core.training_service import TrainingService
+
+        user = db.get_user_by_telegram_id(telegram_id)
+        if user:
+            TrainingService(db).finish_session(user['id'], token=token)
+    except Exception as e:
+        logger.error(f"[TG] Ошибка пересчёта расписания: {e}")
+
+
+def telegram_answer_text(result: dict, test: dict) -> str:
+    """Текст сообщения с результатом ответа (при ошибке — с примером из текста)"""
+    # Списки фраз для разнообразия
+    import random as rnd
+    correct_phrases = [
+        "Правильно!", "Верно!", "Отлично!", "Точно!",
+        "Так держать!", "В точку!", "Супер!"
+    ]
+    wrong_phrases = [
+        "Неверно", "Мимо", "Увы, нет", "Ошибка"
+    ]
+
+    if result['is_correct']:
+        phrase = rnd.choice(correct_phrases)
+        text = f"✅ {phrase}\n\n"
+        text += f"*{result['word']} — {result['correct_translation']}*\n\n"
+        text += f"рейтинг слова: {result['new_rating']}/10"
+    else:
+        phrase = rnd.choice(wrong_phrases)
+        text = f"🛑 {phrase}\n\n"
+        text += f"*{result['word']} — {result['correct_translation']}*\n\n"
+
+        # Хайлайт: у тестов из сессии пример уже загружен build_session_tests()
+        if 'example' in test:
+            example = test['example']
+        else:
+            example = db.hydrate_words([test['word_id']], ['example'])[test['word_id']]['example']
+        if example and example.get('context'):
+            context = example['context']
+            # Подсвечиваем слово КАПСОМ (вложенное форматирование не работает в Markdown)
+            original_form = example.get('original_form', result['word'])
+            if original_form and original_form in context:
+                context = context.replace(original_form, original_form.upper())
+            text += f"_{context}_\n\n"
+
+        text += f"рейтинг слова: 0/10"
+
+    return text
+
+
+def telegram_send_summary(chat_id: int, message_id: int, correct: int, wrong: int, total: int):
+    """Показать итоговую статистику тренировки"""
+    accuracy = round(correct / total * 100) if total > 0 else 0
+
+    # Заголовок в зависимости от результата
+    if accuracy == 100:
+        header = "🏆 Безупречно!"
+    elif accuracy >= 75:
+        header = "🔥 Отличный результат!"
+    elif accuracy >= 50:
+        header = "👍 Хорошо!"
+    else:
+        header = "💪 Есть над чем поработать"
+
+    text = (
+        f"{header}\n\n"
+        f"Верно: {correct}\n"
+        f"Ошибок: {wrong}\n"
+        f"Точность: {accuracy}%"
+    )
+    keyboard = {'inline_keyboard': [[{'text': 'ДАВАЙ ЕЩЁ', 'callback_data': 'start_training'}]]}
+    telegram_edit_message(chat_id, message_id, text, reply_markup=keyboard)
+
+
+def telegram_send_expired(chat_id: int, message_id: int):
+    """Сессия тренировки не найдена (устарела или завершена)"""
+    keyboard = {'inline_keyboard': [[{'text': 'Начать заново', 'callback_data': 'start_training'}]]}
+    telegram_edit_message(chat_id, message_id, "Тренировка устарела. Начни новую.", reply_markup=keyboard)
+
+
+def telegram_start_session(chat_id: int, message_id: int, user_id: int, test_manager, created_tests: list, words: list):
+    """Материализовать тесты в TrainingSessionStore и показать первый"""
+    from core.session_store import get_session_store
+
+    tests = test_manager.build_session_tests(created_tests, words)
+    if not tests:
+        telegram_edit_message(chat_id, message_id, "Не удалось создать тесты. Попробуй ещё раз.")
+        return
+
+    token = get_session_store(db).create(user_id, tests)
+    send_session_test(chat_id, message_id, token, tests[0], 0, 0, 0)
+
+
 @app.route('/telegram/webhook', methods=['POST'])
 def telegram_webhook():
     """
@@ -1056,23 +1218,24 @@ def telegram_webhook():
                                 animation_thread = threading.Thread(target=animate_loading, daemon=True)
                                 animation_thread.start()
 
+                                from core.test_pregenerator import get_pregenerator
                                 ai_client = YandexAIClient()
-                                test_manager = TestManager(db, ai_client)
+                                test_manager = TestManager(db, ai_client, get_pregenerator(db))
                                 loading_phase['text'] = 'Генерируем тесты'
 
                                 loop = asyncio.new_event_loop()
                                 asyncio.set_event_loop(loop)
-                                test_ids = loop.run_until_complete(test_manager.create_tests_batch(user_id, words))
+                                created_tests = loop.run_until_complete(test_manager.create_tests_batch(user_id, words))
                                 loop.close()
 
                                 loading_done.set()
                                 animation_thread.join(timeout=0.5)
 
-                                if not test_ids:
+                                if not created_tests:
                                     keyboard = {'inline_keyboard': [[{'text': '🔄 Попробовать снова', 'callback_data': 'start_training'}]]}
                                     telegram_edit_message(chat_id, message_id, "Не удалось создать тесты.", reply_markup=keyboard)
                                 else:
-                                    send_telegram_test(chat_id, message_id, test_manager, test_ids[0], 0, len(test_ids), 0, 0)
+                                    telegram_start_session(chat_id, message_id, user_id, test_manager, created_tests, words)
                         except Exception as e:
                             logger.error(f"[TG /train] Ошибка: {e}", exc_info=True)
                             keyboard = {'inline_keyboard': [[{'text': '🔄 Попробовать снова', 'callback_data': 'start_training'}]]}
@@ -1150,29 +1313,29 @@ def telegram_webhook():
                     animation_thread.start()
 
                     # Этап 1: Подключаем сервисы
+                    from core.test_pregenerator import get_pregenerator
                     ai_client = YandexAIClient()
-                    test_manager = TestManager(db, ai_client)
+                    test_manager = TestManager(db, ai_client, get_pregenerator(db))
 
                     # Этап 2: Генерируем тесты
                     loading_phase['text'] = 'Генерируем тесты'
 
                     loop = asyncio.new_event_loop()
                     asyncio.set_event_loop(loop)
-                    test_ids = loop.run_until_complete(test_manager.create_tests_batch(user_id, words))
+                    created_tests = loop.run_until_complete(test_manager.create_tests_batch(user_id, words))
                     loop.close()
 
                     # Останавливаем анимацию
                     loading_done.set()
                     animation_thread.join(timeout=0.5)
-                    logger.info(f"[TG Webhook] Создано тестов: {len(test_ids) if test_ids else 0}")
+                    logger.info(f"[TG Webhook] Создано тестов: {len(created_tests) if created_tests else 0}")
 
-                    if not test_ids:
+                    if not created_tests:
                         telegram_edit_message(chat_id, message_id, "Не удалось создать тесты. Попробуй ещё раз.")
                         return jsonify({'ok': True})
 
-                    # Отправляем первый тест (idx=0, total=len, correct=0, wrong=0)
-                    total = len(test_ids)
-                    send_telegram_test(chat_id, message_id, test_manager, test_ids[0], 0, total, 0, 0)
+                    # Материализуем тесты в сессию и отправляем первый
+                    telegram_start_session(chat_id, message_id, user_id, test_manager, created_tests, words)
 
                 except Exception as e:
                     import traceback
@@ -1185,7 +1348,75 @@ def telegram_webhook():
                         reply_markup=keyboard
                     )
 
-            # a_{test_id}_{opt}_{idx}_{total}_{correct}_{wrong} (ответ на тест)
+            # a:{token}:{idx}:{opt}:{correct}:{wrong} (ответ на тест из сессии)
+            elif data.startswith('a:'):
+                parts = data.split(':')
+                if len(parts) == 6:
+                    token = parts[1]
+                    idx, option_idx, correct, wrong = (int(p) for p in parts[2:])
+
+                    from core.session_store import get_session_store
+                    from core.test_manager import TestManager
+
+                    store = get_session_store(db)
+                    training_session = store.get(token)
+                    if not training_session or idx >= len(training_session['tests']):
+                        telegram_send_expired(chat_id, message_id)
+                        return jsonify({'ok': True})
+
+                    test = training_session['tests'][idx]
+                    selected = next((opt['text'] for opt in test['options'] if opt['index'] == option_idx), None)
+                    if not selected:
+                        telegram_edit_message(chat_id, message_id, "Вариант не найден")
+                        return jsonify({'ok': True})
+
+                    if not store.claim_answer(token, test):
+                        # Повторное нажатие или дубль callback'а — ответ уже засчитан
+                        return jsonify({'ok': True})
+
+                    # Проверка и все обновления — одна транзакция YDB
+                    test_manager = TestManager(db, None)
+                    try:
+                        result = test_manager.submit_answer(test['test_id'], selected, session_test=test)
+                    except Exception:
+                        store.release_answer(token, test)
+                        raise
+
+                    if result['is_correct']:
+                        correct += 1
+                    else:
+                        wrong += 1
+                    text = telegram_answer_text(result, test)
+
+                    keyboard = {'inline_keyboard': [[{'text': 'Дальше', 'callback_data': f'n:{token}:{idx}:{correct}:{wrong}'}]]}
+                    telegram_edit_message(chat_id, message_id, text, reply_markup=keyboard)
+
+            # n:{token}:{idx}:{correct}:{wrong} (следующий тест из сессии)
+            elif data.startswith('n:'):
+                parts = data.split(':')
+                if len(parts) == 5:
+                    token = parts[1]
+                    idx, correct, wrong = (int(p) for p in parts[2:])
+
+                    from core.session_store import get_session_store
+
+                    store = get_session_store(db)
+                    training_session = store.get(token)
+                    if not training_session:
+                        telegram_send_expired(chat_id, message_id)
+                        return jsonify({'ok': True})
+
+                    tests = training_session['tests']
+                    new_idx = idx + 1
+
+                    if new_idx >= len(tests):
+                        telegram_finish_training(telegram_id, token)
+                        store.delete(token)
+                        telegram_send_summary(chat_id, message_id, correct, wrong, len(tests))
+                    else:
+                        send_session_test(chat_id, message_id, token, tests[new_idx], new_idx, correct, wrong)
+
+            # a_{test_id}_{opt}_{idx}_{total}_{correct}_{wrong} (ответ на тест, старые сообщения)
             elif data.startswith('a_'):
                 parts = data.split('_')
                 # Формат: a_{test_id}_{opt}_{idx}_{total}_{correct}_{wrong}
@@ -1223,47 +1454,19 @@ def telegram_webhook():
                     # Проверяем ответ
                     result = test_manager.submit_answer(test_id, selected)
 
-                    # Списки фраз для разнообразия
-                    import random as rnd
-                    correct_phrases = [
-                        "Правильно!", "Верно!", "Отлично!", "Точно!",
-                        "Так держать!", "В точку!", "Супер!"
-                    ]
-                    wrong_phrases = [
-                        "Неверно", "Мимо", "Увы, нет", "Ошибка"
-                    ]
-
                     # Обновляем статистику
                     if result['is_correct']:
                         correct += 1
-                        phrase = rnd.choice(correct_phrases)
-                        text = f"✅ {phrase}\n\n"
-                        text += f"*{result['word']} — {result['correct_translation']}*\n\n"
-                        text += f"рейтинг слова: {result['new_rating']}/10"
                     else:
                         wrong += 1
-                        phrase = rnd.choice(wrong_phrases)
-                        text = f"🛑 {phrase}\n\n"
-                        text += f"*{result['word']} — {result['correct_translation']}*\n\n"
-
-                        # Получаем хайлайт
-                        example = db.get_word_example(test['word_id'])
-                        if example and example.get('context'):
-                            context = example['context']
-                            # Подсвечиваем слово КАПСОМ (вложенное форматирование не работает в Markdown)
-                            original_form = example.get('original_form', result['word'])
-                            if original_form and original_form in context:
-                                context = context.replace(original_form, original_form.upper())
-                            text += f"_{context}_\n\n"
-
-                        text += f"рейтинг слова: 0/10"
+                    text = telegram_answer_text(result, test)
 
                     # Кнопка "Дальше" с состоянием сессии
                     # Формат: n_{idx}_{total}_{correct}_{wrong}
                     keyboard = {'inline_keyboard': [[{'text': 'Дальше', 'callback_data': f'n_{idx}_{total}_{correct}_{wrong}'}]]}
                     telegram_edit_message(chat_id, message_id, text, reply_markup=keyboard)
 
-            # n_{idx}_{total}_{correct}_{wrong} (следующий тест)
+            # n_{idx}_{total}_{correct}_{wrong} (следующий тест, старые сообщения)
             elif data.startswith('n_'):
                 parts = data.split('_')
                 # Формат: n_{idx}_{total}_{correct}_{wrong}
@@ -1277,27 +1480,8 @@ def telegram_webhook():
 
                     # Проверяем закончились ли тесты
                     if new_idx >= total:
-                        # Показываем итоговую статистику
-                        accuracy = round(correct / total * 100) if total > 0 else 0
-
-                        # Заголовок в зависимости от результата
-                        if accuracy == 100:
-                            header = "🏆 Безупречно!"
-                        elif accuracy >= 75:
-                            header = "🔥 Отличный результат!"
-                        elif accuracy >= 50:
-                            header = "👍 Хорошо!"
-                        else:
-                            header = "💪 Есть над чем поработать"
-
-                        text = (
-                            f"{header}\n\n"
-                            f"Верно: {correct}\n"
-                            f"Ошибок: {wrong}\n"
-                            f"Точность: {accuracy}%"
-                        )
-                        keyboard = {'inline_keyboard': [[{'text': 'ДАВАЙ ЕЩЁ', 'callback_data': 'start_training'}]]}
-                        telegram_edit_message(chat_id, message_id, text, reply_markup=keyboard)
+                        telegram_finish_training(telegram_id)
+                        telegram_send_summary(chat_id, message_id, correct, wrong, total)
                     else:
                         # Показываем следующий тест
                         user = db.get_user_by_telegram_id(telegram_id)
@@ -1313,26 +1497,8 @@ def telegram_webhook():
                         pending = test_manager.get_pending_tests(user['id'])
                         if not pending:
                             # Нет тестов — показываем итоги
-                            accuracy = round(correct / total * 100) if total > 0 else 0
-
-                            # Заголовок в зависимости от результата
-                            if accuracy == 100:
-                                header = "🏆 Безупречно!"
-                            elif accuracy >= 75:
-                                header = "🔥 Отличный результат!"
-                            elif accuracy >= 50:
-                                header = "👍 Хорошо!"
-                            else:
-                                header = "💪 Есть над чем поработать"
-
-                            text = (
-                                f"{header}\n\n"
-                                f"Верно: {correct}\n"
-                                f"Ошибок: {wrong}\n"
-                                f"Точность: {accuracy}%"
-                            )
-                            keyboard = {'inline_keyboard': [[{'text': 'ДАВАЙ ЕЩЁ', 'callback_data': 'start_training'}]]}
-                            telegram_edit_message(chat_id, message_id, text, reply_markup=keyboard)
+                            telegram_finish_training(telegram_id)
+                            telegram_send_summary(chat_id, message_id, correct, wrong, total)
                         else:
                             # Показываем следующий тест
                             send_telegram_test(chat_id, message_id, test_manager, pending[0]['id'], new_idx, total, correct, wrong)
@@ -1509,6 +1675,32 @@ def send_telegram_test(chat_id: int, message_id: int, test_manager, test_id: int
     telegram_edit_message(chat_id, message_id, text, reply_markup=keyboard)
 
 
+def send_session_test(chat_id: int, message_id: int, token: str, test: dict, idx: int, correct: int, wrong: int):
+    """
+    Отправить тест из сессии в Telegram (без чтений из БД)
+
+    Args:
+        chat_id: ID чата
+        message_id: ID сообщения для редактирования
+        token: Токен сессии (TrainingSessionStore)
+        test: Материализованный тест сессии
+        idx: Текущий индекс (0-based)
+        correct: Количество правильных ответов
+        wrong: Количество неправильных ответов
+    """
+    # Формат: a:{token}:{idx}:{opt}:{correct}:{wrong}
+    buttons = []
+    for opt in test['options']:
+        callback = f"a:{token}:{idx}:{opt['index']}:{correct}:{wrong}"
+        buttons.append([{'text': opt['text'], 'callback_data': callback}])
+
+    keyboard = {'inline_keyboard': buttons}
+
+    text = f"*{test['word']}* — ?"
+
+    telegram_edit_message(chat_id, message_id, text, reply_markup=keyboard)
+
+
 @app.route('/dictionary')
 def dictionary_page():
     """📚 Страница личного словаря"""
@@ -1726,6 +1918,7 @@ def api_training_start():
     try:
         from core.training_service import TrainingService
         from core.test_manager import TestManager
+        from core.test_pregenerator import get_pregenerator
         from core.yandex_ai_client import YandexAIClient
         import asyncio
 
@@ -1748,7 +1941,7 @@ def api_training_start():
         # Создаем тесты обоих режимов
         logger.info(f"[/api/training/start] Создаем dual mode тесты для {len(words)} слов")
         ai_client = YandexAIClient()
-        test_manager = TestManager(db, ai_client)
+        test_manager = TestManager(db, ai_client, get_pregenerator(db))
 
         # Используем asyncio для создания тестов
         loop = None
@@ -1759,24 +1952,25 @@ def api_training_start():
             asyncio.set_event_loop(loop)
 
         logger.info(f"[/api/training/start] Вызываем create_dual_mode_tests")
-        test_ids = loop.run_until_complete(
+        created_tests = loop.run_until_complete(
             test_manager.create_dual_mode_tests(user_id, words)
         )
-        logger.info(f"[/api/training/start] create_dual_mode_tests вернул {len(test_ids) if test_ids else 0} test_ids")
+        logger.info(f"[/api/training/start] create_dual_mode_tests вернул {len(created_tests) if created_tests else 0} тестов")
 
-        if not test_ids:
-            logger.error(f"[/api/training/start] test_ids пустой!")
+        if not created_tests:
+            logger.error(f"[/api/training/start] тесты не созданы!")
             return jsonify({'error': 'Не удалось создать тесты'}), 500
 
-        # Получаем тесты с перемешанными вариантами
-        tests = []
-        for test_id in test_ids:
-            test = test_manager.get_test_with_shuffled_options(test_id)
-            if test:
-                tests.append(test)
+        # Тесты с перемешанными вариантами и состоянием слов — в TrainingSessionStore,
+        # чтобы ответы проверялись без чтения теста из YDB
+        from core.session_store import get_session_store
+
+        tests = test_manager.build_session_tests(created_tests, words)
+        token = get_session_store(db).create(user_id, tests)
 
         return jsonify({
             'success': True,
+            'session': token,
             'tests': tests,
             'total': len(tests)
         })
@@ -1792,7 +1986,6 @@ def api_training_answer():
     """Отправить ответ на тест"""
     try:
         from core.test_manager import TestManager
-        from core.yandex_ai_client import YandexAIClient
 
         # Проверяем авторизацию
         user_id = session.get('user_id')
@@ -1807,11 +2000,29 @@ def api_training_answer():
         if not test_id or not answer:
             return jsonify({'error': 'Неверные параметры'}), 400
 
-        # Проверяем ответ
-        ai_client = YandexAIClient()
-        test_manager = TestManager(db, ai_client)
+        # Тест из сессии тренировки (если клиент передал токен)
+        from core.session_store import get_session_store
+
+        store = get_session_store(db)
+        session_test = None
+        token = data.get('session')
+        if token:
+            training_session = store.get(token)
+            if training_session and training_session['user_id'] == user_id:
+                session_test = next((t for t in training_session['tests'] if t['test_id'] == test_id), None)
 
-        result = test_manager.submit_answer(test_id, answer)
+        # Отметка ответа снимается, если его не удалось применить (ответ можно отправить снова)
+        if session_test is not None and not store.claim_answer(token, session_test):
+            return jsonify({'error': 'Ответ на этот тест уже принят'}), 409
+
+        # Проверяем ответ
+        test_manager = TestManager(db, None)
+        try:
+            result = test_manager.submit_answer(test_id, answer, session_test=session_test)
+        except Exception:
+            if session_test is not None:
+                store.release_answer(token, session_test)
+            raise
 
         return jsonify({
             'success': True,
@@ -1831,6 +2042,30 @@ def api_training_answer():
         return jsonify({'error': f'Ошибка проверки ответа: {str(e)}'}), 500
 
 
+@app.route('/api/training/finish', methods=['POST'])
+def api_training_finish():
+    """Завершить тренировку - пересчитать очередь повторений (SM-2)"""
+    try:
+        from core.training_service import TrainingService
+
+        user_id = session.get('user_id')
+
+        if not user_id:
+            return jsonify({'error': 'Требуется авторизация'}), 401
+
+        data = request.get_json(silent=True) or {}
+        rescheduled = TrainingService(db).finish_session(user_id, token=data.get('session'))
+
+        return jsonify({
+            'success': True,
+            'rescheduled': rescheduled
+        })
+
+    except Exception as e:
+        logger.error(f"[/api/training/finish] Ошибка: {e}", exc_info=True)
+        return jsonify({'error': f'Ошибка завершения тренировки: {str(e)}'}), 500
+
+
 # =============================================================================
 # TEST ENDPOINTS - AI Agent Testing
 # =============================================================================
@@ -1933,17 +2168,17 @@ def test_create_tests():
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
 
-        test_ids = loop.run_until_complete(
+        created_tests = loop.run_until_complete(
             test_manager.create_tests_batch(user_id, words)
         )
 
-        logger.info(f"[TEST] Создано {len(test_ids)} тестов")
+        logger.info(f"[TEST] Создано {len(created_tests)} тестов")
 
         return jsonify({
             'success': True,
-            'test_ids': test_ids,
+            'test_ids': [t['id'] for t in created_tests],
             'words_selected': len(words),
-            'tests_created': len(test_ids)
+            'tests_created': len(created_tests)
         })
 
     except Exception as e: